@@ -0,0 +1,230 @@
+"""
+The CPU stage of analyze_dynamic: indicators, order blocks, divergence and
+the trade setup for one bar frame. No network access, so it runs the same
+in the request thread, on the analysis executor or in a compute worker
+process (compute.ProcessComputePool). Incremental state (indicator engines,
+divergence trackers) lives per process.
+
+INDICATOR_MODE=lazy swaps the per-(symbol, timeframe) indicator engines for
+indicators.LazyIndicators: nothing is kept between requests and each
+indicator is computed from a trailing window when first read, matching the
+engines to within indicators.LAZY_TOLERANCE.
+"""
+import os
+
+import pandas as pd
+
+from divergence import BEARISH, BULLISH, DivergenceRegistry, window_divergence_codes
+from indicators import IndicatorRegistry, LazyIndicators
+from metrics import REGISTRY, capture, replay
+from order_blocks import find_order_blocks
+from providers import route
+from strategy import build_setup, is_gold, mode_params
+
+STAGE_SECONDS = REGISTRY.histogram("analysis_stage_seconds", "Time spent per analyze_dynamic stage", ["stage"])
+STAGE_ERRORS = REGISTRY.counter("analysis_stage_errors_total", "Exceptions swallowed inside analysis stages", ["stage"])
+
+# Stateful per (symbol, timeframe): only bars since the last call are fed
+indicator_engines = IndicatorRegistry()
+INDICATOR_MODE = os.getenv("INDICATOR_MODE", "incremental")
+
+OB_LOOKBACK = 48 # Candles scanned for order blocks
+
+def check_divergence(df, price_col='Close', rsi_col='RSI_14', lookback=10):
+    """
+    Window divergence on the last 'lookback' candles: the current close makes
+    a new low/high against the window while RSI does not (see divergence.py).
+    """
+    try:
+        if len(df) < lookback: return None
+        closes = df[price_col].to_numpy(dtype=float)[-lookback:]
+        rsis = df[rsi_col].to_numpy(dtype=float)[-lookback:]
+        code = window_divergence_codes(closes, rsis, lookback)[-1]
+        if code == BULLISH: return "BULLISH" # Bullish Divergence
+        if code == BEARISH: return "BEARISH" # Bearish Divergence
+    except Exception as e: 
+        print(f"Div Check Error: {e}")
+    
+    return None
+
+# Pivot divergences per (symbol, timeframe); each request feeds only new closed bars
+divergence_trackers = DivergenceRegistry()
+
+def pivot_divergences(symbol, tf_label, df, offset, hold):
+    """(signal, recent events) from the pivot detector; signal as check_divergence."""
+    if 'RSI_14' not in df.columns: return None, []
+    tracker = divergence_trackers.sync((symbol, tf_label), df, df['RSI_14'].to_numpy())
+    signal = None
+    for e in reversed(tracker.events):
+        if tracker.bars - 1 - e["confirmed"] >= hold: break
+        if e["kind"] == "regular":
+            signal = e["direction"].upper()
+            break
+    events = [{
+        "kind": e["kind"],
+        "direction": e["direction"],
+        "start": e["start_time"].isoformat(),
+        "end": e["end_time"].isoformat(),
+        "price": [round(float(p + offset), 2) for p in e["price"]],
+        "rsi": [round(r, 2) for r in e["rsi"]],
+    } for e in tracker.recent(5)]
+    return signal, events
+
+def compute_analysis(symbol, mode, df, actual_tf_label, real_price, htf_trend):
+    """CPU stage: indicators, order blocks, divergence and the setup (no network)."""
+    try:
+        params = mode_params(mode)
+        if df.empty or len(df) < 10: return None 
+
+        last = df.iloc[-1]
+        raw_price = last['Close']
+        
+        offset = 0
+        price = raw_price
+        is_calibrated = False
+        
+        if real_price:
+            price = real_price
+            if abs(real_price - raw_price) < 5:
+                offset = 0
+            else:
+                offset = real_price - raw_price
+                is_calibrated = True
+        
+        atr = price * 0.005; rsi = 50; ema50 = price; adx = 25
+        stoch_k = 50
+        
+        with STAGE_SECONDS.time("indicators"):
+            try: 
+                if INDICATOR_MODE == "lazy":
+                    ind = LazyIndicators(df)
+                else:
+                    # Stateful per (symbol, timeframe): only bars since the last call are fed
+                    ind = indicator_engines.sync((symbol, actual_tf_label), df, columns=("RSI_14",))
+                # Read only what the setup uses; lazily evaluated ones are computed here
+                values = ind.values
+
+                if pd.notna(values['ATRr_14']): atr = values['ATRr_14']
+                if pd.notna(values['RSI_14']): rsi = values['RSI_14']
+                if pd.notna(values['ADX_14']): adx = values['ADX_14']
+                if pd.notna(values['EMA_50']): ema50 = values['EMA_50'] + offset
+            
+                bb_lower = values['BBL_20_2.0'] + offset if pd.notna(values['BBL_20_2.0']) else price - atr
+                bb_upper = values['BBU_20_2.0'] + offset if pd.notna(values['BBU_20_2.0']) else price + atr
+                bb_mid = values['BBM_20_2.0'] + offset if pd.notna(values['BBM_20_2.0']) else price
+            
+                # StochRSI only picks trend_follow entries
+                if params["strategy"] == "trend_follow" and pd.notna(values['STOCHRSIk_14_14_3_3']):
+                    stoch_k = values['STOCHRSIk_14_14_3_3']
+
+                # check_divergence reads the recent RSI straight off the frame
+                df['RSI_14'] = ind.column('RSI_14', len(df))
+            except Exception: STAGE_ERRORS.inc("indicators")
+
+        bullish_ob = None
+        bearish_ob = None
+        ob_zones = []
+        
+        with STAGE_SECONDS.time("order_blocks"):
+            try:
+                obs = find_order_blocks(
+                    df['Open'].to_numpy(), df['High'].to_numpy(), df['Low'].to_numpy(), df['Close'].to_numpy(),
+                    atr, lookback=OB_LOOKBACK, include_zones=True,
+                )
+                if obs['bullish'] is not None: bullish_ob = obs['bullish'] + offset
+                if obs['bearish'] is not None: bearish_ob = obs['bearish'] + offset
+                ob_zones = [
+                    {**z, "low": round(z["low"] + offset, 2), "high": round(z["high"] + offset, 2)}
+                    for z in obs['zones']
+                ]
+            except Exception: STAGE_ERRORS.inc("order_blocks")
+
+        # --- AI Upgrade: Advanced Context ---
+        with STAGE_SECONDS.time("divergence"):
+            pivot_signal, divergences = None, []
+            try:
+                pivot_signal, divergences = pivot_divergences(
+                    symbol, actual_tf_label, df, offset, params["divergence_hold"],
+                )
+            except Exception as e:
+                STAGE_ERRORS.inc("divergence")
+                print(f"Pivot Divergence Error: {e}")
+            divergence = pivot_signal if params["divergence"] == "pivot" else check_divergence(df)
+
+        # Scoring, entries and SL/TP are shared with the backtester (strategy.py)
+        reasons = []
+        gold = is_gold(symbol)
+        setup = build_setup(
+            price, atr, rsi, adx, ema50, bb_lower, bb_mid, bb_upper, stoch_k,
+            bullish_ob, bearish_ob, htf_trend, divergence, params, gold=gold, reasons=reasons,
+        )
+        bias = setup["bias"]
+        action_rec = setup["action"]
+        bull_score, bear_score = setup["bull_score"], setup["bear_score"]
+        strategy = params["strategy"]
+        buy_entry, buy_sl, buy_tp = setup["buy_entry"], setup["buy_sl"], setup["buy_tp"]
+        sell_entry, sell_sl, sell_tp = setup["sell_entry"], setup["sell_sl"], setup["sell_tp"]
+
+        pips_scale = route(symbol).pip_scale
+
+        final_tf_name = actual_tf_label
+        if is_calibrated: final_tf_name += " ⚡(Real-time)"
+
+        reasoning_text = ""
+        # Improved Reasoning Text
+        if htf_trend == "ULLISH": reasoning_text += "ภาพใหญ่เป็นขาขึ้น (Major Bullish) "
+        elif htf_trend == "EARISH": reasoning_text += "ภาพใหญ่เป็นขาลง (Major Bearish) "
+        
+        if divergence == "BULLISH": reasoning_text += "❗พบสัญญาณกลับตัว Bullish Divergence "
+        elif divergence == "BEARISH": reasoning_text += "❗พบสัญญาณกลับตัว Bearish Divergence "
+
+        if strategy == "trend_follow":
+            if bias.startswith("BULLISH"):
+                reasoning_text += f"แนะนำย่อซื้อตามเทรนด์ (ADX {int(adx)}) "
+            elif bias.startswith("BEARISH"):
+                reasoning_text += f"แนะนำเด้งขายตามเทรนด์ (ADX {int(adx)}) "
+            else:
+                reasoning_text += f"ตลาดแกว่งตัว (Sideway) รอเลือกทาง "
+        
+        # Add entry context
+        if bias.startswith("BULLISH"):
+             reasoning_text += f"เป้าเข้า: {round(buy_entry, 2)}"
+        elif bias.startswith("BEARISH"):
+             reasoning_text += f"เป้าเข้า: {round(sell_entry, 2)}"
+
+        return {
+            "symbol": symbol,
+            "price": round(price, 2),
+            "tf_name": final_tf_name,
+            "trend": bias,
+            "action": action_rec,
+            "reasons": ", ".join(reasons[:4]),
+            "reasoning_text": reasoning_text,
+            "rsi": round(rsi, 2),
+            "score": f"{bull_score}-{bear_score}",
+            "buy_setup": {"entry": round(buy_entry, 2), "sl": round(buy_sl, 2), "tp": round(buy_tp, 2), "pips": int((buy_entry - buy_sl) * pips_scale)},
+            "sell_setup": {"entry": round(sell_entry, 2), "sl": round(sell_sl, 2), "tp": round(sell_tp, 2), "pips": int((sell_sl - sell_entry) * pips_scale)},
+            "order_blocks": ob_zones,
+            "divergences": divergences
+        }
+
+    except Exception as e:
+        STAGE_ERRORS.inc("analysis")
+        print(f"CRITICAL ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def compute_analysis_captured(*args):
+    """
+    compute_analysis for a worker process, whose metrics nobody scrapes:
+    returns (result, stage events) for `record_stages` in the parent.
+    """
+    with capture(STAGE_SECONDS, STAGE_ERRORS) as events:
+        result = compute_analysis(*args)
+    return result, events
+
+
+def record_stages(events):
+    replay(events, STAGE_SECONDS, STAGE_ERRORS)
@@ -0,0 +1,357 @@
+"""
+Offline replay of analyze_dynamic setups over stored OHLCV bars.
+
+Every bar-level input of the live pipeline (indicators with their fallbacks,
+order blocks, divergence, HTF trend) is computed once for the whole history
+with NumPy/pandas. The bars are then walked in order: at each bar close the
+setup is built with strategy.build_setup, the bias side is placed as a limit
+order for the next bar(s), and fills and SL/TP hits are simulated on OHLC.
+
+    python backtest.py GC=F bars.csv            # CSV with Open/High/Low/Close
+    python backtest.py GC=F --store bar_data    # bars saved by the API server
+    python backtest.py GC=F --period 60d        # 15m bars from Yahoo
+
+Fills are conservative: when a bar touches both SL and TP, the SL is assumed
+to have been hit first, and a stop that gaps is filled at the open.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from htf_context import RESAMPLE_RULES, resample_ohlcv
+from divergence import BEARISH, BULLISH, find_divergences, window_divergence_codes
+from indicators import indicator_frame
+from ohlcv_cache import interval_seconds
+from strategy import MODE_PARAMS, build_setup, is_gold, mode_params
+
+FEATURES = (
+    "open", "high", "low", "close", "atr", "rsi", "adx", "ema50",
+    "bb_lower", "bb_mid", "bb_upper", "stoch_k", "bullish_ob", "bearish_ob", "htf", "divergence",
+    "pivot_dir", "pivot_age",
+)
+
+HTF_TRENDS = {1.0: "ULLISH", -1.0: "EARISH"}
+DIVERGENCES = {1.0: "BULLISH", -1.0: "BEARISH"}
+
+
+def order_block_levels(o, h, l, c, atr, lookback=48):
+    """
+    find_order_blocks evaluated at every bar: arrays with the most recent
+    bullish block low / bearish block high (NaN when there is none). Bars
+    closer than `lookback` to the start only see the candles that exist.
+    """
+    n = len(c)
+    bull = np.full(n, np.nan)
+    bear = np.full(n, np.nan)
+    if n < 2:
+        return bull, bear
+    # Candle p forms a block together with candle p + 1
+    bull_shape = (c[:-1] < o[:-1]) & (c[1:] > h[:-1])
+    bear_shape = (c[:-1] > o[:-1]) & (c[1:] < l[:-1])
+    bull_body = c[1:] - o[1:]
+    bear_body = o[1:] - c[1:]
+
+    # Row t holds candles t - lookback .. t - 1, oldest first
+    def windows(x, fill):
+        padded = np.concatenate([np.full(lookback, fill, dtype=x.dtype), x])
+        return np.lib.stride_tricks.sliding_window_view(padded, lookback)[:n]
+
+    body_min = (atr * 0.5)[:, None]
+    for shape, body, src, out in ((bull_shape, bull_body, l, bull), (bear_shape, bear_body, h, bear)):
+        hit = windows(shape, False) & (windows(body, -np.inf) > body_min)
+        found = hit.any(axis=1)
+        newest = lookback - 1 - hit[:, ::-1].argmax(axis=1)
+        pos = np.arange(n) - lookback + newest
+        out[found] = src[pos[found]]
+    return bull, bear
+
+
+def pivot_divergence_state(low, high, rsi, n):
+    """
+    Direction (+1/-1, 0 before the first) of the latest regular pivot
+    divergence confirmed by each bar, and how many bars ago it was confirmed.
+    """
+    events = [e for e in find_divergences(low, high, rsi) if e["kind"] == "regular"]
+    direction = np.zeros(n)
+    age = np.full(n, np.inf)
+    if not events:
+        return direction, age
+    confirmed = np.array([e["confirmed"] for e in events])
+    dirs = np.array([BULLISH if e["direction"] == "bullish" else BEARISH for e in events])
+    bars = np.arange(n)
+    pos = np.searchsorted(confirmed, bars, side="right") - 1
+    seen = pos >= 0
+    direction[seen] = dirs[pos[seen]]
+    age[seen] = bars[seen] - confirmed[pos[seen]]
+    return direction, age
+
+
+def htf_trend_codes(df, interval, htf_df, htf_interval):
+    """
+    Close vs EMA200 of the higher timeframe: +1 above, -1 below, 0 unknown.
+    Only HTF bars that had closed by the end of each bar are used.
+    """
+    close = df["Close"].to_numpy(dtype=float)
+    ema = indicator_frame(htf_df)["EMA_200"].to_numpy()
+    htf_close = htf_df.index + pd.Timedelta(seconds=interval_seconds(htf_interval))
+    bar_close = df.index + pd.Timedelta(seconds=interval_seconds(interval))
+    pos = np.searchsorted(htf_close.as_unit("ns").asi8, bar_close.as_unit("ns").asi8, side="right") - 1
+    ema_at = np.where(pos >= 0, ema[np.clip(pos, 0, None)], np.nan)
+    codes = np.zeros(len(close))
+    with np.errstate(invalid="ignore"):
+        codes[close > ema_at] = 1.0
+        codes[close < ema_at] = -1.0
+    return codes
+
+
+def prepare(df, mode, htf_df=None, ob_lookback=48):
+    """
+    Per-bar feature arrays (see FEATURES) for replaying `mode` over `df`,
+    which must hold bars of the mode's interval. The HTF series is resampled
+    from `df` when not given; swing uses its own bars like the live HTF.
+    """
+    params = mode_params(mode)
+    ind = indicator_frame(df)
+    o = df["Open"].to_numpy(dtype=float)
+    h = df["High"].to_numpy(dtype=float)
+    l = df["Low"].to_numpy(dtype=float)
+    c = df["Close"].to_numpy(dtype=float)
+
+    def col(name, fallback):
+        values = ind[name].to_numpy()
+        return np.where(np.isnan(values), fallback, values)
+
+    # Same fallbacks analyze_dynamic uses while an indicator is still warming up
+    atr = col("ATRr_14", c * 0.005)
+    rsi_raw = ind["RSI_14"].to_numpy()
+    features = {
+        "open": o, "high": h, "low": l, "close": c,
+        "atr": atr,
+        "rsi": np.where(np.isnan(rsi_raw), 50.0, rsi_raw),
+        "adx": col("ADX_14", 25.0),
+        "ema50": col("EMA_50", c),
+        "bb_lower": col("BBL_20_2.0", c - atr),
+        "bb_mid": col("BBM_20_2.0", c),
+        "bb_upper": col("BBU_20_2.0", c + atr),
+        "stoch_k": col("STOCHRSIk_14_14_3_3", 50.0),
+    }
+    features["bullish_ob"], features["bearish_ob"] = order_block_levels(o, h, l, c, atr, ob_lookback)
+    features["divergence"] = window_divergence_codes(c, rsi_raw)
+    features["pivot_dir"], features["pivot_age"] = pivot_divergence_state(l, h, rsi_raw, len(c))
+
+    interval, htf_interval = params["interval"], params["htf_interval"]
+    if htf_df is None and htf_interval == interval:
+        # Like the live swing mode: the latest close vs its own EMA200
+        htf = np.sign(np.nan_to_num(c - ind["EMA_200"].to_numpy()))
+    else:
+        if htf_df is None and htf_interval in RESAMPLE_RULES:
+            htf_df = resample_ohlcv(df, htf_interval)
+        htf = htf_trend_codes(df, interval, htf_df, htf_interval) if htf_df is not None and len(htf_df) >= 50 else np.zeros(len(c))
+    features["htf"] = htf
+    return features
+
+
+def fill_and_exit(o, h, l, c, t, direction, entry, sl, tp, expiry_bars=1, max_hold_bars=100):
+    """
+    Simulate a limit order placed at the close of bar `t`.
+
+    Returns None when the order expires unfilled, otherwise
+    (fill_bar, exit_bar, exit_price, outcome) with outcome one of "tp", "sl"
+    or "timeout". Limit orders fill at `entry` (no price improvement).
+    """
+    n = len(c)
+    fill_bar = None
+    for j in range(t + 1, min(t + 1 + expiry_bars, n)):
+        if (direction > 0 and l[j] <= entry) or (direction < 0 and h[j] >= entry):
+            fill_bar = j
+            break
+    if fill_bar is None:
+        return None
+
+    end = min(fill_bar + max_hold_bars, n)
+    if direction > 0:
+        sl_hit = l[fill_bar:end] <= sl
+        tp_hit = h[fill_bar:end] >= tp
+    else:
+        sl_hit = h[fill_bar:end] >= sl
+        tp_hit = l[fill_bar:end] <= tp
+    never = end - fill_bar
+    first_sl = sl_hit.argmax() if sl_hit.any() else never
+    first_tp = tp_hit.argmax() if tp_hit.any() else never
+
+    if first_sl == never and first_tp == never:
+        return fill_bar, end - 1, c[end - 1], "timeout"
+    if first_sl <= first_tp:
+        k = fill_bar + first_sl
+        # A stop that gaps through fills at the open (not on the fill bar itself)
+        gapped = k > fill_bar and ((direction > 0 and o[k] < sl) or (direction < 0 and o[k] > sl))
+        return fill_bar, k, (o[k] if gapped else sl), "sl"
+    return fill_bar, fill_bar + first_tp, tp, "tp"
+
+
+def simulate(features, params, gold=False, expiry_bars=1, max_hold_bars=100, cost=0.0, warmup=50, index=None):
+    """
+    Walk the bars and trade the bias side of every setup, one position at a
+    time. `cost` is charged per round trip in price units. Returns
+    {"orders": limit orders placed, "trades": [...]}.
+    """
+    o, h, l, c = features["open"], features["high"], features["low"], features["close"]
+    cols = [features[name].tolist() for name in FEATURES[4:]]
+    atr, rsi, adx, ema50, bb_lower, bb_mid, bb_upper, stoch_k, bull_ob, bear_ob, htf, div, pivot_dir, pivot_age = cols
+    if params["divergence"] == "pivot":
+        hold = params["divergence_hold"]
+        div = [d if a < hold else 0.0 for d, a in zip(pivot_dir, pivot_age)]
+    close = c.tolist()
+    n = len(close)
+
+    trades = []
+    orders = 0
+    t = max(warmup, 1)
+    while t < n - 1:
+        b_ob = bull_ob[t]
+        s_ob = bear_ob[t]
+        setup = build_setup(
+            close[t], atr[t], rsi[t], adx[t], ema50[t], bb_lower[t], bb_mid[t], bb_upper[t], stoch_k[t],
+            None if b_ob != b_ob else b_ob, None if s_ob != s_ob else s_ob,
+            HTF_TRENDS.get(htf[t], "NEUTRAL"), DIVERGENCES.get(div[t]), params, gold=gold,
+        )
+        bias = setup["bias"]
+        if bias == "BULLISH":
+            direction, side = 1, "buy"
+        elif bias == "BEARISH":
+            direction, side = -1, "sell"
+        else:
+            t += 1
+            continue
+
+        entry, sl, tp = setup[side + "_entry"], setup[side + "_sl"], setup[side + "_tp"]
+        orders += 1
+        done = fill_and_exit(o, h, l, c, t, direction, entry, sl, tp, expiry_bars, max_hold_bars)
+        if done is None:
+            t = min(t + expiry_bars, n - 1)
+            continue
+
+        fill_bar, exit_bar, exit_price, outcome = done
+        pnl = (exit_price - entry) * direction - cost
+        risk = abs(entry - sl)
+        trades.append({
+            "side": side,
+            "signal_bar": t,
+            "fill_bar": fill_bar,
+            "exit_bar": exit_bar,
+            "time": index[fill_bar] if index is not None else fill_bar,
+            "entry": entry,
+            "sl": sl,
+            "tp": tp,
+            "exit": float(exit_price),
+            "outcome": outcome,
+            "pnl": float(pnl),
+            "r": float(pnl / risk) if risk else 0.0,
+        })
+        t = exit_bar
+    return {"orders": orders, "trades": trades}
+
+
+def summarize(result):
+    """Win rate, expectancy (price units and R) and max drawdown of a simulation."""
+    trades = result["trades"]
+    pnl = np.array([tr["pnl"] for tr in trades], dtype=float)
+    r = np.array([tr["r"] for tr in trades], dtype=float)
+    stats = {
+        "orders": result["orders"],
+        "trades": len(trades),
+        "fill_rate": round(len(trades) / result["orders"], 4) if result["orders"] else 0.0,
+        "win_rate": 0.0, "expectancy": 0.0, "expectancy_r": 0.0,
+        "profit_factor": 0.0, "total_pnl": 0.0, "max_drawdown": 0.0,
+    }
+    if not len(pnl):
+        return stats
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:]
+    gains = pnl[pnl > 0].sum()
+    losses = -pnl[pnl < 0].sum()
+    stats.update({
+        "win_rate": round(float((pnl > 0).mean()), 4),
+        "expectancy": round(float(pnl.mean()), 4),
+        "expectancy_r": round(float(r.mean()), 4),
+        "profit_factor": round(float(gains / losses), 4) if losses else math.inf,
+        "total_pnl": round(float(equity[-1]), 4),
+        "max_drawdown": round(float((peak - equity).max()), 4),
+    })
+    return stats
+
+
+def run_backtest(df, symbol, mode, params=None, htf_df=None, features=None, **sim):
+    """Replay `mode` over `df` (bars of the mode's interval) and summarize it."""
+    params = params or mode_params(mode)
+    if features is None:
+        features = prepare(df, mode, htf_df)
+    result = simulate(features, params, gold=is_gold(symbol), index=df.index, **sim)
+    return {"symbol": symbol, "mode": mode, "bars": len(df), "stats": summarize(result), "trades": result["trades"]}
+
+
+def mode_bars(df, interval, mode):
+    """`df` (bars of `interval`) at the mode's timeframe, or None if it can't be built."""
+    target = MODE_PARAMS[mode]["interval"]
+    if target == interval:
+        return df
+    if target in RESAMPLE_RULES and interval_seconds(target) > interval_seconds(interval):
+        return resample_ohlcv(df, target)
+    return None
+
+
+def backtest_modes(df, symbol, interval, modes=None, **sim):
+    """
+    Backtest every mode whose timeframe can be built from `df` (bars of
+    `interval`): the mode's own interval, or a resample of finer bars.
+    """
+    report = {}
+    for mode in modes or MODE_PARAMS:
+        bars = mode_bars(df, interval, mode)
+        if bars is not None:
+            report[mode] = run_backtest(bars, symbol, mode, **sim)
+    return report
+
+
+def load_bars(symbol, interval, csv=None, period="60d", store=None):
+    """Bars for the CLIs: a CSV, the on-disk bar store, or a Yahoo download."""
+    if csv:
+        return pd.read_csv(csv, index_col=0, parse_dates=True)
+    if store:
+        from columnar_store import ColumnarBarStore
+        df = ColumnarBarStore(store).read(symbol, interval)
+        if df is None:
+            raise SystemExit(f"no {symbol} {interval} bars in {store}")
+        return df
+    from bar_history import yahoo_source
+    return yahoo_source(symbol, interval, period=period)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("symbol")
+    parser.add_argument("csv", nargs="?", help="OHLCV CSV indexed by bar open time")
+    parser.add_argument("--interval", default="15m")
+    parser.add_argument("--period", default="60d")
+    parser.add_argument("--store", help="read bars from this ColumnarBarStore directory")
+    parser.add_argument("--cost", type=float, default=0.0)
+    args = parser.parse_args()
+
+    df = load_bars(args.symbol, args.interval, args.csv, args.period, args.store)
+
+    start = time.perf_counter()
+    report = backtest_modes(df, args.symbol, args.interval, cost=args.cost)
+    elapsed = time.perf_counter() - start
+    for mode, res in report.items():
+        s = res["stats"]
+        print(f"{mode:<9} bars={res['bars']:<7} trades={s['trades']:<5} win={s['win_rate']:.1%} "
+              f"exp={s['expectancy']:.2f} ({s['expectancy_r']:.2f}R) pf={s['profit_factor']:.2f} "
+              f"dd={s['max_drawdown']:.2f}")
+    print(f"{len(df)} bars in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
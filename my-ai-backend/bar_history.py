@@ -0,0 +1,228 @@
+import threading
+
+import pandas as pd
+
+
+def yahoo_source(symbol, interval, period=None, start=None):
+    """Default data source: full window by `period`, or only bars since `start`."""
+    import yfinance as yf
+    ticker = yf.Ticker(symbol)
+    if start is not None:
+        return ticker.history(start=start, interval=interval)
+    return ticker.history(period=period, interval=interval)
+
+
+def split_bulk_frame(df, symbols):
+    """Split a yf.download(group_by="ticker") frame into one OHLCV frame per symbol."""
+    out = {}
+    if df is None or df.empty:
+        return out
+    if not isinstance(df.columns, pd.MultiIndex):
+        # A single ticker comes back with flat columns
+        frame = df.dropna(how="all")
+        if len(symbols) == 1 and not frame.empty:
+            out[symbols[0]] = frame
+        return out
+    tickers = set(df.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol in tickers:
+            frame = df[symbol].dropna(how="all")
+            if not frame.empty:
+                out[symbol] = frame
+    return out
+
+
+def yahoo_bulk_source(symbols, interval, period):
+    """One grouped Yahoo download for many symbols sharing (interval, period)."""
+    import yfinance as yf
+    symbols = list(symbols)
+    df = yf.download(
+        symbols, period=period, interval=interval, group_by="ticker",
+        auto_adjust=True, ignore_tz=False, threads=True, progress=False,
+    )
+    return split_bulk_frame(df, symbols)
+
+
+# How far back Yahoo serves intraday bars. A `start=` fetch older than this
+# comes back empty, so a store resumed from an older archive must download
+# the full period again.
+YAHOO_INTRADAY_LIMITS = {
+    "1m": pd.Timedelta(days=7),
+    "2m": pd.Timedelta(days=60),
+    "5m": pd.Timedelta(days=60),
+    "15m": pd.Timedelta(days=60),
+    "30m": pd.Timedelta(days=60),
+    "90m": pd.Timedelta(days=60),
+    "60m": pd.Timedelta(days=730),
+    "1h": pd.Timedelta(days=730),
+}
+
+
+def _utc_now():
+    return pd.Timestamp.now(tz="UTC")
+
+
+class IncrementalBarStore:
+    """
+    Keeps OHLCV history per (symbol, interval) and only fetches the newest bars
+    on refresh. The last stored candle is re-fetched and replaced because it may
+    still be forming.
+
+    `source(symbol, interval, period=None, start=None)` must return a DataFrame
+    indexed by bar open time, so tests can plug in an offline stub.
+
+    With an `archive` (ColumnarBarStore) every download is also written to
+    disk, and a key not yet in memory is loaded from disk first, so after a
+    restart only the bars since the last run are downloaded.
+
+    `max_gap` (interval -> Timedelta, e.g. YAHOO_INTRADAY_LIMITS) is how far
+    back the source can resume. When the last stored bar is older than that,
+    or an incremental fetch fails or comes back empty, the full period is
+    downloaded again. If that fails too, stored bars are served only while
+    they are within `max_gap` of now (counted in `stale_serves`); past it
+    the store returns an empty frame rather than outdated history.
+    """
+
+    def __init__(self, source=yahoo_source, overlap_bars=1, max_bars=10000, archive=None, max_gap=None, clock=_utc_now):
+        self.source = source
+        self.max_gap = max_gap or {}
+        self.clock = clock
+        self.archive = archive
+        self.overlap_bars = max(1, overlap_bars)
+        self.max_bars = max_bars
+        self._history = {}
+        # Number of bars the full download returned for each period. Yahoo
+        # counts periods in trading days, so we keep the same bar count rather
+        # than slicing by calendar time.
+        self._period_bars = {}
+        self._lock = threading.Lock()
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.archive_loads = 0
+        self.stale_serves = 0
+
+    def get(self, symbol, interval, period):
+        key = (symbol, interval)
+        if self.archive is not None:
+            self._load_archive(key)
+        with self._lock:
+            stored = self._history.get(key)
+            known = self._period_bars.get(key, {})
+            needs_full = stored is None or stored.empty or period not in known or self._too_old(interval, stored)
+
+        if not needs_full:
+            start = stored.index[-self.overlap_bars] if len(stored) >= self.overlap_bars else stored.index[0]
+            try:
+                fresh = self.source(symbol, interval, start=start)
+            except Exception as e:
+                print(f"Incremental Fetch Error ({symbol} {interval}): {e}")
+                fresh = None
+            if fresh is not None and not fresh.empty:
+                with self._lock:
+                    self.incremental_fetches += 1
+                    self._store(key, self._merge(self._history.get(key), fresh))
+                    window = self._window(key, period, self._history[key])
+                self._archive(key, fresh)
+                return window
+            # Nothing came back from `start` on: fall through to a full download
+
+        try:
+            fresh = self.source(symbol, interval, period=period)
+        except Exception as e:
+            print(f"Full Fetch Error ({symbol} {interval}): {e}")
+            fresh = None
+        if fresh is not None and not fresh.empty:
+            self.full_fetches += 1
+            return self.seed(symbol, interval, period, fresh)
+        with self._lock:
+            stored = self._history.get(key)
+            if stored is None or stored.empty or self._too_old(interval, stored):
+                return pd.DataFrame()
+            self.stale_serves += 1
+            print(f"Bar Refresh Failed ({symbol} {interval}): serving stored bars up to {stored.index[-1]}")
+            return self._window(key, period, stored)
+
+    def _too_old(self, interval, stored):
+        limit = self.max_gap.get(interval)
+        if limit is None:
+            return False
+        last = stored.index[-1]
+        now = self.clock()
+        if last.tzinfo is None:
+            now = now.tz_localize(None)
+        return now - last > limit
+
+    def seed(self, symbol, interval, period, fresh):
+        """Store a full `period` download obtained elsewhere (e.g. a bulk fetch)."""
+        key = (symbol, interval)
+        with self._lock:
+            merged = self._merge(self._history.get(key), fresh)
+            self._period_bars.setdefault(key, {})[period] = len(fresh)
+            self._store(key, merged)
+            window = self._window(key, period, self._history[key])
+        self._archive(key, fresh, period)
+        return window
+
+    def _load_archive(self, key):
+        with self._lock:
+            if key in self._history:
+                return
+        try:
+            periods = self.archive.periods(*key)
+            df = self.archive.read(*key, tail=self.max_bars) if periods else None
+        except Exception as e:
+            print(f"Bar Archive Read Error {key}: {e}")
+            return
+        if df is None or df.empty:
+            return
+        with self._lock:
+            if key in self._history:
+                return
+            self._period_bars[key] = periods
+            self._store(key, df)
+            self.archive_loads += 1
+
+    def _archive(self, key, fresh, period=None):
+        if self.archive is None:
+            return
+        try:
+            self.archive.append(*key, fresh)
+            if period is not None:
+                self.archive.set_period(*key, period, len(fresh))
+        except Exception as e:
+            print(f"Bar Archive Write Error {key}: {e}")
+
+    def history(self, symbol, interval):
+        """Everything held in memory (or on disk) for (symbol, interval), without fetching."""
+        if self.archive is not None:
+            self._load_archive((symbol, interval))
+        with self._lock:
+            return self._history.get((symbol, interval))
+
+    def has(self, symbol, interval, period):
+        if self.archive is not None:
+            self._load_archive((symbol, interval))
+        with self._lock:
+            return period in self._period_bars.get((symbol, interval), {})
+
+    def _merge(self, stored, fresh):
+        if stored is None or stored.empty:
+            return fresh.sort_index()
+        # Bars from the newer download win, which replaces the forming candle
+        combined = pd.concat([stored[stored.index < fresh.index.min()], fresh])
+        combined = combined[~combined.index.duplicated(keep="last")]
+        return combined.sort_index()
+
+    def _store(self, key, df):
+        keep = max(self._period_bars.get(key, {}).values(), default=len(df))
+        keep = min(max(keep, 1), self.max_bars)
+        self._history[key] = df.iloc[-keep:]
+
+    def _window(self, key, period, df):
+        bars = self._period_bars.get(key, {}).get(period, len(df))
+        return df.iloc[-bars:].copy()
+
+    def clear(self):
+        with self._lock:
+            self._history.clear()
+            self._period_bars.clear()
@@ -0,0 +1,276 @@
+"""
+Benchmarks of the analysis pipeline and WebSocket fan-out on recorded fixtures.
+
+Bars and prices come from a fixtures.py directory through
+main.use_market_source, so no run touches Yahoo or Binance and every run
+replays the same data (commit recorded fixtures; missing ones are
+synthesized with a fixed seed).
+
+    python bench.py                                  # print timings
+    python bench.py --save bench_baseline.json       # record a baseline
+    python bench.py --compare bench_baseline.json    # exit 1 on a regression
+    python bench.py --only fanout --clients 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import main
+from analysis import OB_LOOKBACK, check_divergence
+from divergence import find_divergences
+from fixtures import FixtureSource, synthesize
+from indicators import COLUMNS, LazyIndicators, indicator_frame
+from order_blocks import find_order_blocks
+from price_client import binance_pair
+from strategy import MODE_PARAMS
+from tick_frames import TickEncoder
+from ws_hub import ConnectionManager
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+DEFAULT_SYMBOLS = ("GC=F", "BTC-USD")
+
+
+def summarize_times(times):
+    ordered = sorted(times)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 4),
+        "median_ms": round(statistics.median(ordered) * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 4),
+    }
+
+
+def measure(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return summarize_times(times)
+
+
+def bench_stages(source, symbol, repeat):
+    """The analyze_dynamic building blocks on the scalping base frame."""
+    df = source.bars(symbol, MODE_PARAMS["scalping"]["interval"])
+    frame = indicator_frame(df)
+    df = df.assign(RSI_14=frame["RSI_14"].to_numpy())
+    o, h, l, c = (df[col].to_numpy() for col in ("Open", "High", "Low", "Close"))
+    atr = float(frame["ATRr_14"].iloc[-1])
+    rsi = df["RSI_14"].to_numpy()
+    return {
+        "indicators_full": measure(lambda: indicator_frame(df), repeat),
+        "indicators_lazy_all": measure(lambda: [LazyIndicators(df)[col] for col in COLUMNS], repeat),
+        "check_divergence": measure(lambda: check_divergence(df), repeat),
+        "order_blocks": measure(lambda: find_order_blocks(o, h, l, c, atr, lookback=OB_LOOKBACK, include_zones=True), repeat),
+        "pivot_divergence_full": measure(lambda: find_divergences(l, h, rsi), repeat),
+    }
+
+
+def stage_means():
+    """{stage: (sum, count)} of main's analysis_stage_seconds histogram."""
+    totals = getattr(main.STAGE_SECONDS, "totals", dict)()  # empty with METRICS=0
+    return {labels[0]: value for labels, value in totals.items()}
+
+
+def bench_analysis(symbol, repeat):
+    results = {}
+    for mode in MODE_PARAMS:
+        results[f"analyze_dynamic_cold.{mode}"] = measure(
+            lambda: main.analyze_dynamic(symbol, mode), max(1, repeat // 5), setup=main.reset_state,
+        )
+        main.analyze_dynamic(symbol, mode)
+        before = stage_means()
+        results[f"analyze_dynamic_warm.{mode}"] = measure(lambda: main.analyze_dynamic(symbol, mode), repeat)
+        # Per-stage breakdown of the warm runs, read off the /metrics histogram
+        for stage, (total, count) in stage_means().items():
+            total -= before.get(stage, (0.0, 0))[0]
+            count -= before.get(stage, (0.0, 0))[1]
+            if count:
+                results[f"stage.{mode}.{stage}"] = {"runs": count, "median_ms": round(total / count * 1000, 4)}
+    return results
+
+
+def bench_endpoints(symbol, repeat):
+    """HTTP round trips through FastAPI with warm bars; result caches are dropped per call."""
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)  # no context manager: startup tasks (feeds, scheduler) stay off
+
+    def drop_results():
+        main.analysis_flight.clear()
+        main.market_flight.clear()
+        main.snapshot_scheduler.snapshots.clear()
+
+    def post(path, body):
+        response = client.post(path, json=body)
+        response.raise_for_status()
+        return response
+
+    def get(path):
+        client.get(path).raise_for_status()
+
+    batch = {"items": [{"symbol": symbol, "mode": mode} for mode in MODE_PARAMS]}
+    post("/analyze_batch", batch)  # warm the bar store for every mode
+    return {
+        "endpoint.analyze_custom": measure(lambda: post("/analyze_custom", {"symbol": symbol, "mode": "scalping"}), repeat, drop_results),
+        "endpoint.analyze_summary": measure(lambda: get(f"/analyze/{symbol}"), repeat, drop_results),
+        "endpoint.analyze_batch": measure(lambda: post("/analyze_batch", batch), max(1, repeat // 5), drop_results),
+        "endpoint.metrics": measure(lambda: get("/metrics"), repeat),
+    }
+
+
+class SimulatedClient:
+    """Stands in for a WebSocket: counts frames and yields once per send like a real socket write."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def send_text(self, text):
+        self.received += 1
+        await asyncio.sleep(0)
+
+    async def send_bytes(self, data):
+        self.received += 1
+        await asyncio.sleep(0)
+
+    async def close(self, code=1000):
+        pass
+
+
+def bench_fanout(source, symbol, clients, ticks):
+    """Replay recorded ticks through TickEncoder and ConnectionManager.broadcast to `clients` sockets."""
+    _, prices = source.ticks(binance_pair(symbol) or "")
+    if not len(prices):
+        return {}
+    prices = prices[:ticks]
+
+    async def run():
+        manager = ConnectionManager(queue_size=32, send_timeout=5.0)
+        sockets = [SimulatedClient() for _ in range(clients)]
+        for ws in sockets:
+            manager.add(ws)
+        encoder = TickEncoder(symbol)
+        broadcast_times, frames = [], 0
+        start = time.perf_counter()
+        for price in prices:
+            frame = encoder.encode(float(price), float(prices[0]))
+            if frame is None:
+                continue
+            t = time.perf_counter()
+            await manager.broadcast(frame["json"], key=symbol)
+            broadcast_times.append(time.perf_counter() - t)
+            frames += 1
+            await asyncio.sleep(0)
+        while any(c.pending for c in manager.channels.values()):
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - start
+        stats = manager.stats()
+        for ws in sockets:
+            manager.disconnect(ws)
+        delivered = sum(ws.received for ws in sockets)
+        return broadcast_times, frames, elapsed, stats, delivered
+
+    broadcast_times, frames, elapsed, stats, delivered = asyncio.run(run())
+    if not frames:
+        return {}
+    return {
+        f"fanout.{clients}.broadcast": summarize_times(broadcast_times),
+        f"fanout.{clients}.delivery": {
+            "runs": delivered,
+            "median_ms": stats["delivery_p50_ms"],
+            "p99_ms": stats["delivery_p99_ms"],
+            "frames_per_s": round(delivered / elapsed, 1),
+            "dropped": stats["dropped"],
+        },
+    }
+
+
+def compare(results, baseline, tolerance, floor_ms=0.05):
+    """Entries whose median grew by more than `tolerance`x (and `floor_ms`) over the baseline."""
+    regressions = []
+    for name, base in baseline.get("results", {}).items():
+        cur = results.get(name)
+        if cur is None or "median_ms" not in base or "median_ms" not in cur:
+            continue
+        if cur["median_ms"] > base["median_ms"] * tolerance and cur["median_ms"] - base["median_ms"] > floor_ms:
+            regressions.append((name, base["median_ms"], cur["median_ms"]))
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixtures", default=DEFAULT_ROOT, help="fixture directory (see fixtures.py)")
+    parser.add_argument("--symbol", action="append", help="Yahoo ticker present in the fixtures")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--clients", type=int, action="append", help="simulated WebSocket clients (default 100 and 1000)")
+    parser.add_argument("--ticks", type=int, default=2000, help="recorded ticks replayed per fan-out run")
+    parser.add_argument("--only", help="run benchmarks whose group name contains this (stages, analysis, endpoints, fanout)")
+    parser.add_argument("--save", help="write results as a baseline JSON")
+    parser.add_argument("--compare", help="baseline JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor vs the baseline")
+    args = parser.parse_args()
+
+    symbols = args.symbol or list(DEFAULT_SYMBOLS)
+    if not os.path.isdir(os.path.join(args.fixtures, "bars")):
+        print(f"No fixtures in {args.fixtures}; synthesizing seeded ones")
+        synthesize(args.fixtures, symbols)
+    source = FixtureSource(args.fixtures)
+    main.use_market_source(source)
+
+    groups = {
+        "stages": lambda s: bench_stages(source, s, args.repeat),
+        "analysis": lambda s: bench_analysis(s, args.repeat),
+        "endpoints": lambda s: bench_endpoints(s, args.repeat),
+        "fanout": lambda s: {
+            k: v for n in (args.clients or [100, 1000]) for k, v in bench_fanout(source, s, n, args.ticks).items()
+        },
+    }
+    results = {}
+    for symbol in symbols:
+        for group, run in groups.items():
+            if args.only and args.only not in group:
+                continue
+            for name, stats in run(symbol).items():
+                results[f"{symbol}.{name}"] = stats
+
+    width = max((len(n) for n in results), default=10)
+    for name, stats in results.items():
+        extra = "".join(f"  {k}={v}" for k, v in stats.items() if k not in ("median_ms", "runs"))
+        print(f"{name:<{width}}  {stats['median_ms']:10.3f} ms  (n={stats['runs']}){extra}")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "fixtures": os.path.abspath(args.fixtures),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, base, cur in regressions:
+            print(f"REGRESSION {name}: {base:.3f} ms -> {cur:.3f} ms ({cur / base:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance}x against {args.compare}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,65 @@
+"""
+Microbenchmark: the old per-row df.iloc order-block loop vs find_order_blocks.
+
+    python bench_order_blocks.py
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from order_blocks import find_order_blocks
+
+
+def legacy_order_blocks(df, atr, offset=0):
+    """The loop analyze_dynamic used before find_order_blocks (kept as reference)."""
+    bullish_ob = None
+    bearish_ob = None
+    try:
+        for i in range(len(df)-2, len(df)-50, -1):
+            curr = df.iloc[i]
+            next_c = df.iloc[i+1]
+
+            if bullish_ob is None and curr['Close'] < curr['Open']:
+                if next_c['Close'] > curr['High'] and (next_c['Close'] - next_c['Open']) > (atr * 0.5):
+                    bullish_ob = curr['Low'] + offset
+
+            if bearish_ob is None and curr['Close'] > curr['Open']:
+                if next_c['Close'] < curr['Low'] and (next_c['Open'] - next_c['Close']) > (atr * 0.5):
+                    bearish_ob = curr['High'] + offset
+
+            if bullish_ob and bearish_ob: break
+    except: pass
+    return bullish_ob, bearish_ob
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 3, n))
+    open_ = close + rng.normal(0, 3, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 2, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 2, n)
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": 0})
+
+
+def vectorized(df, atr):
+    obs = find_order_blocks(
+        df["Open"].to_numpy(), df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy(), atr,
+    )
+    return obs["bullish"], obs["bearish"]
+
+
+def main(repeat=200):
+    df = make_frame(500)
+    atr = 3.0
+    assert legacy_order_blocks(df, atr) == vectorized(df, atr)
+
+    legacy = min(timeit.repeat(lambda: legacy_order_blocks(df, atr), number=repeat, repeat=3)) / repeat
+    fast = min(timeit.repeat(lambda: vectorized(df, atr), number=repeat, repeat=3)) / repeat
+    print(f"legacy iloc loop : {legacy * 1e6:9.1f} us/call")
+    print(f"numpy masks      : {fast * 1e6:9.1f} us/call")
+    print(f"speedup          : {legacy / fast:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
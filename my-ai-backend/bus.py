@@ -0,0 +1,389 @@
+"""
+Pub/sub between the uvicorn workers of one deployment.
+
+  publish(topic, message)    every subscriber of `topic`, in every worker
+  subscribe(topic)           asyncio.Queue of messages (oldest dropped when full)
+  lead(role, fn)             run `fn()` while this worker holds `role`
+
+At most one worker holds a role at a time, so a producer run under
+`lead("producer:GC=F", ...)` talks to upstream once however many workers
+fan its messages out. When the holder exits or dies, the next worker asking
+for the role takes over and starts `fn` there.
+
+`LocalBus` is the single-process default. `SocketBus` connects the workers
+of one host over a Unix socket: whoever holds an flock on `<path>.lock` is
+the broker. It binds the socket, routes messages and grants roles in
+request order; the other workers connect to it. If the broker goes away the
+kernel releases its lock, another worker takes over and everyone reconnects
+and asks for their roles again. An external broker (Redis, NATS) would be
+one more class with the same five methods.
+
+Messages are pickled, so only processes that can open the socket (0600)
+can talk on it.
+"""
+import asyncio
+import os
+import pickle
+import random
+
+try:
+    import fcntl
+except ImportError:  # Windows: LocalBus only
+    fcntl = None
+
+LOCAL = "local"             # role owner: this process (broker side)
+MAX_PEER_BUFFER = 8 << 20   # bytes queued for one slow worker before messages to it are dropped
+
+
+class LocalBus:
+    def __init__(self, queue_size=1024):
+        self.queue_size = queue_size
+        self._queues = {}       # topic -> set of asyncio.Queue
+        self._role_locks = {}   # role -> asyncio.Lock: one campaign per role per process
+        self.leading = set()
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def subscribe(self, topic):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues.setdefault(topic, set()).add(queue)
+        if len(self._queues[topic]) == 1:
+            self._subscribed(topic)
+        return queue
+
+    def unsubscribe(self, topic, queue):
+        queues = self._queues.get(topic)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._queues[topic]
+            self._unsubscribed(topic)
+
+    def publish(self, topic, message):
+        self.published += 1
+        self._deliver(topic, message)
+
+    def _subscribed(self, topic):
+        pass
+
+    def _unsubscribed(self, topic):
+        pass
+
+    def _deliver(self, topic, message):
+        for queue in self._queues.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+
+    async def lead(self, role, fn):
+        """
+        Wait for `role`, then run `fn()`. If the role is lost (the broker
+        went away) `fn` is cancelled and the campaign starts over; when `fn`
+        returns the role is handed on and its result returned.
+        """
+        lock = self._role_locks.setdefault(role, asyncio.Lock())
+        async with lock:
+            while True:
+                lost = await self._acquire(role)
+                self.leading.add(role)
+                task = asyncio.ensure_future(fn())
+                watch = asyncio.ensure_future(lost.wait())
+                try:
+                    await asyncio.wait({task, watch}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    watch.cancel()
+                    task.cancel()
+                    self.leading.discard(role)
+                    self._release(role)
+                if not lost.is_set() and task.done():
+                    return task.result()
+                await asyncio.wait({task})  # let fn clean up before campaigning again
+                print(f"Bus: lost {role}, campaigning again")
+
+    async def _acquire(self, role):
+        # Alone in the process, the local lock is the whole election
+        return asyncio.Event()
+
+    def _release(self, role):
+        pass
+
+    def stats(self):
+        return {
+            "kind": "local",
+            "topics": len(self._queues),
+            "leading": sorted(self.leading),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+def _frame(obj):
+    body = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    return len(body).to_bytes(4, "big") + body
+
+
+async def _read_frame(reader):
+    size = int.from_bytes(await reader.readexactly(4), "big")
+    return pickle.loads(await reader.readexactly(size))
+
+
+class SocketBus(LocalBus):
+    def __init__(self, path, queue_size=1024, retry=0.5):
+        super().__init__(queue_size)
+        self.path = path
+        self.retry = retry
+        self.broker = False
+        self.connected = asyncio.Event()
+        self._lock_fd = None
+        self._server = None
+        self._task = None
+        self._writer = None     # client: connection to the broker
+        self._peers = {}        # broker: writer -> set of topics
+        self._owners = {}       # broker: role -> owner (LOCAL or a peer writer)
+        self._waiting = {}      # broker: role -> [owner, ...] in request order
+        self._wanted = {}       # role -> future resolved when granted to this process
+        self._held = {}         # role -> asyncio.Event set when the role is lost
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+        await self.connected.wait()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait({self._task})
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._peers):
+                writer.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock: another worker becomes broker
+            self._lock_fd = None
+        self.broker = False
+        self.connected.clear()
+        for lost in self._held.values():
+            lost.set()
+        self._held.clear()
+
+    # --- connection upkeep ---
+
+    def _try_lock(self):
+        if fcntl is None:
+            raise RuntimeError("SocketBus needs fcntl")
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _maintain(self):
+        while True:
+            if self._try_lock():
+                await self._serve()
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(self.retry)
+                continue
+            self._writer = writer
+            for topic in self._queues:
+                self._send(writer, ("sub", topic))
+            for role in self._wanted:
+                self._send(writer, ("lead", role))
+            self.connected.set()
+            try:
+                while True:
+                    self._on_broker_message(await _read_frame(reader))
+            except (asyncio.IncompleteReadError, OSError, EOFError):
+                print(f"Bus: lost broker at {self.path}")
+            finally:
+                self.connected.clear()
+                self._writer = None
+                writer.close()
+                for lost in self._held.values():
+                    lost.set()
+                self._held.clear()
+            # Jitter so the surviving workers don't all race for the lock at once
+            await asyncio.sleep(random.uniform(0, self.retry))
+
+    async def _serve(self):
+        try:
+            os.unlink(self.path)  # left by a broker that died; we hold the lock now
+        except OSError:
+            pass
+        self._server = await asyncio.start_unix_server(self._handle_peer, self.path)
+        os.chmod(self.path, 0o600)
+        self.broker = True
+        print(f"Bus: broker at {self.path}")
+        for role in list(self._wanted):
+            self._request(LOCAL, role)
+        self.connected.set()
+        await asyncio.Event().wait()  # serve until close()
+
+    def _send(self, writer, obj):
+        if writer.transport.get_write_buffer_size() > MAX_PEER_BUFFER:
+            self.dropped += 1
+            return
+        writer.write(_frame(obj))
+
+    # --- client side ---
+
+    def _on_broker_message(self, msg):
+        if msg[0] == "msg":
+            self._deliver(msg[1], msg[2])
+        elif msg[0] == "granted":
+            self._on_granted(msg[1])
+
+    def _subscribed(self, topic):
+        if self._writer is not None:
+            self._send(self._writer, ("sub", topic))
+
+    def _unsubscribed(self, topic):
+        if self._writer is not None:
+            self._send(self._writer, ("unsub", topic))
+
+    def publish(self, topic, message):
+        self.published += 1
+        self._deliver(topic, message)
+        if self.broker:
+            self._route(topic, message, origin=LOCAL)
+        elif self._writer is not None:
+            self._send(self._writer, ("pub", topic, message))
+        else:
+            self.dropped += 1
+
+    async def _acquire(self, role):
+        granted = asyncio.get_running_loop().create_future()
+        self._wanted[role] = granted
+        if self.broker:
+            self._request(LOCAL, role)
+        elif self._writer is not None:
+            self._send(self._writer, ("lead", role))
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if self._wanted.get(role) is granted:
+                del self._wanted[role]
+            self._resign_upstream(role)
+            raise
+        lost = asyncio.Event()
+        self._held[role] = lost
+        return lost
+
+    def _on_granted(self, role):
+        granted = self._wanted.pop(role, None)
+        if granted is None or granted.done():
+            self._resign_upstream(role)  # nobody here wants it any more
+            return
+        granted.set_result(True)
+
+    def _release(self, role):
+        self._held.pop(role, None)
+        self._resign_upstream(role)
+
+    def _resign_upstream(self, role):
+        if self.broker:
+            self._resign(LOCAL, role)
+        elif self._writer is not None:
+            self._send(self._writer, ("resign", role))
+
+    # --- broker side ---
+
+    async def _handle_peer(self, reader, writer):
+        self._peers[writer] = set()
+        try:
+            while True:
+                msg = await _read_frame(reader)
+                op = msg[0]
+                if op == "sub":
+                    self._peers[writer].add(msg[1])
+                elif op == "unsub":
+                    self._peers[writer].discard(msg[1])
+                elif op == "pub":
+                    self._route(msg[1], msg[2], origin=writer)
+                elif op == "lead":
+                    self._request(writer, msg[1])
+                elif op == "resign":
+                    self._resign(writer, msg[1])
+        except (asyncio.IncompleteReadError, OSError, EOFError):
+            pass
+        finally:
+            self._peers.pop(writer, None)
+            for role, owner in list(self._owners.items()):
+                if owner is writer:
+                    self._resign(writer, role)
+            for waiting in self._waiting.values():
+                if writer in waiting:
+                    waiting.remove(writer)
+            writer.close()
+
+    def _route(self, topic, message, origin):
+        if origin is not LOCAL:
+            self._deliver(topic, message)
+        frame = None
+        for writer, topics in self._peers.items():
+            if writer is not origin and topic in topics:
+                if writer.transport.get_write_buffer_size() > MAX_PEER_BUFFER:
+                    self.dropped += 1
+                    continue
+                frame = frame or _frame(("msg", topic, message))
+                writer.write(frame)
+
+    def _request(self, owner, role):
+        current = self._owners.get(role)
+        if current is None:
+            self._owners[role] = owner
+            self._grant(owner, role)
+        elif current is not owner:
+            waiting = self._waiting.setdefault(role, [])
+            if owner not in waiting:
+                waiting.append(owner)
+
+    def _resign(self, owner, role):
+        if self._owners.get(role) is not owner:
+            waiting = self._waiting.get(role, [])
+            if owner in waiting:
+                waiting.remove(owner)
+            return
+        del self._owners[role]
+        waiting = self._waiting.get(role)
+        if waiting:
+            self._request(waiting.pop(0), role)
+
+    def _grant(self, owner, role):
+        if owner is LOCAL:
+            self._on_granted(role)
+        else:
+            self._send(owner, ("granted", role))
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "kind": "socket",
+            "broker": self.broker,
+            "connected": self.connected.is_set(),
+            "peers": len(self._peers),
+        })
+        return stats
@@ -0,0 +1,183 @@
+"""
+On-disk OHLCV history, one directory per (symbol, interval):
+
+    <root>/<symbol>/<interval>/ts.i8        int64 bar open time, ns since epoch (UTC)
+                               open.f8 ...  float64 per column, same row order
+                               meta.json    tz, index name, bars per download period
+
+Bars are only ever appended; a write that starts at or before the last stored
+bar (the forming candle) first truncates the files back to that bar. Reads
+memory-map the files and copy just the requested tail into a DataFrame, so a
+cold start costs a few page faults instead of a download or a CSV parse.
+
+Row count is the shortest file, so a write interrupted between columns never
+yields misaligned rows.
+"""
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+TS_FILE = "ts.i8"
+_COL_FILES = {col: col.lower() + ".f8" for col in COLUMNS}
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9.=_-]", "_", name)
+
+
+class _FileLock:
+    """Cross-process lock on <dir>/.lock (a no-op without fcntl)."""
+
+    def __init__(self, path, exclusive):
+        self.path = path
+        self.exclusive = exclusive
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(os.path.join(self.path, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+class ColumnarBarStore:
+    """Persistent bars per (symbol, interval) under `root` (layout above)."""
+
+    def __init__(self, root):
+        self.root = root
+        self._locks = {}
+        self._guard = threading.Lock()
+        self.reads = 0
+        self.bars_written = 0
+
+    def _dir(self, symbol, interval):
+        return os.path.join(self.root, _safe_name(symbol), _safe_name(interval))
+
+    def _lock(self, path):
+        with self._guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def _rows(self, path):
+        """Complete rows on disk: the length of the shortest column file."""
+        sizes = []
+        for name, width in [(TS_FILE, 8)] + [(f, 8) for f in _COL_FILES.values()]:
+            try:
+                sizes.append(os.path.getsize(os.path.join(path, name)) // width)
+            except OSError:
+                return 0
+        return min(sizes)
+
+    def _meta(self, path):
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, path, meta):
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    def _timestamps(self, path, rows):
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        return np.memmap(os.path.join(path, TS_FILE), dtype=np.int64, mode="r", shape=(rows,))
+
+    def append(self, symbol, interval, df):
+        """Write the bars of `df`, replacing stored bars from its first timestamp on."""
+        if df is None or df.empty:
+            return 0
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        index = df.index
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+        ts = index.tz_convert("UTC").as_unit("ns").asi8
+
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._lock(path), _FileLock(path, exclusive=True):
+            rows = self._rows(path)
+            stored = self._timestamps(path, rows)
+            keep = int(np.searchsorted(stored, ts[0], side="left")) if rows else 0
+            del stored
+            files = [TS_FILE] + list(_COL_FILES.values())
+            for name in files:
+                fpath = os.path.join(path, name)
+                with open(fpath, "ab") as f:
+                    f.truncate(keep * 8)
+            with open(os.path.join(path, TS_FILE), "ab") as f:
+                f.write(ts.tobytes())
+            for col, name in _COL_FILES.items():
+                values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan)
+                with open(os.path.join(path, name), "ab") as f:
+                    f.write(np.ascontiguousarray(values).tobytes())
+
+            meta = self._meta(path)
+            meta["tz"] = str(df.index.tz) if df.index.tz is not None else None
+            meta["index_name"] = df.index.name
+            self._write_meta(path, meta)
+        self.bars_written += len(df)
+        return len(df)
+
+    def read(self, symbol, interval, tail=None, start=None):
+        """Stored bars as a DataFrame (None if nothing is stored)."""
+        path = self._dir(symbol, interval)
+        if not os.path.isdir(path):
+            return None
+        with _FileLock(path, exclusive=False):
+            rows = self._rows(path)
+            if not rows:
+                return None
+            ts = self._timestamps(path, rows)
+            first = 0
+            if start is not None:
+                start = pd.Timestamp(start)
+                if start.tz is None:
+                    start = start.tz_localize("UTC")
+                first = int(np.searchsorted(ts, start.value, side="left"))
+            if tail is not None:
+                first = max(first, rows - tail)
+            data = {
+                col: np.array(np.memmap(os.path.join(path, name), dtype=np.float64, mode="r", shape=(rows,))[first:])
+                for col, name in _COL_FILES.items()
+            }
+            index = pd.DatetimeIndex(np.array(ts[first:]), tz="UTC")
+            meta = self._meta(path)
+        self.reads += 1
+        # Naive frames come back naive (in UTC), aware ones in their own zone
+        index = index.tz_convert(meta.get("tz", "UTC"))
+        index.name = meta.get("index_name")
+        return pd.DataFrame(data, index=index)
+
+    def periods(self, symbol, interval):
+        """{period: bar count of its full download} recorded via `set_period`."""
+        return dict(self._meta(self._dir(symbol, interval)).get("periods", {}))
+
+    def set_period(self, symbol, interval, period, bars):
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        with self._lock(path), _FileLock(path, exclusive=True):
+            meta = self._meta(path)
+            meta.setdefault("periods", {})[period] = int(bars)
+            self._write_meta(path, meta)
+
+    def stats(self):
+        return {"root": self.root, "reads": self.reads, "bars_written": self.bars_written}
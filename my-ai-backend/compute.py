@@ -0,0 +1,226 @@
+"""
+Executors that keep blocking work off the event loop.
+
+`BoundedExecutor` runs sync functions on a fixed number of worker threads.
+Callers beyond `workers + queue` wait on the event loop (an asyncio
+semaphore, no thread) instead of piling up in the executor's unbounded
+queue, so analysis concurrency follows the core count and the number of
+sockets waiting on Yahoo has no effect on it.
+
+`ProcessComputePool` is the same idea with warm worker processes, for work
+that holds the GIL long enough to stall the event loop (a burst of swing
+analyses). DataFrame arguments travel through shared memory as one float64
+block plus int64 timestamps instead of being pickled, and each key (e.g.
+(symbol, timeframe)) always goes to the same worker so per-process
+incremental state stays warm.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class BoundedExecutor:
+    def __init__(self, workers=None, queue=None, name="compute"):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue = self.workers * 2 if queue is None else queue
+        self.name = name
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(self.workers + self.queue)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+
+    async def run(self, fn, *args):
+        """Await `fn(*args)` on a worker thread, waiting for a free slot first."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+        finally:
+            self._slots.release()
+
+    def _call(self, fn, args):
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue": self.queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class SharedFrame:
+    """
+    A numeric DataFrame copied into one shared-memory block: int64 index
+    (ns since epoch, UTC) followed by one float64 row per column. The
+    creating process owns the block and must call `release()`.
+    """
+
+    def __init__(self, df):
+        n = len(df)
+        index = df.index
+        self.tz = str(index.tz) if getattr(index, "tz", None) is not None else None
+        if self.tz is not None:
+            index = index.tz_convert("UTC")
+        self.columns = list(df.columns)
+        self.index_name = index.name
+        self.unit = getattr(index, "unit", "ns")
+        self.shape = (len(self.columns) + 1, n)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * self.shape[0] * n))
+        block = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        block[0].view(np.int64)[:] = pd.DatetimeIndex(index).as_unit("ns").asi8
+        for row, col in enumerate(self.columns, start=1):
+            block[row] = df[col].to_numpy(dtype=np.float64)
+
+    @property
+    def handle(self):
+        """Picklable description a worker passes to `load`."""
+        return self.shm.name, self.shape, self.columns, self.tz, self.index_name, self.unit
+
+    @staticmethod
+    def load(handle):
+        """A private DataFrame copy of the shared block."""
+        name, shape, columns, tz, index_name, unit = handle
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            index = pd.DatetimeIndex(block[0].view(np.int64).copy(), tz="UTC" if tz else None, name=index_name).as_unit(unit)
+            if tz:
+                index = index.tz_convert(tz)
+            df = pd.DataFrame({col: block[row].copy() for row, col in enumerate(columns, start=1)}, index=index)
+            del block
+        finally:
+            shm.close()
+        return df
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+class _SharedArg:
+    __slots__ = ("handle",)
+
+    def __init__(self, handle):
+        self.handle = handle
+
+
+def _init_worker(preload):
+    for module in preload:
+        importlib.import_module(module)
+
+
+def _run_shared(fn, args):
+    args = [SharedFrame.load(a.handle) if isinstance(a, _SharedArg) else a for a in args]
+    return fn(*args)
+
+
+def _ping():
+    return os.getpid()
+
+
+class ProcessComputePool:
+    """
+    `workers` single-process executors (spawned, so no threads or sockets
+    are inherited) that import `preload` on start-up. Callers beyond
+    `workers * (1 + queue)` wait on the event loop.
+    """
+
+    def __init__(self, workers=None, preload=(), queue=2):
+        self.workers = workers or os.cpu_count() or 1
+        self.preload = tuple(preload)
+        self.queue = queue
+        self._context = multiprocessing.get_context("spawn")
+        self._executors = [self._spawn() for _ in range(self.workers)]
+        self._slots = asyncio.Semaphore(self.workers * (1 + queue))
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.restarts = 0
+        self.shared_bytes = 0
+
+    def _spawn(self):
+        return ProcessPoolExecutor(1, mp_context=self._context, initializer=_init_worker, initargs=(self.preload,))
+
+    def worker_for(self, key):
+        return zlib.crc32(repr(key).encode()) % self.workers
+
+    async def start(self):
+        """Spawn every worker now (imports included) instead of on the first request."""
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[loop.run_in_executor(ex, _ping) for ex in self._executors])
+
+    async def run(self, key, fn, *args):
+        """Await `fn(*args)` on the worker owning `key`; DataFrame args go through shared memory."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        shared = []
+        try:
+            packed = []
+            for arg in args:
+                if isinstance(arg, pd.DataFrame):
+                    frame = SharedFrame(arg)
+                    shared.append(frame)
+                    self.shared_bytes += frame.shm.size
+                    packed.append(_SharedArg(frame.handle))
+                else:
+                    packed.append(arg)
+            i = self.worker_for(key)
+            self.running += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executors[i], _run_shared, fn, packed)
+            except BrokenProcessPool:
+                # A crashed worker is replaced; this call fails, the next one gets a fresh process
+                self._executors[i] = self._spawn()
+                self.restarts += 1
+                raise
+            finally:
+                self.running -= 1
+                self.completed += 1
+        finally:
+            for frame in shared:
+                frame.release()
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "restarts": self.restarts,
+            "shared_bytes": self.shared_bytes,
+        }
+
+    def shutdown(self, wait=True):
+        for executor in self._executors:
+            executor.shutdown(wait=wait)
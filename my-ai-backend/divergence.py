@@ -0,0 +1,250 @@
+"""
+RSI divergence detection.
+
+Two detectors:
+  window   the original check_divergence rule: the current close makes a new
+           low (high) against the previous `lookback - 1` closes while RSI
+           does not. `window_divergence_codes` evaluates it at every bar.
+  pivot    swing pivots on Low/High. A pivot at bar i is confirmed `right`
+           bars later once no later bar undercut (overshot) it, and it must be
+           strictly lower (higher) than the `left` bars before it. Consecutive
+           pivots of the same side, at most `max_gap` bars apart, are compared:
+             regular bullish  lower low in price,  higher low in RSI
+             hidden bullish   higher low in price, lower low in RSI
+             regular bearish  higher high in price, lower high in RSI
+             hidden bearish   lower high in price,  higher high in RSI
+
+`find_divergences` runs the pivot detector over a whole history with NumPy;
+`DivergenceTracker` produces the same events bar by bar, so live requests
+only pay for the bars added since the previous call.
+"""
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+BULLISH = 1.0
+BEARISH = -1.0
+
+
+def window_divergence_codes(close, rsi, lookback=10):
+    """check_divergence at every bar: +1 bullish, -1 bearish, 0 none."""
+    close = np.asarray(close, dtype=float)
+    rsi = np.asarray(rsi, dtype=float)
+    n = len(close)
+    codes = np.zeros(n)
+    prior = lookback - 1
+    if n < lookback:
+        return codes
+    win_c = np.lib.stride_tricks.sliding_window_view(close, prior)[: n - prior]
+    bars = np.arange(prior, n)
+    lo = bars - prior + win_c.argmin(axis=1)
+    hi = bars - prior + win_c.argmax(axis=1)
+    cur_c, cur_r = close[bars], rsi[bars]
+    with np.errstate(invalid="ignore"):
+        bullish = (cur_c < close[lo]) & (cur_r > rsi[lo]) & (cur_r < 50)
+        bearish = (cur_c > close[hi]) & (cur_r < rsi[hi]) & (cur_r > 50)
+    codes[bars[bearish]] = BEARISH
+    codes[bars[bullish]] = BULLISH  # checked first in check_divergence
+    return codes
+
+
+def find_pivots(values, left=3, right=3, low=True):
+    """Indices of confirmed pivot lows (or highs with low=False)."""
+    x = np.asarray(values, dtype=float)
+    if not low:
+        x = -x
+    n = len(x)
+    if n < left + right + 1:
+        return np.empty(0, dtype=int)
+    idx = np.arange(left, n - right)
+    if left:
+        before = np.lib.stride_tricks.sliding_window_view(x, left)[idx - left].min(axis=1)
+    else:
+        before = np.full(len(idx), np.inf)
+    if right:
+        after = np.lib.stride_tricks.sliding_window_view(x, right)[idx + 1].min(axis=1)
+    else:
+        after = np.full(len(idx), np.inf)
+    with np.errstate(invalid="ignore"):
+        mask = (x[idx] < before) & (x[idx] <= after)
+    return idx[mask]
+
+
+def _pair_events(pivots, price, rsi, direction, right, max_gap):
+    events = []
+    if len(pivots) < 2:
+        return events
+    p1, p2 = pivots[:-1], pivots[1:]
+    a, b = price[p1], price[p2]
+    ra, rb = rsi[p1], rsi[p2]
+    with np.errstate(invalid="ignore"):
+        near = (p2 - p1) <= max_gap
+        if direction == BULLISH:
+            regular = near & (b < a) & (rb > ra)
+            hidden = near & (b > a) & (rb < ra)
+        else:
+            regular = near & (b > a) & (rb < ra)
+            hidden = near & (b < a) & (rb > ra)
+    for kind, mask in (("regular", regular), ("hidden", hidden)):
+        for i in np.flatnonzero(mask):
+            events.append(_event(kind, direction, int(p1[i]), int(p2[i]), right,
+                                 float(a[i]), float(b[i]), float(ra[i]), float(rb[i])))
+    return events
+
+
+def _event(kind, direction, start, end, right, price_a, price_b, rsi_a, rsi_b):
+    return {
+        "kind": kind,
+        "direction": "bullish" if direction == BULLISH else "bearish",
+        "start": start,
+        "end": end,
+        "confirmed": end + right,
+        "price": [price_a, price_b],
+        "rsi": [rsi_a, rsi_b],
+    }
+
+
+def find_divergences(low, high, rsi, left=3, right=3, max_gap=60):
+    """Every pivot divergence in the series, ordered by confirmation bar."""
+    low = np.asarray(low, dtype=float)
+    high = np.asarray(high, dtype=float)
+    rsi = np.asarray(rsi, dtype=float)
+    events = _pair_events(find_pivots(low, left, right, low=True), low, rsi, BULLISH, right, max_gap)
+    events += _pair_events(find_pivots(high, left, right, low=False), high, rsi, BEARISH, right, max_gap)
+    events.sort(key=lambda e: (e["confirmed"], e["direction"], e["kind"]))
+    return events
+
+
+def divergence_signal(events, n, kinds=("regular",), hold=3):
+    """
+    Per-bar code (+1 bullish, -1 bearish, 0 none) of the latest event of
+    `kinds` confirmed within the last `hold` bars.
+    """
+    codes = np.zeros(n)
+    for e in events:
+        if e["kind"] not in kinds:
+            continue
+        start = e["confirmed"]
+        if start < n:
+            codes[start:min(start + hold, n)] = BULLISH if e["direction"] == "bullish" else BEARISH
+    return codes
+
+
+class DivergenceTracker:
+    """
+    Incremental `find_divergences`: feed closed bars with `update`; each call
+    costs O(left + right) and returns the events confirmed by that bar.
+    Indices count bars since the tracker was created.
+    """
+
+    def __init__(self, left=3, right=3, max_gap=60, max_events=200):
+        self.left = left
+        self.right = right
+        self.max_gap = max_gap
+        span = left + right + 1
+        self._low = deque(maxlen=span)
+        self._high = deque(maxlen=span)
+        self._rsi = deque(maxlen=span)
+        self._times = deque(maxlen=span)
+        self._last_low = None   # (index, price, rsi) of the previous pivot low
+        self._last_high = None
+        self.events = deque(maxlen=max_events)
+        self.last_ts = None
+        self.bars = 0
+
+    def update(self, ts, low, high, rsi):
+        self._low.append(float(low))
+        self._high.append(float(high))
+        self._rsi.append(float(rsi))
+        self._times.append(ts)
+        self.last_ts = ts
+        self.bars += 1
+        if len(self._low) < self.left + self.right + 1:
+            return []
+
+        # Candidate pivot: `right` bars back
+        i = self.bars - 1 - self.right
+        k = self.left
+        new = []
+        for values, direction in ((self._low, BULLISH), (self._high, BEARISH)):
+            x = list(values) if direction == BULLISH else [-v for v in values]
+            before = min(x[:k]) if k else float("inf")
+            after = min(x[k + 1:]) if self.right else float("inf")
+            if not (x[k] < before and x[k] <= after):
+                continue
+            pivot = (i, values[k], self._rsi[k], self._times[k])
+            prev = self._last_low if direction == BULLISH else self._last_high
+            if prev is not None and pivot[0] - prev[0] <= self.max_gap:
+                event = self._compare(prev, pivot, direction)
+                if event is not None:
+                    new.append(event)
+            if direction == BULLISH:
+                self._last_low = pivot
+            else:
+                self._last_high = pivot
+        new.sort(key=lambda e: (e["direction"], e["kind"]))
+        self.events.extend(new)
+        return new
+
+    def _compare(self, prev, pivot, direction):
+        (p1, a, ra, t1), (p2, b, rb, t2) = prev, pivot
+        if direction == BULLISH:
+            kind = "regular" if b < a and rb > ra else "hidden" if b > a and rb < ra else None
+        else:
+            kind = "regular" if b > a and rb < ra else "hidden" if b < a and rb > ra else None
+        if kind is None:
+            return None
+        event = _event(kind, direction, p1, p2, self.right, a, b, ra, rb)
+        event["start_time"] = t1
+        event["end_time"] = t2
+        return event
+
+    def recent(self, n=5):
+        return list(self.events)[-n:]
+
+
+class DivergenceRegistry:
+    """One DivergenceTracker per key, fed only the closed bars it hasn't seen."""
+
+    def __init__(self, maxsize=256, **tracker_args):
+        self.maxsize = maxsize
+        self.tracker_args = tracker_args
+        self._trackers = OrderedDict()
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def sync(self, key, df, rsi):
+        """
+        `df` is an OHLC frame whose last row may still be forming and `rsi`
+        the matching RSI values; returns the tracker.
+        """
+        with self._lock:
+            tracker = self._trackers.get(key)
+            idx = df.index
+            closed = len(df) - 1
+            start = None
+            if tracker is not None and tracker.last_ts is not None:
+                pos = idx.searchsorted(tracker.last_ts, side="right")
+                if pos > 0 and idx[pos - 1] == tracker.last_ts:
+                    start = pos
+            if start is None:
+                tracker = DivergenceTracker(**self.tracker_args)
+                start = 0
+                self.rebuilds += 1
+
+            low = df["Low"].to_numpy(dtype=float)
+            high = df["High"].to_numpy(dtype=float)
+            rsi = np.asarray(rsi, dtype=float)
+            for i in range(start, closed):
+                tracker.update(idx[i], low[i], high[i], rsi[i])
+
+            self._trackers[key] = tracker
+            self._trackers.move_to_end(key)
+            while len(self._trackers) > self.maxsize:
+                self._trackers.popitem(last=False)
+            return tracker
+
+    def clear(self):
+        with self._lock:
+            self._trackers.clear()
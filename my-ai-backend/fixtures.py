@@ -0,0 +1,206 @@
+"""
+Recorded market data for offline runs (bench.py, local debugging).
+
+    <root>/bars/<symbol>/<interval>.csv   OHLCV indexed by bar open time
+    <root>/ticks/<pair>.csv               seconds since capture start, price
+
+    python fixtures.py record GC=F BTC-USD --seconds 120   # Yahoo bars + Binance trades
+    python fixtures.py synth GC=F BTC-USD                  # seeded random walk, no network
+
+`FixtureSource` replays a fixture directory behind the same calls main.py
+makes upstream (see main.use_market_source).
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import _safe_name
+from price_client import binance_pair
+from strategy import MODE_PARAMS
+
+# Yahoo treats these interval names as the same bars
+ALIASES = {"1h": "60m", "60m": "1h"}
+
+# Timeframes main.py reads besides the per-mode ones: /analyze summary,
+# previous close and the get_data_safe fallback
+EXTRA_TIMEFRAMES = (("1h", "2d"), ("1d", "5d"), ("60m", "1mo"))
+
+BAR_SECONDS = {"1m": 60, "15m": 900, "60m": 3600, "1h": 3600, "1d": 86400}
+
+
+def timeframes():
+    """(interval, period) pairs the analysis endpoints download, deduplicated."""
+    pairs = []
+    for p in MODE_PARAMS.values():
+        pairs += [(p["interval"], p["period"]), (p["htf_interval"], p["htf_period"])]
+    pairs += EXTRA_TIMEFRAMES
+    seen, out = set(), []
+    for interval, period in pairs:
+        key = ALIASES.get(interval, interval)
+        if key not in seen:
+            seen.add(key)
+            out.append((interval, period))
+    return out
+
+
+class FixtureSource:
+    """Bars and prices read from a fixture directory (layout above)."""
+
+    name = "fixture"
+
+    def __init__(self, root):
+        self.root = root
+        self._bars = {}
+        self._ticks = {}
+
+    def _bar_path(self, symbol, interval):
+        return os.path.join(self.root, "bars", _safe_name(symbol), f"{_safe_name(interval)}.csv")
+
+    def frame(self, symbol, interval):
+        """The whole recorded frame for (symbol, interval), or None."""
+        key = (symbol, interval)
+        if key not in self._bars:
+            df = None
+            for name in (interval, ALIASES.get(interval)):
+                path = name and self._bar_path(symbol, name)
+                if path and os.path.exists(path):
+                    df = pd.read_csv(path, index_col=0, parse_dates=True)
+                    break
+            self._bars[key] = df
+        return self._bars[key]
+
+    def bars(self, symbol, interval, period=None, start=None):
+        """Same contract as bar_history.yahoo_source; `period` returns everything recorded."""
+        df = self.frame(symbol, interval)
+        if df is None:
+            return pd.DataFrame()
+        if start is not None:
+            df = df[df.index >= start]
+        return df.copy()
+
+    def bulk_bars(self, symbols, interval, period):
+        """Same contract as bar_history.yahoo_bulk_source."""
+        out = {}
+        for symbol in symbols:
+            df = self.bars(symbol, interval, period)
+            if not df.empty:
+                out[symbol] = df
+        return out
+
+    def ticks(self, pair):
+        """(seconds, price) arrays of the recorded trades for a Binance pair."""
+        if pair not in self._ticks:
+            path = os.path.join(self.root, "ticks", f"{_safe_name(pair)}.csv")
+            if os.path.exists(path):
+                data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+                self._ticks[pair] = (data[:, 0], data[:, 1])
+            else:
+                self._ticks[pair] = (np.empty(0), np.empty(0))
+        return self._ticks[pair]
+
+    def price(self, symbol):
+        """Last recorded trade of the symbol's Binance pair (None like the live feed without one)."""
+        pair = binance_pair(symbol)
+        if pair is None:
+            return None
+        _, prices = self.ticks(pair)
+        return float(prices[-1]) if len(prices) else None
+
+
+def write_bars(root, symbol, interval, df):
+    path = os.path.join(root, "bars", _safe_name(symbol))
+    os.makedirs(path, exist_ok=True)
+    df[["Open", "High", "Low", "Close", "Volume"]].to_csv(os.path.join(path, f"{_safe_name(interval)}.csv"))
+
+
+def write_ticks(root, pair, seconds, prices):
+    path = os.path.join(root, "ticks")
+    os.makedirs(path, exist_ok=True)
+    data = np.column_stack([np.asarray(seconds, dtype=float), np.asarray(prices, dtype=float)])
+    np.savetxt(os.path.join(path, f"{_safe_name(pair)}.csv"), data, delimiter=",",
+               header="seconds,price", comments="", fmt=["%.6f", "%.8g"])
+
+
+def synthesize(root, symbols, bars=1500, ticks=5000, seed=0, end="2026-01-02"):
+    """Seeded random-walk fixtures with the recorder's layout; nothing is downloaded."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end, tz="UTC")
+    for symbol in symbols:
+        base = 2000.0 if binance_pair(symbol) == "PAXGUSDT" else 60000.0
+        for interval, _ in timeframes():
+            step = BAR_SECONDS[interval]
+            index = pd.date_range(end=end, periods=bars, freq=pd.Timedelta(seconds=step), name="Datetime")
+            vol = base * 0.0008 * np.sqrt(step / 900)
+            close = base + np.cumsum(rng.normal(0, vol, bars))
+            open_ = np.concatenate([[close[0]], close[:-1]]) + rng.normal(0, vol * 0.2, bars)
+            high = np.maximum(open_, close) + rng.uniform(0, vol, bars)
+            low = np.minimum(open_, close) - rng.uniform(0, vol, bars)
+            volume = rng.integers(100, 10000, bars).astype(float)
+            df = pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+            write_bars(root, symbol, interval, df)
+        pair = binance_pair(symbol)
+        if pair:
+            seconds = np.cumsum(rng.exponential(0.05, ticks))
+            prices = base + np.cumsum(rng.choice([-0.01, 0.0, 0.01], ticks) * base * 0.001)
+            write_ticks(root, pair, seconds, prices)
+
+
+def record(root, symbols, seconds=60.0):
+    """Download the bars main.py uses for `symbols` and capture `seconds` of Binance trades."""
+    from bar_history import yahoo_source
+    from price_stream import PriceStream
+
+    for symbol in symbols:
+        for interval, period in timeframes():
+            df = yahoo_source(symbol, interval, period=period)
+            if df is not None and not df.empty:
+                write_bars(root, symbol, interval, df)
+                print(f"{symbol} {interval}: {len(df)} bars")
+
+    pairs = sorted({binance_pair(s) for s in symbols} - {None})
+    if not pairs:
+        return
+
+    async def capture():
+        stream = PriceStream(pairs)
+        updates = stream.subscribe()
+        task = asyncio.create_task(stream.run())
+        trades = {pair: [] for pair in pairs}
+        start = time.monotonic()
+        try:
+            while (left := seconds - (time.monotonic() - start)) > 0:
+                try:
+                    pair, price = await asyncio.wait_for(updates.get(), left)
+                except asyncio.TimeoutError:
+                    break
+                trades[pair].append((time.monotonic() - start, price))
+        finally:
+            task.cancel()
+        return trades
+
+    for pair, rows in asyncio.run(capture()).items():
+        if rows:
+            write_ticks(root, pair, *zip(*rows))
+        print(f"{pair}: {len(rows)} price changes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["record", "synth"])
+    parser.add_argument("symbols", nargs="+", help="Yahoo tickers, e.g. GC=F BTC-USD")
+    parser.add_argument("--root", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures"))
+    parser.add_argument("--seconds", type=float, default=60.0, help="tick capture length (record)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.root, args.symbols, args.seconds)
+    else:
+        synthesize(args.root, args.symbols, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from ohlcv_cache import next_bar_due
+
+# Used by the backtester to rebuild HTF series from replayed bars
+RESAMPLE_RULES = {"60m": "60min", "1h": "60min", "4h": "240min", "1d": "1D", "1wk": "W"}
+
+OHLCV_AGG = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+
+def resample_ohlcv(df, interval):
+    """Aggregate lower-timeframe bars into `interval` bars (empty buckets dropped)."""
+    agg = {col: how for col, how in OHLCV_AGG.items() if col in df.columns}
+    out = df.resample(RESAMPLE_RULES[interval], label="left", closed="left").agg(agg)
+    return out.dropna(subset=["Close"])
+
+
+class HTFContext:
+    """
+    Higher-timeframe trend (close vs EMA200) shared across modes and requests.
+
+    HTF bars come from `load`, whose cache and incremental bar store keep
+    repeat calls cheap. The trend per (symbol, HTF interval) is cached until
+    the next HTF bar is due, so modes sharing an HTF (daytrade and swing both
+    read 1d/1y) compute it once.
+
+    HTF series are not rebuilt from the base timeframe: with the periods in
+    MODE_PARAMS (15m/5d, 60m/1mo) a resample yields about 120 hourly or 22
+    daily bars, far short of the 200 an EMA200 needs.
+
+      load(symbol, interval, period) -> (df, label)   e.g. get_data_safe
+    """
+
+    def __init__(self, load, indicators, clock=time.time):
+        self.load = load
+        self.indicators = indicators
+        self.clock = clock
+        self._trends = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def trend(self, symbol, interval, period):
+        key = (symbol, interval)
+        now = self.clock()
+        with self._lock:
+            cached = self._trends.get(key)
+            if cached is not None and now < cached[0]:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        trend = "NEUTRAL"
+        df, label = self.load(symbol, interval, period)
+        if df is not None and len(df) >= 50:
+            ind = self.indicators.sync((symbol, label), df, columns=())
+            price = df['Close'].iloc[-1]
+            ema200 = ind.values['EMA_200']
+            if price > ema200: trend = "ULLISH"
+            elif price < ema200: trend = "EARISH"
+
+        with self._lock:
+            self._trends[key] = (next_bar_due(interval, now), trend)
+        return trend
+
+    def clear(self):
+        with self._lock:
+            self._trends.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._trends)}
@@ -0,0 +1,596 @@
+"""
+Incremental versions of the pandas_ta indicators used by analyze_dynamic.
+
+Each indicator keeps its recursive state (Wilder/EMA smoothing, short rolling
+windows) so a new bar costs O(1) regardless of how long the history is. The
+formulas follow pandas_ta 0.3.x defaults:
+  ATRr_14   rma(true_range, 14)
+  RSI_14    100 * rma(gain) / (rma(gain) + |rma(loss)|)
+  ADX_14    rma(dx, 14) with DMP/DMN scaled by 100 / ATR
+  EMA_n     SMA-seeded ewm(span=n, adjust=False)
+  BBands    SMA20 +/- 2 * population std (ddof=0)
+  StochRSI  k = sma3(100 * (rsi - min14) / (max14 - min14)), d = sma3(k)
+where rma is ewm(alpha=1/n, adjust=True, min_periods=n).
+
+`LazyIndicators` is the stateless alternative for one request: each
+indicator is computed on first read, over just enough trailing bars for its
+smoothing to forget the starting point (see LAZY_TOLERANCE).
+"""
+import copy
+import math
+import sys
+import threading
+from collections import OrderedDict, deque
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+COLUMNS = [
+    "ATRr_14", "RSI_14", "ADX_14", "DMP_14", "DMN_14", "EMA_50", "EMA_200",
+    "BBL_20_2.0", "BBM_20_2.0", "BBU_20_2.0",
+    "STOCHRSIk_14_14_3_3", "STOCHRSId_14_14_3_3",
+]
+
+
+def _isnan(x):
+    return x != x
+
+
+class RMA:
+    """pandas `ewm(alpha=1/length, adjust=True, min_periods=length).mean()`"""
+
+    def __init__(self, length):
+        self.decay = 1.0 - 1.0 / length
+        self.min_periods = length
+        self.num = 0.0
+        self.den = 0.0
+        self.nobs = 0
+        self.value = NAN
+
+    def update(self, x):
+        if _isnan(x):
+            # ignore_na=False: a gap still ages the older observations
+            if self.nobs:
+                self.num *= self.decay
+                self.den *= self.decay
+            return self.value
+        self.num = self.num * self.decay + x
+        self.den = self.den * self.decay + 1.0
+        self.nobs += 1
+        if self.nobs >= self.min_periods:
+            self.value = self.num / self.den
+        return self.value
+
+    def clone(self):
+        return copy.copy(self)
+
+
+class EMA:
+    """pandas_ta ema: first value is the SMA of `length` closes, then ewm(adjust=False)"""
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed = []
+        self.value = NAN
+
+    def update(self, x):
+        if self.seed is not None:
+            self.seed.append(x)
+            if len(self.seed) == self.length:
+                self.value = sum(self.seed) / self.length
+                self.seed = None
+            return self.value
+        self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def clone(self):
+        other = copy.copy(self)
+        if self.seed is not None:
+            other.seed = list(self.seed)
+        return other
+
+
+class Window:
+    """Fixed-size rolling window; outputs NaN until it holds `length` values."""
+
+    def __init__(self, length):
+        self.length = length
+        self.values = deque(maxlen=length)
+
+    def update(self, x):
+        if not _isnan(x):
+            self.values.append(x)
+        return self
+
+    def clone(self):
+        other = copy.copy(self)
+        other.values = self.values.copy()
+        return other
+
+    @property
+    def full(self):
+        return len(self.values) == self.length
+
+    def mean(self):
+        return sum(self.values) / self.length if self.full else NAN
+
+    def std(self, ddof=0):
+        if not self.full:
+            return NAN
+        m = sum(self.values) / self.length
+        return (sum((v - m) ** 2 for v in self.values) / (self.length - ddof)) ** 0.5
+
+    def min(self):
+        return min(self.values) if self.full else NAN
+
+    def max(self):
+        return max(self.values) if self.full else NAN
+
+
+class _State:
+    def __init__(self, tail):
+        self.prev_high = NAN
+        self.prev_low = NAN
+        self.prev_close = NAN
+        self.atr = RMA(14)
+        self.gain = RMA(14)
+        self.loss = RMA(14)
+        self.dm_pos = RMA(14)
+        self.dm_neg = RMA(14)
+        self.adx = RMA(14)
+        self.ema50 = EMA(50)
+        self.ema200 = EMA(200)
+        self.bb = Window(20)
+        self.stoch_rsi = Window(14)
+        self.stoch_k = Window(3)
+        self.stoch_d = Window(3)
+        self.values = dict.fromkeys(COLUMNS, NAN)
+        self.history = {col: deque(maxlen=tail) for col in COLUMNS}
+
+    def clone(self):
+        # Hand-rolled copy: deepcopy is ~20x slower and runs on every request
+        other = copy.copy(self)
+        for name, attr in vars(self).items():
+            if hasattr(attr, "clone"):
+                setattr(other, name, attr.clone())
+        other.values = dict(self.values)
+        other.history = {col: hist.copy() for col, hist in self.history.items()}
+        return other
+
+    def apply(self, high, low, close):
+        pc, ph, pl = self.prev_close, self.prev_high, self.prev_low
+        v = self.values
+
+        tr = NAN if _isnan(pc) else max(high - low, abs(high - pc), abs(pc - low))
+        atr = self.atr.update(tr)
+        v["ATRr_14"] = atr
+
+        diff = close - pc
+        gain = self.gain.update(NAN if _isnan(diff) else max(diff, 0.0))
+        loss = self.loss.update(NAN if _isnan(diff) else min(diff, 0.0))
+        denom = gain + abs(loss)
+        rsi = 100.0 * gain / denom if denom else NAN
+        v["RSI_14"] = rsi
+
+        up = high - ph
+        dn = pl - low
+        if _isnan(up):
+            pos = neg = NAN
+        else:
+            pos = up if (up > dn and up > 0) else 0.0
+            neg = dn if (dn > up and dn > 0) else 0.0
+        dmp = self.dm_pos.update(pos)
+        dmn = self.dm_neg.update(neg)
+        if atr and not _isnan(atr):
+            dmp = 100.0 * dmp / atr
+            dmn = 100.0 * dmn / atr
+        else:
+            dmp = dmn = NAN
+        dx = 100.0 * abs(dmp - dmn) / (dmp + dmn) if (dmp + dmn) else NAN
+        v["DMP_14"] = dmp
+        v["DMN_14"] = dmn
+        v["ADX_14"] = self.adx.update(dx)
+
+        v["EMA_50"] = self.ema50.update(close)
+        v["EMA_200"] = self.ema200.update(close)
+
+        self.bb.update(close)
+        mid = self.bb.mean()
+        std = self.bb.std(ddof=0)
+        v["BBL_20_2.0"] = mid - 2.0 * std
+        v["BBM_20_2.0"] = mid
+        v["BBU_20_2.0"] = mid + 2.0 * std
+
+        self.stoch_rsi.update(rsi)
+        lo, hi = self.stoch_rsi.min(), self.stoch_rsi.max()
+        rng = hi - lo
+        stoch = 100.0 * (rsi - lo) / (rng if rng else sys.float_info.epsilon)
+        k = self.stoch_k.update(stoch).mean()
+        v["STOCHRSIk_14_14_3_3"] = k
+        v["STOCHRSId_14_14_3_3"] = self.stoch_d.update(k).mean()
+
+        for col, hist in self.history.items():
+            hist.append(v[col])
+
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+
+def _rma(s, length):
+    return s.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def _ema(close, length):
+    seeded = close.copy()
+    seeded.iloc[: length - 1] = NAN
+    if len(close) >= length:
+        seeded.iloc[length - 1] = close.iloc[:length].mean()
+    return seeded.ewm(span=length, adjust=False).mean()
+
+
+def indicator_frame(df):
+    """
+    Every column in COLUMNS for a whole frame, computed with vectorized pandas.
+    Gives the same values as streaming the bars through IndicatorEngine; meant
+    for replays over long histories where per-bar updates are too slow.
+    """
+    h = df["High"].astype(float)
+    l = df["Low"].astype(float)
+    c = df["Close"].astype(float)
+    pc = c.shift(1)
+    tr = pd.concat([h - l, h - pc, pc - l], axis=1).abs().max(axis=1)
+    tr.iloc[:1] = NAN
+    atr = _rma(tr, 14)
+
+    diff = c.diff()
+    gain = _rma(diff.clip(lower=0), 14)
+    loss = _rma(diff.clip(upper=0), 14)
+    rsi = 100.0 * gain / (gain + loss.abs())
+
+    up = h - h.shift(1)
+    dn = l.shift(1) - l
+    pos = ((up > dn) & (up > 0)) * up
+    neg = ((dn > up) & (dn > 0)) * dn
+    pos.iloc[:1] = NAN
+    neg.iloc[:1] = NAN
+    dmp = 100.0 * _rma(pos, 14) / atr
+    dmn = 100.0 * _rma(neg, 14) / atr
+    adx = _rma(100.0 * (dmp - dmn).abs() / (dmp + dmn), 14)
+
+    mid = c.rolling(20).mean()
+    std = c.rolling(20).std(ddof=0)
+    lo, hi = rsi.rolling(14).min(), rsi.rolling(14).max()
+    rng = (hi - lo).replace(0.0, sys.float_info.epsilon)
+    k = (100.0 * (rsi - lo) / rng).rolling(3).mean()
+    return pd.DataFrame({
+        "ATRr_14": atr, "RSI_14": rsi, "ADX_14": adx, "DMP_14": dmp, "DMN_14": dmn,
+        "EMA_50": _ema(c, 50), "EMA_200": _ema(c, 200),
+        "BBL_20_2.0": mid - 2.0 * std, "BBM_20_2.0": mid, "BBU_20_2.0": mid + 2.0 * std,
+        "STOCHRSIk_14_14_3_3": k, "STOCHRSId_14_14_3_3": k.rolling(3).mean(),
+    }, index=df.index)
+
+
+class IndicatorEngine:
+    """
+    Streams bars through every indicator. Updating with the same timestamp as
+    the last bar recomputes that (still forming) candle instead of appending.
+    Bars passed with `closed=True` skip the snapshot needed for that rollback,
+    which keeps bulk warm-up cheap.
+    """
+
+    def __init__(self, tail=64):
+        self.tail = tail
+        self._state = _State(tail)
+        self._base = None   # state before the forming candle, if any
+        self.last_ts = None
+        self.bars = 0
+
+    def update(self, ts, high, low, close, closed=False):
+        if ts == self.last_ts:
+            if self._base is None:
+                raise ValueError(f"bar {ts} was already closed")
+            self._state = self._base
+        else:
+            self.last_ts = ts
+            self.bars += 1
+        self._base = None if closed else self._state.clone()
+        self._state.apply(float(high), float(low), float(close))
+        return self._state.values
+
+    @property
+    def values(self):
+        return dict(self._state.values)
+
+    def column(self, name, n):
+        """Last `n` values of an indicator, NaN-padded like a DataFrame column."""
+        hist = list(self._state.history[name])[-n:]
+        return np.array([NAN] * (n - len(hist)) + hist, dtype=float)
+
+
+class IndicatorSnapshot:
+    """
+    Read-only copy of an engine's latest values and of the `columns` tails a
+    caller reads, taken under the registry lock. Another request syncing the
+    same engine (e.g. rolling back the forming candle) can't change it.
+    """
+
+    __slots__ = ("values", "_columns")
+
+    def __init__(self, engine, columns):
+        self.values = MappingProxyType(engine.values)
+        self._columns = {}
+        for name in columns:
+            hist = np.array(engine._state.history[name], dtype=float)
+            hist.flags.writeable = False
+            self._columns[name] = hist
+
+    def column(self, name, n):
+        """Last `n` values of a captured indicator, NaN-padded like IndicatorEngine.column."""
+        hist = self._columns[name][-n:]
+        out = np.full(n, NAN)
+        if len(hist):
+            out[n - len(hist):] = hist
+        return out
+
+
+# A tail window is long enough once the weight left on its starting point
+# has decayed below this factor; values then match a full-history run to
+# about LAZY_TOLERANCE times the price move between the two starting points.
+LAZY_TOLERANCE = 1e-6
+
+
+def settle_bars(decay, tolerance=LAZY_TOLERANCE):
+    """Bars until `decay ** bars` drops below `tolerance`."""
+    return math.ceil(math.log(tolerance) / math.log(decay))
+
+
+def _group(col):
+    if col.startswith("BB"):
+        return "bb"
+    if col.startswith("STOCHRSI"):
+        return "stoch"
+    if col in ("ADX_14", "DMP_14", "DMN_14"):
+        return "adx"
+    return {"ATRr_14": "atr", "RSI_14": "rsi", "EMA_50": "ema50", "EMA_200": "ema200"}[col]
+
+
+def _decay_filter(x, decay, chunk=64):
+    """
+    y[t] = decay * y[t-1] + x[t] with y[-1] = 0, vectorized per chunk;
+    chunks stay short enough that decay ** -chunk is well conditioned.
+    """
+    y = np.empty(len(x))
+    powers = decay ** np.arange(chunk)
+    inverse = 1.0 / powers
+    carry = 0.0
+    for start in range(0, len(x), chunk):
+        xs = x[start:start + chunk]
+        k = len(xs)
+        y[start:start + k] = powers[:k] * (carry * decay + np.cumsum(xs * inverse[:k]))
+        carry = y[start + k - 1]
+    return y
+
+
+def _rma_array(x, length, out):
+    """RMA over an array: NaNs age the sum without adding to it."""
+    valid = ~np.isnan(x)
+    decay = 1.0 - 1.0 / length
+    num = _decay_filter(np.where(valid, x, 0.0), decay)
+    den = _decay_filter(valid.astype(float), decay)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:] = np.where(np.cumsum(valid) >= length, num / den, NAN)
+
+
+def _ema_array(x, length, out):
+    """EMA over an array: SMA of the first `length` values, then ewm(adjust=False)."""
+    out[:] = NAN
+    if len(x) < length:
+        return
+    alpha = 2.0 / (length + 1)
+    inputs = alpha * x[length - 1:]
+    inputs[0] = x[:length].mean()
+    out[length - 1:] = _decay_filter(inputs, 1.0 - alpha)
+
+
+class LazyIndicators:
+    """
+    The COLUMNS of one frame, each computed on its first read (`ind[name]`,
+    `ind.column(name, n)`) over a trailing window sized by `settle_bars`, into
+    one buffer allocated up front. Nothing is kept between requests, and
+    indicators the caller never reads (EMA_200, StochRSI outside scalping)
+    are never computed. Mirrors the IndicatorEngine interface used by
+    analyze_dynamic (`values`, `column`).
+    """
+
+    def __init__(self, df, tail=64, tolerance=LAZY_TOLERANCE):
+        self.tail = tail
+        # Every one of the last `tail` values (what `column` returns) is settled
+        rma = settle_bars(1.0 - 1.0 / 14, tolerance) + 15 + tail  # +1 bar for the previous close
+        self.windows = {
+            "atr": rma,
+            "rsi": rma,
+            "adx": 2 * rma - tail,  # rma of values that are themselves rma-smoothed
+            "ema50": settle_bars(1.0 - 2.0 / 51, tolerance) + 50 + tail,
+            "ema200": settle_bars(1.0 - 2.0 / 201, tolerance) + 200 + tail,
+            "bb": 20 + tail,
+            "stoch": rma + 18,
+        }
+        n = len(df)
+        self.size = min(n, max(self.windows.values()))
+        self._high = df["High"].to_numpy(dtype=float)[n - self.size:]
+        self._low = df["Low"].to_numpy(dtype=float)[n - self.size:]
+        self._close = df["Close"].to_numpy(dtype=float)[n - self.size:]
+        self._rows = np.full((len(COLUMNS), self.size), NAN)
+        self.computed = set()
+
+    @property
+    def values(self):
+        return self
+
+    def __getitem__(self, name):
+        row = self._row(name)
+        return float(row[-1]) if len(row) else NAN
+
+    def column(self, name, n):
+        """Last `n` values (at most `tail`), NaN-padded like IndicatorEngine.column."""
+        row = self._row(name)[-min(n, self.tail):]
+        out = np.full(n, NAN)
+        if len(row):
+            out[n - len(row):] = row
+        return out
+
+    def _row(self, name):
+        group = _group(name)
+        if group not in self.computed:
+            getattr(self, "_" + group)(min(self.size, self.windows[group]))
+            self.computed.add(group)
+        return self._rows[COLUMNS.index(name)]
+
+    def _out(self, name, w):
+        return self._rows[COLUMNS.index(name), self.size - w:]
+
+    def _prev_close(self, w):
+        c = self._close[self.size - w:]
+        pc = np.empty(w)
+        pc[:1] = NAN
+        pc[1:] = c[:-1]
+        return c, pc
+
+    def _true_range(self, w):
+        h, l = self._high[self.size - w:], self._low[self.size - w:]
+        _, pc = self._prev_close(w)
+        return np.maximum(h - l, np.maximum(np.abs(h - pc), np.abs(pc - l)))
+
+    def _rsi_series(self, w, out):
+        c, pc = self._prev_close(w)
+        diff = c - pc
+        gain, loss = np.empty(w), np.empty(w)
+        _rma_array(np.where(np.isnan(diff), NAN, np.maximum(diff, 0.0)), 14, gain)
+        _rma_array(np.where(np.isnan(diff), NAN, np.minimum(diff, 0.0)), 14, loss)
+        denom = gain + np.abs(loss)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[:] = np.where(denom != 0, 100.0 * gain / denom, NAN)
+        return out
+
+    def _atr(self, w):
+        _rma_array(self._true_range(w), 14, self._out("ATRr_14", w))
+
+    def _rsi(self, w):
+        self._rsi_series(w, self._out("RSI_14", w))
+
+    def _adx(self, w):
+        h, l = self._high[self.size - w:], self._low[self.size - w:]
+        atr = np.empty(w)
+        _rma_array(self._true_range(w), 14, atr)
+        up = np.empty(w)
+        dn = np.empty(w)
+        up[:1] = dn[:1] = NAN
+        up[1:] = h[1:] - h[:-1]
+        dn[1:] = l[:-1] - l[1:]
+        pos = np.where((up > dn) & (up > 0), up, 0.0)
+        neg = np.where((dn > up) & (dn > 0), dn, 0.0)
+        pos[:1] = neg[:1] = NAN
+        dmp, dmn = self._out("DMP_14", w), self._out("DMN_14", w)
+        _rma_array(pos, 14, dmp)
+        _rma_array(neg, 14, dmn)
+        valid = ~np.isnan(atr) & (atr != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dmp[:] = np.where(valid, 100.0 * dmp / atr, NAN)
+            dmn[:] = np.where(valid, 100.0 * dmn / atr, NAN)
+            total = dmp + dmn
+            dx = np.where(total != 0, 100.0 * np.abs(dmp - dmn) / total, NAN)
+        _rma_array(dx, 14, self._out("ADX_14", w))
+
+    def _ema50(self, w):
+        _ema_array(self._close[self.size - w:], 50, self._out("EMA_50", w))
+
+    def _ema200(self, w):
+        _ema_array(self._close[self.size - w:], 200, self._out("EMA_200", w))
+
+    def _bb(self, w):
+        if w < 20:
+            return
+        window = np.lib.stride_tricks.sliding_window_view(self._close[self.size - w:], 20)
+        mid = window.mean(axis=1)
+        std = window.std(axis=1)
+        self._out("BBM_20_2.0", w)[19:] = mid
+        self._out("BBL_20_2.0", w)[19:] = mid - 2.0 * std
+        self._out("BBU_20_2.0", w)[19:] = mid + 2.0 * std
+
+    def _stoch(self, w):
+        rsi = self._rsi_series(w, np.empty(w))
+        k_out, d_out = self._out("STOCHRSIk_14_14_3_3", w), self._out("STOCHRSId_14_14_3_3", w)
+        valid = ~np.isnan(rsi)
+        first = int(valid.argmax())
+        if valid[first:].all() and w - first >= 18:
+            # NaN only during warm-up (the usual case): plain sliding windows
+            rsi = rsi[first:]
+            windows = np.lib.stride_tricks.sliding_window_view(rsi, 14)
+            lo, hi = windows.min(axis=1), windows.max(axis=1)
+            rng = hi - lo
+            stoch = 100.0 * (rsi[13:] - lo) / np.where(rng != 0, rng, sys.float_info.epsilon)
+            k = np.lib.stride_tricks.sliding_window_view(stoch, 3).mean(axis=1)
+            k_out[first + 15:] = k
+            d_out[first + 17:] = np.lib.stride_tricks.sliding_window_view(k, 3).mean(axis=1)
+            return
+        rsi_window, k_window, d_window = Window(14), Window(3), Window(3)
+        for i, r in enumerate(rsi.tolist()):
+            rsi_window.update(r)
+            lo, hi = rsi_window.min(), rsi_window.max()
+            rng = hi - lo
+            k = k_window.update(100.0 * (r - lo) / (rng if rng else sys.float_info.epsilon)).mean()
+            k_out[i] = k
+            d_out[i] = d_window.update(k).mean()
+
+
+class IndicatorRegistry:
+    """One IndicatorEngine per key (e.g. symbol + timeframe), LRU bounded."""
+
+    def __init__(self, maxsize=256, tail=64):
+        self.maxsize = maxsize
+        self.tail = tail
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def sync(self, key, df, columns=None):
+        """
+        Feed bars of `df` the engine hasn't seen yet and return an
+        IndicatorSnapshot with its values and the tails of `columns` (all
+        indicators when None).
+        """
+        with self._lock:
+            engine = self._engines.get(key)
+            idx = df.index
+            start = None
+            if engine is not None and engine.last_ts is not None and len(idx):
+                try:
+                    start = idx.get_loc(engine.last_ts)
+                except KeyError:
+                    start = None
+                if not isinstance(start, (int, np.integer)):
+                    start = None
+            if start is None:
+                engine = IndicatorEngine(self.tail)
+                start = 0
+                self.rebuilds += 1
+
+            high = df["High"].to_numpy(dtype=float)
+            low = df["Low"].to_numpy(dtype=float)
+            close = df["Close"].to_numpy(dtype=float)
+            last = len(df) - 1
+            for i in range(start, len(df)):
+                engine.update(idx[i], high[i], low[i], close[i], closed=i < last)
+
+            self._engines[key] = engine
+            self._engines.move_to_end(key)
+            while len(self._engines) > self.maxsize:
+                self._engines.popitem(last=False)
+            return IndicatorSnapshot(engine, COLUMNS if columns is None else columns)
+
+    def clear(self):
+        with self._lock:
+            self._engines.clear()
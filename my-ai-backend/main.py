@@ -1,12 +1,36 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import yfinance as yf
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import pandas as pd
-import pandas_ta as ta
-import requests
 import asyncio
+import importlib
 import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ohlcv_cache import OHLCVCache
+from bar_history import YAHOO_INTRADAY_LIMITS, IncrementalBarStore, yahoo_bulk_source, yahoo_source
+from columnar_store import ColumnarBarStore
+from htf_context import HTFContext
+from singleflight import SingleFlight
+from price_client import PriceClient
+from price_stream import PriceStream, BINANCE_WS_URL
+from ws_hub import SubscriptionHub
+from tick_frames import TickEncoder, WIRE_MODES
+from snapshots import SnapshotScheduler
+from strategy import MODE_PARAMS, mode_params
+from metrics import REGISTRY, timed
+from analysis import (
+    STAGE_ERRORS, STAGE_SECONDS, compute_analysis, compute_analysis_captured, divergence_trackers,
+    indicator_engines, record_stages,
+)
+from compute import BoundedExecutor, ProcessComputePool
+from providers import ProviderRegistry, route
+from warmup import Warmup
+from bus import LocalBus, SocketBus
 
 app = FastAPI()
 
@@ -18,123 +42,469 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Metrics (METRICS=0 turns every instrument into a no-op) ---
+metrics = REGISTRY
+UPSTREAM_SECONDS = metrics.histogram("upstream_request_seconds", "Market data downloads", ["source"])
+UPSTREAM_ERRORS = metrics.counter("upstream_errors_total", "Failed market data calls", ["source"])
+
 class AnalysisRequest(BaseModel):
     symbol: str
     mode: str 
 
-# --- WebSocket Manager ---
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+MAX_BATCH_ITEMS = 60
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+class BatchAnalysisRequest(BaseModel):
+    # Larger batches are rejected with a 422 rather than cut short silently
+    items: list[AnalysisRequest] = Field(max_length=MAX_BATCH_ITEMS)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+# Shared keep-alive pool for Binance ticker calls
+price_client = PriceClient(max_connections=10, max_concurrency=8, timeout=2.0)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                self.disconnect(connection)
+# "stream" = Binance push feed (default), "poll" = 1s REST polling
+PRICE_FEED = os.getenv("PRICE_FEED", "stream")
+price_stream = PriceStream(["PAXGUSDT", "BTCUSDT"], url=os.getenv("BINANCE_WS_URL", BINANCE_WS_URL))
+
+# Shared by the uvicorn workers: with BUS_URL=unix:/path/bus.sock one worker
+# per topic (and one for the Binance stream and the snapshot scheduler) talks
+# to upstream and publishes, every worker fans out to its own sockets.
+BUS_URL = os.getenv("BUS_URL", "local")
+bus = SocketBus(BUS_URL[len("unix:"):]) if BUS_URL.startswith("unix:") else LocalBus()
+TICKS_TOPIC = "_ticks"          # (pair, price) from the worker holding the Binance stream
+SNAPSHOTS_TOPIC = "_snapshots"  # (key, snapshot) after every scheduler recompute
+TRACK_TOPIC = "_track"          # (symbol, mode) someone streams signals for
+
+# Upstreams behind circuit breakers; get_data_safe hedges through the bulk endpoint and falls back to H1 bars
+providers = ProviderRegistry()
+
+def binance_rest_price(symbol):
+    # Sync entry point for threadpool handlers; runs on the shared async pool
+    price = price_client.get_price_blocking(symbol)
+    if price is None: raise LookupError(f"no Binance price for {symbol}")
+    return price
+
+async def binance_rest_price_async(symbol):
+    price = await price_client.get_price(symbol)
+    if price is None: raise LookupError(f"no Binance price for {symbol}")
+    return price
 
-manager = ConnectionManager()
+providers.add("binance", binance_rest_price, afn=binance_rest_price_async)
+
+# Set by use_market_source() to replace Binance with another price feed
+price_source = None
 
 def get_real_price(symbol):
+    if price_source is not None:
+        return price_source(symbol)
+    pair = route(symbol).price_pair
+    if pair is None: return None
+    # Prefer the streamed price when it's fresh, otherwise one REST call
+    if PRICE_FEED == "stream":
+        price = price_stream.latest_price(pair)
+        if price is not None: return price
+    try:
+        return providers.call("binance", symbol)
+    except Exception:
+        # Failed, or skipped while Binance's circuit is open: use the bar close
+        return None
+
+async def get_real_price_async(symbol):
+    """get_real_price without leaving the event loop."""
+    if price_source is not None:
+        return price_source(symbol)
+    pair = route(symbol).price_pair
+    if pair is None: return None
+    if PRICE_FEED == "stream":
+        price = price_stream.latest_price(pair)
+        if price is not None: return price
+    try:
+        return await providers.acall("binance", symbol)
+    except Exception:
+        return None
+
+# --- Realtime Price Producers ---
+def yahoo_symbol(symbol):
+    return route(symbol).history
+
+def get_previous_close(symbol):
     try:
-        if "GC=F" in symbol or "XAU" in symbol or "GOLD" in symbol:
-            url = "https://api.binance.com/api/v3/ticker/price?symbol=PAXGUSDT"
-            resp = requests.get(url, timeout=2) # Reduced timeout for speed
-            data = resp.json()
-            return float(data['price'])
-            
-        elif "BTC" in symbol:
-            url = "https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT"
-            resp = requests.get(url, timeout=2)
-            data = resp.json()
-            return float(data['price'])
-            
+        hist = fetch_history(yahoo_symbol(symbol), "1d", "5d")
+        if len(hist) >= 2:
+            return hist['Close'].iloc[-2] # Previous trading day
     except Exception as e:
-        print(f"Price Fetch Error: {e}")
-        
+        print(f"Previous Close Error ({symbol}): {e}")
     return None
 
-# --- Background Task for Realtime Price ---
-async def broadcast_price_loop():
-    print("Starting Broadcast Loop...")
-    previous_close = None
-    
-    # Try to fetch previous close initially
+def get_yahoo_last(symbol):
     try:
-        ticker = yf.Ticker("GC=F")
-        hist = ticker.history(period="5d")
+        hist = fetch_history(yahoo_symbol(symbol), "1m", "1d")
         if not hist.empty:
-            previous_close = hist['Close'].iloc[-2] # Previous trading day
-            print(f"Previous Close fetched: {previous_close}")
+            return float(hist['Close'].iloc[-1])
     except Exception as e:
-        print(f"Init Error: {e}")
+        print(f"Yahoo Price Error ({symbol}): {e}")
+    return None
 
-    while True:
+HEARTBEAT_SECONDS = 15 # Sent instead of ticks while the price is unchanged
+
+async def price_producer(symbol):
+    """One per subscribed symbol (started/stopped by the hub)."""
+    print(f"Starting price producer for {symbol}")
+    previous_close = await asyncio.to_thread(get_previous_close, symbol)
+    pair = route(symbol).price_pair
+    # Serializes each change once (json / delta / binary) for all subscribers
+    encoder = TickEncoder(symbol)
+
+    if pair and PRICE_FEED == "stream":
+        # Push mode: fan out whenever the streamed price changes
+        updates = price_stream.subscribe(pair)
         try:
-            # Fetch Gold Price
-            price = get_real_price("GC=F")
-            
-            if price:
-                # Calculate change if we have previous close
-                change = 0.0
-                percent = 0.0
-                if previous_close:
-                    change = price - previous_close
-                    percent = (change / previous_close) * 100
-
-                data = {
-                    "symbol": "GC=F",
-                    "price": round(price, 2),
-                    "change": round(change, 2),
-                    "percent": round(percent, 2),
-                    "timestamp": pd.Timestamp.now().isoformat()
-                }
-                await manager.broadcast(json.dumps(data))
-        except Exception as e:
-            print(f"Broadcast Error: {e}")
-        
-        await asyncio.sleep(1) # Update every 1 second
+            while True:
+                try:
+                    _, price = await asyncio.wait_for(updates.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    bus.publish(symbol, encoder.heartbeat())
+                    continue
+                frames = encoder.encode(price, previous_close)
+                if frames: bus.publish(symbol, frames)
+        finally:
+            price_stream.unsubscribe(updates)
+
+    last_sent = time.monotonic()
+    while True:
+        if pair:
+            price = await price_client.get_price(symbol)
+            delay = 1 # Binance REST every 1 second
+        else:
+            price = await asyncio.to_thread(get_yahoo_last, symbol)
+            delay = 5 # FX / other Yahoo symbols
+        frames = encoder.encode(price, previous_close) if price else None
+        if frames is None and time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+            frames = encoder.heartbeat()
+        if frames:
+            last_sent = time.monotonic()
+            bus.publish(symbol, frames)
+        await asyncio.sleep(delay)
+
+async def upstream_producer(topic):
+    # "SIGNAL:<symbol>:<mode>" topics carry analysis snapshots, anything else is a price
+    if topic.startswith("SIGNAL:"):
+        await signal_producer(topic)
+    else:
+        await price_producer(topic)
+
+async def topic_producer(topic):
+    """Relays the topic from the bus to this worker's sockets; the worker leading it also produces."""
+    updates = bus.subscribe(topic)
+
+    async def forward():
+        while True:
+            await hub.publish(topic, await updates.get())
+
+    tasks = {
+        asyncio.create_task(forward()),
+        asyncio.create_task(bus.lead(f"producer:{topic}", lambda: upstream_producer(topic))),
+    }
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()  # a crashed producer propagates, so the hub restarts it
+    finally:
+        for task in tasks:
+            task.cancel()
+        bus.unsubscribe(topic, updates)
+
+async def stream_prices():
+    """Held by one worker: the Binance connection, shared with the others through the bus."""
+    shared = {}
+
+    def share(pair, price):
+        # Changes right away, unchanged prices once a second to keep latest_price fresh
+        last = shared.get(pair)
+        now = time.monotonic()
+        if last is not None and last[0] == price and now - last[1] < 1.0:
+            return
+        shared[pair] = (price, now)
+        bus.publish(TICKS_TOPIC, (pair, price))
+
+    price_stream.on_price = share
+    try:
+        await price_stream.run()
+    finally:
+        price_stream.on_price = None
+
+async def relay(topic, handle):
+    updates = bus.subscribe(topic)
+    try:
+        while True:
+            handle(*await updates.get())
+    finally:
+        bus.unsubscribe(topic, updates)
+
+# Yahoo/dashboard ticker shapes: GC=F, BTC-USD, EURUSD=X, ^GSPC
+TICKER_RE = re.compile(r"\^?[A-Z0-9][A-Z0-9.\-]{0,14}(=[A-Z])?")
+
+def valid_topic(topic):
+    """Refuse made-up topics before they start a producer polling upstream."""
+    if topic.startswith("SIGNAL:"):
+        symbol, _, mode = topic[len("SIGNAL:"):].rpartition(":")
+        if mode.lower() not in MODE_TIMEFRAMES:
+            return False
+        topic = symbol
+    return TICKER_RE.fullmatch(topic) is not None
+
+hub = SubscriptionHub(topic_producer, accept=valid_topic,
+                      max_topics=int(os.getenv("WS_MAX_TOPICS", "200")))
+
+# --- Startup ---
+# Runs in the background after startup; /ready answers 503 until it's done.
+# WARMUP=0 skips it (the app is ready at once and fills caches on demand).
+WARMUP = os.getenv("WARMUP", "1") != "0"
+warmup = Warmup(timeout=float(os.getenv("WARMUP_TIMEOUT", "30")))
+
+async def warm_analysis(symbol, mode):
+    data = await run_analysis_async(symbol, mode)
+    if data: snapshot_scheduler.store(symbol, mode, data)
+
+async def warm_up():
+    """Archived or bulk-downloaded bars first, then one analysis per tracked (symbol, mode)."""
+    items = [AnalysisRequest(symbol=s, mode=m) for s in SNAPSHOT_SYMBOLS for m in MODE_TIMEFRAMES]
+    # yfinance is imported on first use, not with this module; pull it in now, off the loop
+    first = [("yfinance", lambda: run_io(importlib.import_module, "yfinance")),
+             ("bars", lambda: run_io(prefetch_history, items))]
+    if compute_pool is not None:
+        first.append(("compute_pool", compute_pool.start))
+    analyses = [
+        (f"analysis:{item.symbol}:{item.mode}", lambda item=item: warm_analysis(item.symbol, item.mode))
+        for item in items
+    ]
+    await warmup.run(first, analyses)
+
+async def background_start():
+    if WARMUP:
+        await warm_up()
+    else:
+        await warmup.run()
+    # Started afterwards so it doesn't recompute what the warm-up just stored;
+    # one worker recomputes, the others receive its snapshots
+    await bus.lead("snapshots", snapshot_scheduler.run)
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(broadcast_price_loop())
-
-@app.websocket("/ws/price/GC=F")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    await price_client.start()
+    await bus.start()
+    asyncio.create_task(relay(SNAPSHOTS_TOPIC, snapshot_scheduler.receive))
+    asyncio.create_task(relay(TRACK_TOPIC, snapshot_scheduler.track))
+    if PRICE_FEED == "stream":
+        asyncio.create_task(relay(TICKS_TOPIC, price_stream.ingest))
+        asyncio.create_task(bus.lead("price_stream", stream_prices))
+    for symbol in SNAPSHOT_SYMBOLS:
+        for mode in MODE_TIMEFRAMES:
+            snapshot_scheduler.track(symbol, mode, pinned=True)
+    asyncio.create_task(background_start())
+
+@app.get("/ready")
+def readiness():
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await price_client.close()
+    await bus.close()
+    if compute_pool is not None:
+        compute_pool.shutdown(wait=False)
+
+@app.websocket("/ws")
+async def websocket_hub(websocket: WebSocket):
+    # One connection, any set of symbols: {"action": "subscribe", "symbols": [...]}
+    # Optional ?mode=delta|binary for the compact wire formats
+    await websocket.accept()
+    hub.set_mode(websocket, websocket.query_params.get("mode", "json"))
+    try:
+        while True:
+            await hub.handle_message(websocket, await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(websocket)
+
+@app.websocket("/ws/price/{symbol}")
+async def websocket_endpoint(websocket: WebSocket, symbol: str):
+    await websocket.accept()
+    hub.set_mode(websocket, websocket.query_params.get("mode", "json"))
+    if not hub.subscribe(websocket, symbol):
+        hub.disconnect(websocket)
+        await websocket.close(code=1008) # unknown symbol or too many topics
+        return
     try:
         while True:
             await websocket.receive_text() # Keep connection alive
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    finally:
+        hub.disconnect(websocket)
+
+
+# --- Shared OHLCV Cache ---
+ohlcv_cache = OHLCVCache(maxsize=128)
+# Bars persist across restarts under BAR_STORE_DIR (set it empty to disable)
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bar_data"))
+bar_archive = ColumnarBarStore(BAR_STORE_DIR) if BAR_STORE_DIR else None
+bar_store = IncrementalBarStore(
+    source=timed(UPSTREAM_SECONDS, UPSTREAM_ERRORS, "yahoo")(providers.add("yahoo", yahoo_source)),
+    archive=bar_archive,
+    max_gap=YAHOO_INTRADAY_LIMITS,
+)
+# Identical concurrent analyses share one run; results live for a couple of seconds
+analysis_flight = SingleFlight(result_ttl=2.0)
+bulk_bar_source = timed(UPSTREAM_SECONDS, UPSTREAM_ERRORS, "yahoo_bulk")(providers.add("yahoo_bulk", yahoo_bulk_source))
 
+def use_market_source(source):
+    """
+    Serve bars and prices from `source` instead of Yahoo/Binance (e.g. the
+    recorded fixtures.FixtureSource in bench.py). It needs bars(), bulk_bars()
+    and price() with the signatures of yahoo_source, yahoo_bulk_source and
+    get_real_price. The on-disk archive is detached so replayed bars never
+    mix with live ones, and Yahoo's intraday limits no longer apply.
+    """
+    global bulk_bar_source, price_source
+    bar_store.source = timed(UPSTREAM_SECONDS, UPSTREAM_ERRORS, source.name)(providers.add(source.name, source.bars))
+    bar_store.archive = None
+    bar_store.max_gap = {}
+    bulk_bar_source = timed(UPSTREAM_SECONDS, UPSTREAM_ERRORS, f"{source.name}_bulk")(
+        providers.add(f"{source.name}_bulk", source.bulk_bars)
+    )
+    price_source = source.price
+    reset_state()
+
+def reset_state():
+    """Forget every cached bar, indicator, trend and result (a cold start without a restart)."""
+    ohlcv_cache.clear()
+    bar_store.clear()
+    indicator_engines.clear()
+    htf_context.clear()
+    divergence_trackers.clear()
+    analysis_flight.clear()
+    market_flight.clear()
+    snapshot_scheduler.snapshots.clear()
+
+def fetch_history(symbol, interval, period):
+    # Entries live until the next bar of `interval` is due, so repeated
+    # analyses (and get_htf_trend) reuse the same download. On expiry the
+    # bar store only pulls the bars added since the last fetch.
+    return ohlcv_cache.get_or_fetch(
+        symbol, interval, period,
+        lambda: bar_store.get(symbol, interval, period),
+    )
+
+def fetch_history_bulk(symbol, interval, period):
+    """
+    The same (symbol, interval, period) through Yahoo's download endpoint:
+    a second source for the bars fetch_history returns, used as its hedge.
+    """
+    df = bulk_bar_source([symbol], interval, period).get(symbol)
+    if df is None or df.empty:
+        return pd.DataFrame()
+    window = bar_store.seed(symbol, interval, period, df)
+    ohlcv_cache.put(symbol, interval, period, window)
+    return window
+
+@app.get("/cache/stats")
+def cache_stats():
+    stats = ohlcv_cache.stats()
+    stats["full_fetches"] = bar_store.full_fetches
+    stats["incremental_fetches"] = bar_store.incremental_fetches
+    stats["archive_loads"] = bar_store.archive_loads
+    stats["stale_serves"] = bar_store.stale_serves
+    if bar_archive is not None:
+        stats["archive"] = bar_archive.stats()
+    stats["analysis"] = analysis_flight.stats()
+    stats["htf"] = htf_context.stats()
+    stats["snapshots"] = snapshot_scheduler.stats()
+    stats["websockets"] = hub.stats()
+    stats["providers"] = providers.stats()
+    stats["analysis_executor"] = analysis_executor.stats()
+    stats["bus"] = bus.stats()
+    if compute_pool is not None:
+        stats["compute_pool"] = compute_pool.stats()
+    return stats
+
+# Existing counters are read at scrape time rather than duplicated
+metrics.collect("ohlcv_cache_requests_total", "OHLCV cache lookups", lambda: {
+    "hit": ohlcv_cache.hits, "miss": ohlcv_cache.misses,
+}, ["result"], kind="counter")
+metrics.collect("bar_stale_serves_total", "Stored bars served because a refresh failed", lambda: bar_store.stale_serves, kind="counter")
+metrics.collect("ohlcv_cache_entries", "Cached OHLCV frames", lambda: ohlcv_cache.stats()["size"])
+metrics.collect("bar_fetches_total", "Bar store downloads by kind", lambda: {
+    "full": bar_store.full_fetches, "incremental": bar_store.incremental_fetches, "archive": bar_store.archive_loads,
+}, ["kind"], kind="counter")
+metrics.collect("analysis_flight_total", "Analysis requests by how they were served", lambda: {
+    k: v for k, v in analysis_flight.stats().items() if k in ("executions", "coalesced", "cache_hits")
+}, ["outcome"], kind="counter")
+metrics.collect("htf_context_lookups_total", "HTF trend lookups", lambda: {
+    "hit": htf_context.hits, "miss": htf_context.misses,
+}, ["result"], kind="counter")
+metrics.collect("snapshot_recomputes_total", "Precomputed snapshot refreshes", lambda: snapshot_scheduler.recomputes, kind="counter")
+metrics.collect("snapshot_served_total", "Requests answered from a snapshot", lambda: snapshot_scheduler.served, kind="counter")
+metrics.collect("price_requests_total", "Binance REST price requests", lambda: price_client.requests, kind="counter")
+metrics.collect("price_request_errors_total", "Failed Binance REST price requests", lambda: price_client.errors, kind="counter")
+metrics.collect("price_stream_messages_total", "Binance stream messages", lambda: price_stream.messages, kind="counter")
+metrics.collect("price_stream_reconnects_total", "Binance stream reconnects", lambda: price_stream.reconnects, kind="counter")
+metrics.collect("provider_calls_total", "Upstream calls per provider", lambda: {
+    name: p["calls"] for name, p in providers.stats()["providers"].items()
+}, ["provider"], kind="counter")
+metrics.collect("provider_skipped_total", "Calls skipped while a provider's circuit was open", lambda: {
+    name: p["skipped"] for name, p in providers.stats()["providers"].items()
+}, ["provider"], kind="counter")
+metrics.collect("provider_circuit_open", "1 while a provider's circuit breaker is open", lambda: {
+    name: int(p["state"] == "open") for name, p in providers.stats()["providers"].items()
+}, ["provider"])
+metrics.collect("hedged_requests_total", "Extra fetches of the same data started because the first was slow", lambda: providers.hedges, kind="counter")
+metrics.collect("analysis_executor_running", "Analyses computing on the CPU stage", lambda: analysis_executor.running)
+metrics.collect("analysis_executor_waiting", "Analyses waiting for a CPU slot", lambda: analysis_executor.waiting)
+metrics.collect("compute_pool_running", "Analyses running in worker processes",
+                lambda: compute_pool.running if compute_pool is not None else 0)
+metrics.collect("compute_pool_restarts_total", "Worker processes replaced after a crash",
+                lambda: compute_pool.restarts if compute_pool is not None else 0, kind="counter")
+metrics.collect("compute_pool_shared_bytes_total", "Bar bytes handed to workers through shared memory",
+                lambda: compute_pool.shared_bytes if compute_pool is not None else 0, kind="counter")
+metrics.collect("bus_leader_roles", "Producer roles this worker holds", lambda: len(bus.leading))
+metrics.collect("bus_dropped_total", "Bus messages dropped for slow consumers or no broker", lambda: bus.dropped, kind="counter")
+metrics.collect("app_ready", "1 once the startup warm-up has finished", lambda: int(warmup.ready))
+metrics.collect("warmup_seconds", "Duration of the startup warm-up so far",
+                lambda: (warmup.status()["warmup_ms"] or 0.0) / 1000)
+metrics.collect("websocket_connections", "Open WebSocket clients", lambda: hub.stats()["connections"])
+metrics.collect("websocket_rejected_subscriptions_total", "Subscriptions refused (per-socket or global topic cap, unknown symbol)",
+                lambda: hub.stats()["rejected"], kind="counter")
+metrics.collect("websocket_dropped_frames", "Frames dropped for slow WebSocket clients", lambda: hub.stats()["fanout"]["dropped"])
+metrics.collect("websocket_last_fanout_seconds", "Duration of the last broadcast", lambda: hub.stats()["fanout"]["last_fanout_ms"] / 1000)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 def get_data_safe(symbol, interval, period):
-    if "GC=F" in symbol or "XAU" in symbol or "GOLD" in symbol:
-        try:
-            df = yf.Ticker("GC=F").history(period=period, interval=interval)
-            if len(df) > 15: return df, f"{interval} (Futures)"
-        except: pass
-    else:
-        try:
-            df = yf.Ticker(symbol).history(period=period, interval=interval)
-            if len(df) > 15: return df, interval
-        except: pass
-
-    try:
-        fallback_sym = "GC=F" if "GC=F" in symbol or "GOLD" in symbol else symbol
-        df = yf.Ticker(fallback_sym).history(period="1mo", interval="60m")
-        return df, "H1 (Backup)"
-    except:
+    r = route(symbol)
+    label = f"{interval} {r.label}" if r.label else interval
+    # When the primary runs past its usual latency the same bars are asked
+    # for again through the bulk endpoint; the first answer wins. The H1
+    # backup is other data and runs only when both have failed or come back short
+    args = (r.history, interval, period)
+    label, df = providers.hedged("history", [
+        (label, fetch_history, args),
+        (label, fetch_history_bulk, args),
+    ], accept=lambda df: len(df) > 15,
+        ready=lambda: ohlcv_cache.get(r.history, interval, period, record_miss=False),
+        fallback=("H1 (Backup)", fetch_history, (r.history, "60m", "1mo")))
+    if df is None:
+        UPSTREAM_ERRORS.inc("history")
         return pd.DataFrame(), "Error"
+    return df, label
+
+# (interval, period) of the base timeframe and the HTF context for each mode
+MODE_TIMEFRAMES = {
+    mode: ((p["interval"], p["period"]), (p["htf_interval"], p["htf_period"]))
+    for mode, p in MODE_PARAMS.items()
+}
 
 def get_htf_trend(symbol, mode):
     """
@@ -144,366 +514,138 @@ def get_htf_trend(symbol, mode):
     Swing (D1) -> W1
     """
     try:
-        htf_int = "1d"
-        htf_per = "1y"
-        if mode == "scalping":
-            htf_int = "60m"; htf_per = "1mo" # H1 is robust enough for M15 scalping context
-        elif mode == "daytrade":
-            htf_int = "1d"; htf_per = "1y"
-            
-        df, _ = get_data_safe(symbol, htf_int, htf_per)
-        if df.empty or len(df) < 50: return "NEUTRAL"
-        
-        # Calculate EMA200 on HTF
-        df.ta.ema(length=200, append=True)
-        if 'EMA_200' not in df.columns: return "NEUTRAL"
-        
-        last = df.iloc[-1]
-        price = last['Close']
-        ema200 = last['EMA_200']
-        
-        if price > ema200: return "ULLISH" # Intentionally missing B to standardise later or just string check
-        elif price < ema200: return "EARISH"
-        
-    except: pass
+        _, (htf_int, htf_per) = MODE_TIMEFRAMES.get(mode, MODE_TIMEFRAMES["swing"])
+        # Shared across modes/requests; cached until the next HTF bar closes
+        return htf_context.trend(symbol, htf_int, htf_per)
+    except Exception as e:
+        STAGE_ERRORS.inc("htf_trend")
+        print(f"HTF Trend Error ({symbol} {mode}): {e}")
     return "NEUTRAL"
 
-def check_divergence(df, price_col='Close', rsi_col='RSI_14', lookback=10):
-    """
-    Simple 3-point Pivot Divergence Detection
-    Looking for peaks/valleys in the last 'lookback' candles.
-    """
-    try:
-        if len(df) < lookback: return None
-        
-        subset = df.iloc[-lookback:].copy()
-        closes = subset[price_col].values
-        rsis = subset[rsi_col].values
-        
-        # We need at least 2 peaks or 2 valleys to compare
-        # This is a simplified "Regular Divergence" check using only the endpoints of the window vs current
-        # A more robust one iterates through pivots.
-        
-        curr_price = closes[-1]
-        curr_rsi = rsis[-1]
-        
-        # Find local Minima (Valley) for Bullish Div
-        # Simple Logic: Current Price is Lower than Lowest Price in window, but Current RSI is Higher than Lowest RSI
-        min_price_idx = subset[price_col][:-1].idxmin() # Exclude current candle
-        if pd.notna(min_price_idx):
-            lowest_price = subset.loc[min_price_idx, price_col]
-            psi_at_lowest = subset.loc[min_price_idx, rsi_col]
-            
-            # Condition: Lower Low Price + Higher Low RSI
-            if curr_price < lowest_price and curr_rsi > psi_at_lowest and curr_rsi < 50:
-                 return "BULLISH" # Bullish Divergence
-
-        # Find local Maxima (Peak) for Bearish Div
-        max_price_idx = subset[price_col][:-1].idxmax()
-        if pd.notna(max_price_idx):
-            highest_price = subset.loc[max_price_idx, price_col]
-            rsi_at_highest = subset.loc[max_price_idx, rsi_col]
-            
-            # Condition: Higher High Price + Lower High RSI
-            if curr_price > highest_price and curr_rsi < rsi_at_highest and curr_rsi > 50:
-                return "BEARISH" # Bearish Divergence
-
-    except Exception as e: 
-        print(f"Div Check Error: {e}")
-    
-    return None
-
-def analyze_dynamic(symbol: str, mode: str):
-    try:
-        if mode == "scalping":
-            req_int = "15m"; req_per = "5d"
-            sl_mult = 0.5; tp_mult = 1.5 
-            tf_name = "M15 (Scalping)"
-            strategy = "trend_follow"
-        elif mode == "daytrade":
-            req_int = "60m"; req_per = "1mo"
-            sl_mult = 0.8; tp_mult = 2.5
-            tf_name = "H1 (Daytrade)"
-            strategy = "pullback"
-        else: 
-            req_int = "1d"; req_per = "1y"
-            sl_mult = 1.5; tp_mult = 4.0
-            tf_name = "D1 (Swing)"
-            strategy = "mean_reversion"
-
-        df, actual_tf_label = get_data_safe(symbol, req_int, req_per)
-        if df.empty or len(df) < 10: return None 
-
-        last = df.iloc[-1]
-        raw_price = last['Close']
-        
+htf_context = HTFContext(load=get_data_safe, indicators=indicator_engines)
+
+# CPU stage of request-path analyses: one thread per core, excess requests
+# wait on the event loop. Blocking downloads get their own, larger pool.
+analysis_executor = BoundedExecutor(int(os.getenv("ANALYSIS_WORKERS", "0")) or None, name="analysis")
+# COMPUTE_MODE=process moves that stage to warm worker processes instead;
+# bars go through shared memory and a (symbol, mode) always hits the same
+# worker, so its incremental divergence state stays warm there.
+COMPUTE_MODE = os.getenv("COMPUTE_MODE", "thread")
+compute_pool = (
+    ProcessComputePool(int(os.getenv("COMPUTE_WORKERS", "0")) or None, preload=("analysis",))
+    if COMPUTE_MODE == "process" else None
+)
+io_executor = ThreadPoolExecutor(int(os.getenv("IO_WORKERS", "32")), thread_name_prefix="io")
+
+async def run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(io_executor, fn, *args)
+
+def fetch_inputs(symbol, mode):
+    """I/O stage: (bars, tf label, live price, HTF trend), one after another."""
+    params = mode_params(mode)
+    with STAGE_SECONDS.time("data"):
+        df, actual_tf_label = get_data_safe(symbol, params["interval"], params["period"])
+    if df.empty or len(df) < 10:
+        return df, actual_tf_label, None, "NEUTRAL"
+    with STAGE_SECONDS.time("real_price"):
         real_price = get_real_price(symbol)
-        offset = 0
-        price = raw_price
-        is_calibrated = False
-        
-        if real_price:
-            price = real_price
-            if abs(real_price - raw_price) < 5:
-                offset = 0
-            else:
-                offset = real_price - raw_price
-                is_calibrated = True
-        
-        atr = price * 0.005; rsi = 50; ema50 = price; ema200 = price; adx = 25
-        stoch_k = 50; stoch_d = 50
-        
-        try: 
-            df.ta.atr(length=14, append=True)
-            if pd.notna(df['ATRr_14'].iloc[-1]): atr = df['ATRr_14'].iloc[-1]
-            
-            df.ta.rsi(length=14, append=True)
-            if pd.notna(df['RSI_14'].iloc[-1]): rsi = df['RSI_14'].iloc[-1]
-            
-            df.ta.adx(length=14, append=True)
-            if pd.notna(df['ADX_14'].iloc[-1]): adx = df['ADX_14'].iloc[-1]
-            
-            df.ta.ema(length=50, append=True)
-            if pd.notna(df['EMA_50'].iloc[-1]): ema50 = df['EMA_50'].iloc[-1] + offset
-
-            df.ta.ema(length=200, append=True)
-            if pd.notna(df['EMA_200'].iloc[-1]): ema200 = df['EMA_200'].iloc[-1] + offset
-            
-            df.ta.bbands(length=20, std=2, append=True)
-            bb_lower = df['BBL_20_2.0'].iloc[-1] + offset if 'BBL_20_2.0' in df.columns else price - atr
-            bb_upper = df['BBU_20_2.0'].iloc[-1] + offset if 'BBU_20_2.0' in df.columns else price + atr
-            bb_mid = df['BBM_20_2.0'].iloc[-1] + offset if 'BBM_20_2.0' in df.columns else price
-            
-            df.ta.stochrsi(length=14, rsi_length=14, k=3, d=3, append=True)
-            if 'STOCHRSIk_14_14_3_3' in df.columns:
-                stoch_k = df['STOCHRSIk_14_14_3_3'].iloc[-1]
-                stoch_d = df['STOCHRSId_14_14_3_3'].iloc[-1]
-        except: pass
-
-        bullish_ob = None
-        bearish_ob = None
-        
-        try:
-            for i in range(len(df)-2, len(df)-50, -1):
-                curr = df.iloc[i]
-                next_c = df.iloc[i+1]
-                
-                if bullish_ob is None and curr['Close'] < curr['Open']:
-                    if next_c['Close'] > curr['High'] and (next_c['Close'] - next_c['Open']) > (atr * 0.5):
-                        bullish_ob = curr['Low'] + offset
-                        
-                if bearish_ob is None and curr['Close'] > curr['Open']:
-                    if next_c['Close'] < curr['Low'] and (next_c['Open'] - next_c['Close']) > (atr * 0.5):
-                        bearish_ob = curr['High'] + offset
-                
-                if bullish_ob and bearish_ob: break
-        except: pass
-
-        # --- AI Upgrade: Advanced Context ---
+    with STAGE_SECONDS.time("htf_trend"):
         htf_trend = get_htf_trend(symbol, mode)
-        divergence = check_divergence(df)
-
-        bull_score = 0
-        bear_score = 0
-        reasons = []
+    return df, actual_tf_label, real_price, htf_trend
 
-        # 1. Trend Analysis
-        if price > ema50: bull_score += 2; reasons.append("Price > EMA50")
-        else: bear_score += 2; reasons.append("Price < EMA50")
+async def fetch_inputs_async(symbol, mode):
+    """fetch_inputs with the three fetches running concurrently."""
+    params = mode_params(mode)
 
-        if htf_trend == "ULLISH": bull_score += 2; reasons.append("Major Trend Bullish 🟢")
-        elif htf_trend == "EARISH": bear_score += 2; reasons.append("Major Trend Bearish 🔴")
-
-        # 2. Momentum & Divergence
-        if rsi > 55: bull_score += 1
-        elif rsi < 45: bear_score += 1
-        
-        if rsi < 30: bull_score += 2; reasons.append("RSI Oversold")
-        elif rsi > 70: bear_score += 2; reasons.append("RSI Overbought")
-
-        if divergence == "BULLISH": 
-            bull_score += 3
-            reasons.append("🔥 Bullish Divergence Detected")
-        elif divergence == "BEARISH": 
-            bear_score += 3
-            reasons.append("🔥 Bearish Divergence Detected")
-        
-        # 3. Strength
-        if adx > 25: reasons.append(f"Strong Trend (ADX {int(adx)})")
-        else: reasons.append(f"Weak Trend (ADX {int(adx)})")
-
-        if bullish_ob:
-            reasons.append(f"Bullish OB Found ({round(bullish_ob, 2)})")
-            if abs(price - bullish_ob) < (atr * 2): 
-                bull_score += 1; reasons.append("Price Near Bullish OB")
-                
-        if bearish_ob:
-            reasons.append(f"Bearish OB Found ({round(bearish_ob, 2)})")
-            if abs(price - bearish_ob) < (atr * 2): 
-                bear_score += 1; reasons.append("Price Near Bearish OB")
-
-        if bull_score > bear_score:
-            bias = "BULLISH"
-            action_rec = "🟢 เน้นฝั่ง BUY"
-        elif bear_score > bull_score:
-            bias = "BEARISH"
-            action_rec = "🔴 เน้นฝั่ง SELL"
-        else:
-            bias = "SIDEWAY"
-            action_rec = "⚠️ รอเลือกทาง"
-
-        buy_entry = price
-        sell_entry = price
-
-        if strategy == "trend_follow": # Scalping M15
-            if bias.startswith("BULLISH"):
-                if bullish_ob and bullish_ob < price:
-                    buy_entry = bullish_ob
-                elif (price > ema50) and (stoch_k < 20 or rsi < 45):
-                    buy_entry = ema50
-                elif (price > bb_mid) and (stoch_k < 20 or rsi < 45):
-                    buy_entry = bb_mid
-                else:
-                    # Fallback: Wait for pullback
-                    buy_entry = price - (atr * 0.5)
-
-                sell_entry = bb_upper
-
-            elif bias.startswith("BEARISH"):
-                # Priority 1: Order Block
-                if bearish_ob and bearish_ob > price:
-                    sell_entry = bearish_ob
-                # Priority 2: EMA50/BB Mid (Only if Momentum is good)
-                elif (price < ema50) and (stoch_k > 80 or rsi > 55):
-                    sell_entry = ema50
-                elif (price < bb_mid) and (stoch_k > 80 or rsi > 55):
-                    sell_entry = bb_mid
-                else:
-                    sell_entry = price + (atr * 0.5)
-
-                buy_entry = bb_lower
-
-            else:
-                buy_entry = bb_lower
-                sell_entry = bb_upper
-                
-            if adx < 20: 
-                action_rec = "⚠️ ระวัง (ADX ต่ำ)"
-                bias = "SIDEWAY (Weak ADX)"
-
-        elif strategy == "pullback": # Daytrade
-            if bias == "BULLISH":
-                if bullish_ob and abs(bullish_ob - price) < (atr * 3):
-                    buy_entry = bullish_ob
-                elif price > ema50:
-                    buy_entry = ema50
-                else:
-                    buy_entry = bb_mid
-                
-                sell_entry = bb_upper
-
-            elif bias == "BEARISH":
-                if bearish_ob and abs(bearish_ob - price) < (atr * 3):
-                    sell_entry = bearish_ob
-                elif price < ema50:
-                    sell_entry = ema50
-                else:
-                    sell_entry = bb_mid
-                
-                buy_entry = bb_lower
-
-            else:
-                buy_entry = bb_lower
-                sell_entry = bb_upper
-
-        elif strategy == "mean_reversion": # Swing
-            buy_entry = bb_lower
-            if bullish_ob and abs(bullish_ob - bb_lower) < atr:
-                buy_entry = bullish_ob
-            
-            sell_entry = bb_upper
-            if bearish_ob and abs(bearish_ob - bb_upper) < atr:
-                sell_entry = bearish_ob
-
-        if (price - buy_entry) > (atr * 3): buy_entry = price - atr
-        if (sell_entry - price) > (atr * 3): sell_entry = price + atr
-
-        if buy_entry >= price: buy_entry = price - (atr * 0.1)
-        if sell_entry <= price: sell_entry = price + (atr * 0.1)
-
-        if "GC=F" in symbol or "XAU" in symbol or "GOLD" in symbol:
-            max_sl_usd = 5.0
-            if mode == "scalping": max_sl_usd = 5.0
-            elif mode == "daytrade": max_sl_usd = 10.0
-            elif mode == "swing": max_sl_usd = 25.0
-            
-            current_sl_dist = atr * sl_mult
-            if current_sl_dist > max_sl_usd:
-                sl_dist = max_sl_usd
-            else:
-                sl_dist = current_sl_dist
-        else:
-            sl_dist = atr * sl_mult
-
-        buy_sl = buy_entry - sl_dist
-        buy_tp = buy_entry + (sl_dist * (tp_mult/sl_mult))
-        
-        sell_sl = sell_entry + sl_dist
-        sell_tp = sell_entry - (sl_dist * (tp_mult/sl_mult))
+    async def stage(name, awaitable):
+        with STAGE_SECONDS.time(name):
+            return await awaitable
 
-        pips_scale = 10000 
-        if "GC=F" in symbol or "XAU" in symbol or "GOLD" in symbol: pips_scale = 100 
-        if "BTC" in symbol: pips_scale = 1
+    (df, actual_tf_label), real_price, htf_trend = await asyncio.gather(
+        stage("data", run_io(get_data_safe, symbol, params["interval"], params["period"])),
+        stage("real_price", get_real_price_async(symbol)),
+        stage("htf_trend", run_io(get_htf_trend, symbol, mode)),
+    )
+    return df, actual_tf_label, real_price, htf_trend
 
-        final_tf_name = actual_tf_label
-        if is_calibrated: final_tf_name += " ⚡(Real-time)"
-
-        reasoning_text = ""
-        # Improved Reasoning Text
-        if htf_trend == "ULLISH": reasoning_text += "ภาพใหญ่เป็นขาขึ้น (Major Bullish) "
-        elif htf_trend == "EARISH": reasoning_text += "ภาพใหญ่เป็นขาลง (Major Bearish) "
-        
-        if divergence == "BULLISH": reasoning_text += "❗พบสัญญาณกลับตัว Bullish Divergence "
-        elif divergence == "BEARISH": reasoning_text += "❗พบสัญญาณกลับตัว Bearish Divergence "
-
-        if strategy == "trend_follow":
-            if bias.startswith("BULLISH"):
-                reasoning_text += f"แนะนำย่อซื้อตามเทรนด์ (ADX {int(adx)}) "
-            elif bias.startswith("BEARISH"):
-                reasoning_text += f"แนะนำเด้งขายตามเทรนด์ (ADX {int(adx)}) "
-            else:
-                reasoning_text += f"ตลาดแกว่งตัว (Sideway) รอเลือกทาง "
-        
-        # Add entry context
-        if bias.startswith("BULLISH"):
-             reasoning_text += f"เป้าเข้า: {round(buy_entry, 2)}"
-        elif bias.startswith("BEARISH"):
-             reasoning_text += f"เป้าเข้า: {round(sell_entry, 2)}"
-
-        return {
-            "symbol": symbol,
-            "price": round(price, 2),
-            "tf_name": final_tf_name,
-            "trend": bias,
-            "action": action_rec,
-            "reasons": ", ".join(reasons[:4]),
-            "reasoning_text": reasoning_text,
-            "rsi": round(rsi, 2),
-            "score": f"{bull_score}-{bear_score}",
-            "buy_setup": {"entry": round(buy_entry, 2), "sl": round(buy_sl, 2), "tp": round(buy_tp, 2), "pips": int((buy_entry - buy_sl) * pips_scale)},
-            "sell_setup": {"entry": round(sell_entry, 2), "sl": round(sell_sl, 2), "tp": round(sell_tp, 2), "pips": int((sell_sl - sell_entry) * pips_scale)}
-        }
+@timed(STAGE_SECONDS, STAGE_ERRORS, "total")
+def analyze_dynamic(symbol: str, mode: str):
+    return compute_analysis(symbol, mode, *fetch_inputs(symbol, mode))
 
-    except Exception as e:
-        print(f"CRITICAL ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+async def analyze_dynamic_async(symbol: str, mode: str):
+    """analyze_dynamic for the event loop: concurrent I/O, then the CPU stage off the loop."""
+    with STAGE_SECONDS.time("total"):
+        inputs = await fetch_inputs_async(symbol, mode)
+        if compute_pool is not None:
+            try:
+                # Stage timings come back with the result: the worker's own registry is never scraped
+                result, events = await compute_pool.run((symbol, mode), compute_analysis_captured, symbol, mode, *inputs)
+                record_stages(events)
+                return result
+            except Exception as e:
+                STAGE_ERRORS.inc("compute_pool")
+                print(f"Compute Pool Error ({symbol} {mode}): {e}")
+        return await analysis_executor.run(compute_analysis, symbol, mode, *inputs)
+
+
+# --- Signal Snapshots ---
+async def run_analysis_async(symbol, mode):
+    return await analysis_flight.ado((symbol, mode), lambda: analyze_dynamic_async(symbol, mode))
+
+def streamed_price(symbol):
+    pair = route(symbol).price_pair
+    return price_stream.latest_price(pair) if pair else None
+
+# Always-on snapshots; other (symbol, mode) pairs are tracked once requested
+SNAPSHOT_SYMBOLS = [s for s in os.getenv("SNAPSHOT_SYMBOLS", "GC=F").split(",") if s]
+
+snapshot_scheduler = SnapshotScheduler(
+    # Same path as the request handlers: concurrent I/O, the bounded CPU
+    # stage (or the process pool) and one shared in-flight entry per key
+    compute=run_analysis_async,
+    price_of=streamed_price,
+    interval_of=lambda mode: MODE_TIMEFRAMES.get(mode, MODE_TIMEFRAMES["swing"])[0][0],
+    check_every=5.0,
+    move_threshold=0.0015,
+    unpriced_ttl=30.0, # no streamed price (poll mode, FX): re-read the price at least this often
+)
+snapshot_scheduler.on_refresh = lambda key, snapshot: bus.publish(SNAPSHOTS_TOPIC, (key, snapshot))
+TRACK_RENEW_SECONDS = 60 # Signal producers re-announce their key to whichever worker runs the scheduler
+
+async def signal_producer(topic):
+    symbol, mode = topic[len("SIGNAL:"):].rsplit(":", 1)
+    mode = mode.lower()
+    updates = snapshot_scheduler.subscribe(symbol, mode)
+    bus.publish(TRACK_TOPIC, (symbol, mode))
+    try:
+        snapshot = snapshot_scheduler.snapshots.get(snapshot_scheduler.key(symbol, mode))
+        if snapshot is None:
+            snapshot = await snapshot_scheduler.refresh(snapshot_scheduler.key(symbol, mode))
+        while True:
+            if snapshot is not None:
+                text = json.dumps({
+                    "type": "signal",
+                    "topic": topic,
+                    "computed_at": snapshot["computed_at"],
+                    "data": snapshot["result"],
+                }, ensure_ascii=False)
+                # Same text for every wire mode; the hub replays it to late subscribers
+                bus.publish(topic, {wire: text for wire in WIRE_MODES})
+            try:
+                snapshot = await asyncio.wait_for(updates.get(), TRACK_RENEW_SECONDS)
+            except asyncio.TimeoutError:
+                bus.publish(TRACK_TOPIC, (symbol, mode))
+                snapshot = None
+    finally:
+        snapshot_scheduler.unsubscribe(symbol, mode, updates)
 
 @app.post("/analyze_custom")
-def analyze_custom(req: AnalysisRequest):
+async def analyze_custom(req: AnalysisRequest):
     target = req.symbol
-    data = analyze_dynamic(target, req.mode)
+    data = snapshot_scheduler.get(target, req.mode)
+    if data is None:
+        data = await run_analysis_async(target, req.mode)
+        if data: snapshot_scheduler.store(target, req.mode, data)
     
     if data:
         reply = (
@@ -530,14 +672,62 @@ def analyze_custom(req: AnalysisRequest):
     else:
         return {"reply": "❌ การเชื่อมต่อ Server ล้มเหลว"}
 
+# --- Batch Analysis ---
+BATCH_CONCURRENCY = 4
+
+def prefetch_history(items):
+    """Warm the bar store with one Yahoo download per (interval, period) for the whole batch."""
+    groups = {}
+    for item in items:
+        sym = yahoo_symbol(item.symbol)
+        for interval, period in set(MODE_TIMEFRAMES.get(item.mode, MODE_TIMEFRAMES["swing"])):
+            if not bar_store.has(sym, interval, period):
+                groups.setdefault((interval, period), set()).add(sym)
+
+    for (interval, period), symbols in groups.items():
+        try:
+            frames = bulk_bar_source(sorted(symbols), interval, period)
+        except Exception as e:
+            print(f"Bulk Download Error ({interval} {period}): {e}")
+            continue
+        for sym, df in frames.items():
+            ohlcv_cache.put(sym, interval, period, bar_store.seed(sym, interval, period, df))
+
+@app.post("/analyze_batch")
+async def analyze_batch(req: BatchAnalysisRequest):
+    """Analyze many (symbol, mode) pairs; streams one NDJSON line per result as it finishes."""
+    items = req.items
+
+    async def results():
+        await run_io(prefetch_history, items)
+        sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def run(item):
+            async with sem:
+                data = snapshot_scheduler.get(item.symbol, item.mode)
+                if data is None:
+                    data = await run_analysis_async(item.symbol, item.mode)
+            return item, data
+
+        for done in asyncio.as_completed([run(item) for item in items]):
+            item, data = await done
+            yield json.dumps({"symbol": item.symbol, "mode": item.mode, "result": data}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+# Polled by every open dashboard tab; a few seconds of reuse is plenty
+market_flight = SingleFlight(result_ttl=3.0)
+
 @app.get("/analyze/{symbol}")
-def analyze_market(symbol: str):
+async def analyze_market(symbol: str):
+    return await market_flight.ado(symbol, lambda: market_summary(symbol))
+
+async def market_summary(symbol):
     try:
-        target = "GC=F" if "GC=F" in symbol or "GOLD" in symbol else symbol
-        ticker = yf.Ticker(target)
-        data = ticker.history(period="2d", interval="1h")
-        
-        real_price = get_real_price(symbol)
+        data, real_price = await asyncio.gather(
+            run_io(fetch_history, yahoo_symbol(symbol), "1h", "2d"),
+            get_real_price_async(symbol),
+        )
         
         if data.empty: return {"symbol": symbol, "price": 0, "change":0, "percent":0}
         
@@ -547,4 +737,7 @@ def analyze_market(symbol: str):
         percent = (change / prev) * 100
         
         return {"symbol": symbol, "price": round(price, 2), "change": round(change, 2), "percent": round(percent, 2)}
-    except: return {"symbol": symbol, "price": 0}
\ No newline at end of file
+    except Exception as e:
+        UPSTREAM_ERRORS.inc("market_summary")
+        print(f"Market Summary Error ({symbol}): {e}")
+        return {"symbol": symbol, "price": 0}
\ No newline at end of file
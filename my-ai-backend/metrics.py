@@ -0,0 +1,272 @@
+"""
+Small Prometheus-style metrics registry (text exposition format 0.0.4).
+
+    REGISTRY = MetricsRegistry(enabled=True)
+    STAGES = REGISTRY.histogram("analysis_stage_seconds", "Time per stage", ["stage"])
+    with STAGES.time("data"):
+        ...
+    ERRORS = REGISTRY.counter("upstream_errors_total", "Failed calls", ["source"])
+    ERRORS.inc("yahoo")
+    REGISTRY.collect("ohlcv_cache_hit_ratio", "Hit ratio", lambda: cache.stats()["hit_ratio"])
+
+A disabled registry hands out no-op instruments, so instrumented code pays one
+method call and nothing is recorded or rendered.
+
+Work done in another process (e.g. a ProcessComputePool worker) records into
+that process's registry, which nobody scrapes. Wrap it in `capture(...)` there
+and hand the events back with the result; `replay(events, ...)` applies them
+to the parent's instruments of the same names.
+"""
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _num(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    return repr(float(value))
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _Noop:
+    """Stands in for every instrument of a disabled registry."""
+
+    def inc(self, *labels, amount=1):
+        pass
+
+    def observe(self, value, *labels):
+        pass
+
+    def time(self, *labels):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NOOP = _Noop()
+
+
+def timed(histogram, errors, *labels):
+    """Decorator: time calls into `histogram` and count exceptions in `errors`."""
+    def wrap(fn):
+        if histogram is NOOP and errors is NOOP:
+            return fn
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with histogram.time(*labels):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    errors.inc(*labels)
+                    raise
+        return inner
+    return wrap
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        self._capture = None    # list collecting (name, labels, amount) inside capture()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+            if self._capture is not None:
+                self._capture.append((self.name, labels, amount))
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        self._capture = None    # list collecting (name, labels, value) inside capture()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            if self._capture is not None:
+                self._capture.append((self.name, labels, value))
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[-1] if series else 0
+
+    def totals(self):
+        """{label values: (sum, count)} of every series."""
+        with self._lock:
+            return {labels: (series[-2], series[-1]) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, ('le', _num(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class capture:
+    """
+    `with capture(*instruments) as events:` collects every inc/observe made
+    on `instruments` inside the block as (name, labels, value) tuples.
+    Meant for single-threaded worker processes; no-op instruments are skipped.
+    """
+
+    def __init__(self, *instruments):
+        self.instruments = [i for i in instruments if i is not NOOP]
+        self.events = []
+
+    def __enter__(self):
+        for instrument in self.instruments:
+            instrument._capture = self.events
+        return self.events
+
+    def __exit__(self, *exc):
+        for instrument in self.instruments:
+            instrument._capture = None
+
+
+def replay(events, *instruments):
+    """Apply `capture` events from another process to the instruments with the same names."""
+    by_name = {i.name: i for i in instruments if i is not NOOP}
+    for name, labels, value in events:
+        instrument = by_name.get(name)
+        if isinstance(instrument, Counter):
+            instrument.inc(*labels, amount=value)
+        elif isinstance(instrument, Histogram):
+            instrument.observe(value, *labels)
+
+
+class _Collected:
+    """Values read from a callback at scrape time (e.g. existing stats())."""
+
+    def __init__(self, name, help, fn, labelnames=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Metrics Collect Error ({self.name}): {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def _add(self, metric):
+        if not self.enabled:
+            return NOOP
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def collect(self, name, help, fn, labelnames=(), kind="gauge"):
+        """
+        Expose `fn()` at scrape time: a number, or {label value(s): number}
+        for metrics with `labelnames`.
+        """
+        self._add(_Collected(name, help, fn, labelnames, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+# Process-wide registry served by /metrics (METRICS=0 turns every instrument into a no-op)
+REGISTRY = MetricsRegistry(enabled=os.getenv("METRICS", "1") != "0")
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Bar length in seconds for every yfinance interval we request
+INTERVAL_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800,
+    "60m": 3600, "90m": 5400, "1h": 3600, "4h": 14400,
+    "1d": 86400, "5d": 432000, "1wk": 604800, "1mo": 2592000, "3mo": 7776000,
+}
+
+
+def interval_seconds(interval):
+    return INTERVAL_SECONDS.get(interval, 60)
+
+
+def next_bar_due(interval, now):
+    """Epoch time at which the next bar of `interval` opens (UTC aligned)."""
+    step = interval_seconds(interval)
+    return (int(now) // step + 1) * step
+
+
+class OHLCVCache:
+    """
+    Shared in-process cache for OHLCV frames keyed by (symbol, interval, period).
+    An entry is valid until the next bar of its interval is due, and the whole
+    cache is bounded by an LRU size limit.
+    """
+
+    def __init__(self, maxsize=128, clock=time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, symbol, interval, period, record_miss=True):
+        """Cached copy or None; `record_miss=False` for probes followed by get_or_fetch."""
+        key = (symbol, interval, period)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, df = entry
+                if self.clock() < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return df.copy()
+                del self._data[key]
+            if record_miss:
+                self.misses += 1
+        return None
+
+    def put(self, symbol, interval, period, df):
+        key = (symbol, interval, period)
+        expires_at = next_bar_due(interval, self.clock())
+        with self._lock:
+            self._data[key] = (expires_at, df.copy())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_fetch(self, symbol, interval, period, fetch):
+        """Return a cached copy or call `fetch()` and cache non-empty results."""
+        df = self.get(symbol, interval, period)
+        if df is not None:
+            return df
+        # Download outside the lock so a slow Yahoo call doesn't block other keys
+        df = fetch()
+        if df is not None and not df.empty:
+            self.put(symbol, interval, period, df)
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+def _scan_positions(n, lookback):
+    """
+    Candle positions in the order analyze_dynamic used to walk them: from the
+    second-to-last bar backwards. Short frames wrap to negative positions like
+    `df.iloc[i]` did, and stop where iloc would have raised IndexError.
+    """
+    stop = max(n - 2 - lookback, -n - 1)
+    return np.arange(n - 2, stop, -1)
+
+
+def _masks(o, h, l, c, atr, pos):
+    nxt = pos + 1
+    body_min = atr * 0.5
+    bull = (c[pos] < o[pos]) & (c[nxt] > h[pos]) & ((c[nxt] - o[nxt]) > body_min)
+    bear = (c[pos] > o[pos]) & (c[nxt] < l[pos]) & ((o[nxt] - c[nxt]) > body_min)
+    return bull, bear
+
+
+def find_order_blocks(o, h, l, c, atr, lookback=48, include_zones=False):
+    """
+    Detect order blocks on NumPy OHLC arrays.
+
+    A bullish block is a bearish candle whose next candle closes above its high
+    with a body larger than 0.5 * ATR (bearish block is the mirror image).
+    Returns {"bullish": low of the most recent bullish block or None,
+             "bearish": high of the most recent bearish block or None}
+    and, with include_zones=True, "zones": every block in the lookback window,
+    newest first, as {"type", "index", "low", "high"}.
+    """
+    o = np.asarray(o, dtype=float)
+    h = np.asarray(h, dtype=float)
+    l = np.asarray(l, dtype=float)
+    c = np.asarray(c, dtype=float)
+    n = len(c)
+    result = {"bullish": None, "bearish": None}
+
+    pos = _scan_positions(n, lookback) if n >= 2 else np.array([], dtype=int)
+    if len(pos):
+        bull, bear = _masks(o, h, l, c, atr, pos)
+        if bull.any():
+            result["bullish"] = float(l[pos[bull.argmax()]])
+        if bear.any():
+            result["bearish"] = float(h[pos[bear.argmax()]])
+
+    if include_zones:
+        zones = []
+        # Zones only make sense for real positions, so no wrap-around here
+        zpos = np.arange(n - 2, max(n - 2 - lookback, -1), -1)
+        if len(zpos):
+            bull, bear = _masks(o, h, l, c, atr, zpos)
+            for i, is_bull, is_bear in zip(zpos, bull, bear):
+                if is_bull:
+                    zones.append({"type": "bullish", "index": int(i), "low": float(l[i]), "high": float(h[i])})
+                elif is_bear:
+                    zones.append({"type": "bearish", "index": int(i), "low": float(l[i]), "high": float(h[i])})
+        result["zones"] = zones
+
+    return result
@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+
+from providers import route
+
+BINANCE_URL = "https://api.binance.com"
+
+
+def binance_pair(symbol):
+    """Binance spot pair used as the live price for a dashboard symbol."""
+    return route(symbol).price_pair
+
+
+class PriceClient:
+    """
+    Async Binance ticker client with a persistent keep-alive pool, a bound on
+    concurrent requests and a per-call timeout.
+
+    `start()` must run inside the server's event loop. Sync code running in
+    the threadpool (analyze_dynamic) uses `get_price_blocking`, which hops onto
+    that loop so it shares the same connections.
+    """
+
+    def __init__(self, base_url=BINANCE_URL, max_connections=10, max_concurrency=8, timeout=2.0, transport=None):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.transport = transport
+        self._client = None
+        self._sem = None
+        self._loop = None
+        self.requests = 0
+        self.errors = 0
+
+    def _make_client(self):
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            transport=self.transport,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+
+    async def start(self):
+        if self._client is None:
+            self._loop = asyncio.get_running_loop()
+            self._client = self._make_client()
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def _fetch(self, client, pair, timeout):
+        self.requests += 1
+        resp = await client.get("/api/v3/ticker/price", params={"symbol": pair}, timeout=timeout)
+        resp.raise_for_status()
+        return float(resp.json()["price"])
+
+    async def get_price(self, symbol, timeout=None):
+        pair = binance_pair(symbol)
+        if pair is None:
+            return None
+        if self._client is None:
+            await self.start()
+        try:
+            async with self._sem:
+                return await self._fetch(self._client, pair, timeout or self.timeout)
+        except Exception as e:
+            self.errors += 1
+            print(f"Price Fetch Error: {e}")
+            return None
+
+    async def _get_price_once(self, symbol):
+        # No server loop (scripts, tests): use a short-lived client
+        pair = binance_pair(symbol)
+        if pair is None:
+            return None
+        try:
+            async with self._make_client() as client:
+                return await self._fetch(client, pair, self.timeout)
+        except Exception as e:
+            self.errors += 1
+            print(f"Price Fetch Error: {e}")
+            return None
+
+    def get_price_blocking(self, symbol):
+        """Fetch from a worker thread through the shared async pool."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return asyncio.run(self._get_price_once(symbol))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("get_price_blocking called from the event loop; await get_price instead")
+        future = asyncio.run_coroutine_threadsafe(self.get_price(symbol), loop)
+        try:
+            return future.result(timeout=self.timeout + 1)
+        except Exception as e:
+            future.cancel()
+            print(f"Price Fetch Error: {e}")
+            return None
+
+    def stats(self):
+        return {"requests": self.requests, "errors": self.errors}
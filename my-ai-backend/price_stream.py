@@ -0,0 +1,143 @@
+import asyncio
+import json
+import random
+import time
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443"
+
+
+def parse_message(raw):
+    """
+    Return (pair, price) from a Binance trade or bookTicker message, either raw
+    or wrapped as a combined-stream {"stream": ..., "data": ...} envelope.
+    """
+    msg = json.loads(raw)
+    data = msg.get("data", msg)
+    pair = data.get("s")
+    if not pair:
+        return None
+    if "p" in data:  # trade
+        return pair.upper(), float(data["p"])
+    if "b" in data and "a" in data:  # bookTicker -> mid price
+        return pair.upper(), (float(data["b"]) + float(data["a"])) / 2
+    return None
+
+
+class PriceUpdates:
+    """
+    Subscriber side of `PriceStream`: the newest unsent price per pair.
+    A burst on one pair replaces only that pair's pending price, never
+    another pair's. Pairs come out in the order they first became pending.
+    """
+
+    def __init__(self, pairs=None):
+        self.pairs = {p.upper() for p in pairs} if pairs else None
+        self._pending = {}      # pair -> price
+        self._ready = asyncio.Event()
+
+    def put(self, pair, price):
+        if self.pairs is not None and pair not in self.pairs:
+            return
+        self._pending[pair] = price
+        self._ready.set()
+
+    def qsize(self):
+        return len(self._pending)
+
+    def get_nowait(self):
+        if not self._pending:
+            raise asyncio.QueueEmpty
+        pair = next(iter(self._pending))
+        price = self._pending.pop(pair)
+        if not self._pending:
+            self._ready.clear()
+        return pair, price
+
+    async def get(self):
+        while not self._pending:
+            await self._ready.wait()
+        return self.get_nowait()
+
+
+class PriceStream:
+    """
+    Keeps the latest price per Binance pair from a push feed and notifies
+    subscribers only when a price changes. Reconnects with exponential backoff.
+    """
+
+    def __init__(self, pairs, url=BINANCE_WS_URL, stream="trade", backoff_initial=0.5, backoff_max=30.0, connect=None):
+        self.pairs = [p.upper() for p in pairs]
+        self.url = url.rstrip("/")
+        self.stream = stream
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._connect = connect
+        self.latest = {}       # pair -> (price, monotonic time received)
+        self._subscribers = set()
+        self.on_price = None   # optional callback(pair, price) for every streamed price
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.messages = 0
+
+    @property
+    def stream_url(self):
+        streams = "/".join(f"{p.lower()}@{self.stream}" for p in self.pairs)
+        return f"{self.url}/stream?streams={streams}"
+
+    def latest_price(self, pair, max_age=5.0):
+        entry = self.latest.get(pair.upper())
+        if entry is None or time.monotonic() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+    def subscribe(self, *pairs):
+        """(pair, price) changes of `pairs` (all pairs when none given), coalesced per pair."""
+        updates = PriceUpdates(pairs)
+        self._subscribers.add(updates)
+        return updates
+
+    def unsubscribe(self, updates):
+        self._subscribers.discard(updates)
+
+    def ingest(self, pair, price):
+        """A price streamed elsewhere (e.g. by the worker holding the feed), handled like our own."""
+        self._publish(pair.upper(), price)
+
+    def _publish(self, pair, price):
+        prev = self.latest.get(pair)
+        self.latest[pair] = (price, time.monotonic())
+        if prev is not None and prev[0] == price:
+            return
+        for updates in self._subscribers:
+            updates.put(pair, price)  # slow consumer: coalesces to the latest per pair
+
+    async def run(self):
+        connect = self._connect
+        if connect is None:
+            import websockets
+            connect = websockets.connect
+
+        backoff = self.backoff_initial
+        while True:
+            try:
+                async with connect(self.stream_url) as ws:
+                    self.connected.set()
+                    print(f"Price stream connected: {self.stream_url}")
+                    async for raw in ws:
+                        parsed = parse_message(raw)
+                        if parsed is None:
+                            continue
+                        self.messages += 1
+                        backoff = self.backoff_initial
+                        self._publish(*parsed)
+                        if self.on_price is not None:
+                            self.on_price(*parsed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price Stream Error: {e}")
+            self.connected.clear()
+            self.reconnects += 1
+            # Full jitter so many workers don't reconnect in lockstep
+            await asyncio.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, self.backoff_max)
@@ -0,0 +1,316 @@
+"""
+Market-data providers: symbol routing, circuit breakers and hedged requests.
+
+`route(symbol)` replaces the "GC=F"/"XAU"/"GOLD" string checks that used to
+be repeated across the code with one table (`ROUTES`).
+
+`ProviderRegistry` wraps each upstream (Yahoo history, Binance REST, ...):
+  call(name, ...)   one call through the provider's circuit breaker; after
+                    `failure_threshold` consecutive failures the provider is
+                    skipped (ProviderUnavailable, no network) for
+                    `reset_after` seconds, then a single trial call decides
+                    whether it closes again.
+  hedged(kind, attempts, accept, fallback)
+                    runs interchangeable sources of the same data in
+                    preference order, starting the next one as soon as the
+                    previous fails or has been running longer than the usual
+                    latency of `kind` (its p90, clamped to [hedge_min,
+                    hedge_max]). The first accepted result wins; slower
+                    attempts finish in the background. A fallback for
+                    different data runs only after every attempt failed.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+Route = namedtuple("Route", "history price_pair asset label pip_scale")
+
+# First match wins; a symbol matches when it contains any of the tokens.
+# history: Yahoo ticker for bars (None = the symbol itself)
+ROUTES = (
+    (("GC=F", "XAU", "GOLD"), Route("GC=F", "PAXGUSDT", "gold", "(Futures)", 100)),
+    (("BTC",), Route(None, "BTCUSDT", "crypto", None, 1)),
+)
+DEFAULT_ROUTE = Route(None, None, "fx", None, 10000)
+
+
+def route(symbol):
+    """Where bars and live prices for a dashboard symbol come from."""
+    for tokens, r in ROUTES:
+        if any(t in symbol for t in tokens):
+            return r._replace(history=r.history or symbol)
+    return DEFAULT_ROUTE._replace(history=symbol)
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` straight failures -> half-open after `reset_after`s."""
+
+    def __init__(self, failure_threshold=3, reset_after=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_after or self.trial:
+                return False
+            self.trial = True  # exactly one probe while half-open
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial:
+                    self.opens += 1
+                self.opened_at = self.clock()
+                self.trial = False
+
+
+class LatencyWindow:
+    """The last `size` latencies of one provider or request kind."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class _Provider:
+    def __init__(self, name, fn, afn, breaker):
+        self.name = name
+        self.fn = fn
+        self.afn = afn
+        self.breaker = breaker
+        self.latency = LatencyWindow()
+        self.calls = 0
+        self.failures = 0
+        self.skipped = 0
+
+
+class ProviderRegistry:
+    def __init__(self, max_workers=16, hedge_min=0.5, hedge_max=2.0, hedge_quantile=0.9, clock=time.monotonic):
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max
+        self.hedge_quantile = hedge_quantile
+        self.clock = clock
+        self._providers = {}
+        self._kinds = {}        # hedged request kind -> LatencyWindow of its first attempt
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="provider")
+        self._lock = threading.Lock()
+        self.hedges = 0         # extra attempts started because the previous one was slow
+        self.hedge_wins = 0     # ... that then answered first
+
+    def add(self, name, fn, afn=None, failure_threshold=3, reset_after=30.0):
+        """
+        Register (or replace) provider `name`; returns `bind(name)`. `afn` is
+        an optional coroutine twin of `fn` for `acall`, sharing its breaker.
+        """
+        breaker = CircuitBreaker(failure_threshold, reset_after, self.clock)
+        self._providers[name] = _Provider(name, fn, afn, breaker)
+        return self.bind(name)
+
+    def bind(self, name):
+        """A plain function calling provider `name` (e.g. an IncrementalBarStore source)."""
+        def call(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        call.__name__ = f"provider_{name}"
+        return call
+
+    def _admit(self, name):
+        provider = self._providers[name]
+        if not provider.breaker.allow():
+            provider.skipped += 1
+            raise ProviderUnavailable(f"{name} circuit open")
+        provider.calls += 1
+        return provider
+
+    def _failed(self, provider):
+        provider.failures += 1
+        provider.breaker.failure()
+
+    def _succeeded(self, provider, start):
+        provider.latency.add(self.clock() - start)
+        provider.breaker.success()
+
+    def call(self, name, *args, **kwargs):
+        provider = self._admit(name)
+        start = self.clock()
+        try:
+            result = provider.fn(*args, **kwargs)
+        except Exception:
+            self._failed(provider)
+            raise
+        self._succeeded(provider, start)
+        return result
+
+    async def acall(self, name, *args, **kwargs):
+        """`call` through the provider's async `afn`, on the event loop."""
+        provider = self._admit(name)
+        start = self.clock()
+        try:
+            result = await provider.afn(*args, **kwargs)
+        except Exception:
+            self._failed(provider)
+            raise
+        self._succeeded(provider, start)
+        return result
+
+    def hedge_delay(self, kind):
+        window = self._kinds.get(kind)
+        q = window.quantile(self.hedge_quantile) if window is not None else None
+        if q is None:
+            return self.hedge_max
+        return min(self.hedge_max, max(self.hedge_min, q))
+
+    def hedged(self, kind, attempts, accept=None, ready=None, fallback=None):
+        """
+        `attempts` is a list of (label, fn, args): interchangeable sources of
+        the same data (same symbol, interval and period), in preference
+        order. Returns (label, result) of the first result passing `accept`
+        (any result without it).
+
+        `fallback` is an optional (label, fn, args) for *different* data
+        (e.g. H1 bars instead of M15). It is never raced against the
+        attempts: it runs only once every attempt has failed or been
+        rejected, and its result is returned as is. Without it the last
+        rejected result is returned; when everything raised, (None, None).
+
+        `ready()` is an optional in-thread probe for the first attempt (e.g. a
+        cache lookup); an accepted answer skips the thread hop altogether.
+        """
+        if ready is not None and attempts:
+            result = ready()
+            if result is not None and (accept is None or accept(result)):
+                return attempts[0][0], result
+        with self._lock:
+            window = self._kinds.setdefault(kind, LatencyWindow())
+        rejected = (None, None)
+        if len(attempts) == 1:
+            # Nothing to hedge with: run inline, no executor hop
+            label, fn, args = attempts[0]
+            start = self.clock()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                print(f"Provider Error ({kind} {label}): {e}")
+            else:
+                window.add(self.clock() - start)
+                if accept is None or accept(result):
+                    return label, result
+                rejected = (label, result)
+        elif attempts:
+            answer, rejected = self._race(kind, attempts, accept, window)
+            if answer is not None:
+                return answer
+        if fallback is None:
+            return rejected
+        label, fn, args = fallback
+        try:
+            return label, fn(*args)
+        except Exception as e:
+            print(f"Provider Error ({kind} {label}): {e}")
+            return rejected
+
+    def _race(self, kind, attempts, accept, window):
+        delay = self.hedge_delay(kind)
+        started = {}            # attempt index -> clock() when it left the executor queue
+
+        def timed(i, fn, args):
+            started[i] = begin = self.clock()
+            result = fn(*args)
+            if i == 0:
+                window.add(self.clock() - begin)
+            return result
+
+        pending = {}
+        rejected = (None, None)
+        slow = False
+        for i, (label, fn, args) in enumerate(attempts):
+            if i > 0 and slow:
+                with self._lock:
+                    self.hedges += 1
+            pending[self._executor.submit(timed, i, fn, args)] = (i, label)
+            last = i == len(attempts) - 1
+            slow = False
+            while pending:
+                # Give the newest attempt `delay` of running time (time spent
+                # queued behind other downloads doesn't count as slow)
+                began = started.get(i)
+                timeout = None if last else (delay if began is None else max(0.0, began + delay - self.clock()))
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    j, done_label = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Provider Error ({kind} {done_label}): {e}")
+                        continue
+                    if accept is None or accept(result):
+                        if j > 0 and any(k == 0 for k, _ in pending.values()):
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return (done_label, result), rejected
+                    rejected = (done_label, result)
+                if last:
+                    continue
+                if i not in {k for k, _ in pending.values()}:
+                    break  # the newest attempt failed: start the next one now
+                began = started.get(i)
+                if not done and began is not None and self.clock() - began >= delay:
+                    slow = True
+                    break
+        return None, rejected
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_ms": {k: round(self.hedge_delay(k) * 1000, 1) for k in self._kinds},
+            "providers": {
+                name: {
+                    "state": p.breaker.state,
+                    "calls": p.calls,
+                    "failures": p.failures,
+                    "skipped": p.skipped,
+                    "opens": p.breaker.opens,
+                    "p50_ms": round((p.latency.quantile(0.5) or 0.0) * 1000, 1),
+                    "p90_ms": round((p.latency.quantile(0.9) or 0.0) * 1000, 1),
+                }
+                for name, p in self._providers.items()
+            },
+        }
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _retrieve(task):
+    # The run's error is read even when every awaiter gave up
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the
+    function, later callers block on the same result instead of running it
+    again. Successful results are then kept for `result_ttl` seconds so a burst
+    right after the call completes is answered from memory.
+    """
+
+    def __init__(self, result_ttl=2.0, maxsize=256, clock=time.monotonic):
+        self.result_ttl = result_ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._inflight = {}
+        self._awaiting = {}     # key -> asyncio.Task of the running ado() call
+        self._results = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if self.clock() < expires_at:
+                    self.cache_hits += 1
+                    return result
+                del self._results[key]
+
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._inflight[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                # Failed analyses (None) are retried on the next request
+                if call.error is None and call.result is not None and self.result_ttl > 0:
+                    if len(self._results) >= self.maxsize:
+                        self._purge()
+                    self._results[key] = (self.clock() + self.result_ttl, call.result)
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def ado(self, key, fn):
+        """
+        `do` for coroutine functions, for callers on one event loop: awaiters
+        of a key share one `fn()` run without holding a thread. The run is a
+        task of its own that every caller (the first one included) awaits
+        through `shield`, so a caller cancelled by its own timeout stops only
+        its wait and the others still get the result. Kept results are
+        shared with `do`.
+        """
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                if self.clock() < expires_at:
+                    self.cache_hits += 1
+                    return result
+                del self._results[key]
+
+            task = self._awaiting.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._arun(key, fn))
+                task.add_done_callback(_retrieve)
+                self._awaiting[key] = task
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def _arun(self, key, fn):
+        try:
+            result = await fn()
+        except BaseException:
+            with self._lock:
+                del self._awaiting[key]
+            raise
+        with self._lock:
+            del self._awaiting[key]
+            if result is not None and self.result_ttl > 0:
+                if len(self._results) >= self.maxsize:
+                    self._purge()
+                self._results[key] = (self.clock() + self.result_ttl, result)
+        return result
+
+    def clear(self):
+        """Drop kept results (in-flight calls are unaffected)."""
+        with self._lock:
+            self._results.clear()
+
+    def _purge(self):
+        now = self.clock()
+        for key in [k for k, (exp, _) in self._results.items() if exp <= now]:
+            del self._results[key]
+        while len(self._results) >= self.maxsize:
+            self._results.pop(next(iter(self._results)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+                "inflight": len(self._inflight) + len(self._awaiting),
+            }
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+
+from ohlcv_cache import next_bar_due
+
+
+class SnapshotScheduler:
+    """
+    Keeps a precomputed analyze_dynamic result per tracked (symbol, mode).
+
+    A snapshot is recomputed when a bar of the mode's base timeframe closes or
+    when the live price has moved more than `move_threshold` (fraction) from
+    the snapshot price. Without a live price for the symbol (poll mode, FX and
+    other non-Binance symbols) a move can't be seen, so the snapshot is kept
+    for at most `unpriced_ttl` seconds instead. Keys requested through `get` are tracked automatically
+    and dropped after `idle_ttl` seconds without requests or subscribers.
+
+      compute(symbol, mode) -> dict or None   coroutine running the analysis pipeline
+      price_of(symbol) -> float or None       cheap live price (no network)
+      interval_of(mode) -> str                base timeframe of the mode
+
+    `on_refresh(key, snapshot)`, when set, is called after every recompute
+    (e.g. to share it with other workers, which pass it to `receive`).
+    """
+
+    def __init__(self, compute, price_of, interval_of, check_every=5.0, move_threshold=0.0015, idle_ttl=900.0, unpriced_ttl=30.0, clock=time.time):
+        self.compute = compute
+        self.price_of = price_of
+        self.interval_of = interval_of
+        self.check_every = check_every
+        self.move_threshold = move_threshold
+        self.idle_ttl = idle_ttl
+        self.unpriced_ttl = unpriced_ttl
+        self.clock = clock
+        self.snapshots = {}     # key -> {"result", "computed_at", "expires_at"}
+        self._tracked = {}      # key -> last access time (None = pinned)
+        self._subscribers = {}  # key -> set of asyncio.Queue
+        self._lock = threading.Lock()
+        self.on_refresh = None
+        self._pruned_at = None
+        self.recomputes = 0
+        self.served = 0
+
+    @staticmethod
+    def key(symbol, mode):
+        return (symbol.strip().upper(), mode.strip().lower())
+
+    def track(self, symbol, mode, pinned=False):
+        key = self.key(symbol, mode)
+        now = self.clock()
+        with self._lock:
+            if pinned or self._tracked.get(key, 0) is None:
+                self._tracked[key] = None
+            else:
+                self._tracked[key] = now
+            self._prune(now)
+        return key
+
+    def _prune(self, now):
+        """
+        Forget idle keys and expired snapshots nobody tracks here (e.g. ones
+        received from the worker running the scheduler). Runs on every
+        worker, from `track` and `store`, at most once per `check_every`.
+        Call with the lock held.
+        """
+        if self._pruned_at is not None and now - self._pruned_at < self.check_every:
+            return
+        self._pruned_at = now
+        for key, last_access in list(self._tracked.items()):
+            if last_access is not None and now - last_access > self.idle_ttl and key not in self._subscribers:
+                del self._tracked[key]
+                self.snapshots.pop(key, None)
+        for key, snapshot in list(self.snapshots.items()):
+            if key not in self._tracked and now >= snapshot["expires_at"]:
+                del self.snapshots[key]
+
+    def is_stale(self, key, snapshot, now=None):
+        now = self.clock() if now is None else now
+        if now >= snapshot["expires_at"]:
+            return True
+        price = self.price_of(key[0])
+        ref = snapshot["result"].get("price") if snapshot["result"] else None
+        if price and ref:
+            return abs(price - ref) / ref > self.move_threshold
+        return now - snapshot["computed_at"] > self.unpriced_ttl
+
+    def get(self, symbol, mode):
+        """Fresh snapshot result or None (the caller then computes inline)."""
+        key = self.track(symbol, mode)
+        snapshot = self.snapshots.get(key)
+        if snapshot is None or self.is_stale(key, snapshot):
+            return None
+        self.served += 1
+        return snapshot["result"]
+
+    def store(self, symbol, mode, result):
+        """Record a result computed elsewhere (e.g. by a request handler)."""
+        key = self.key(symbol, mode)
+        now = self.clock()
+        snapshot = {
+            "result": result,
+            "computed_at": now,
+            "expires_at": next_bar_due(self.interval_of(key[1]), now),
+        }
+        with self._lock:
+            self.snapshots[key] = snapshot
+            self._prune(now)
+        return snapshot
+
+    def subscribe(self, symbol, mode):
+        key = self.track(symbol, mode)
+        queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, symbol, mode, queue):
+        key = self.key(symbol, mode)
+        with self._lock:
+            subs = self._subscribers.get(key, set())
+            subs.discard(queue)
+            if not subs:
+                self._subscribers.pop(key, None)
+
+    def _notify(self, key, snapshot):
+        with self._lock:
+            queues = list(self._subscribers.get(key, ()))
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+    def _due_keys(self):
+        now = self.clock()
+        due = []
+        with self._lock:
+            self._pruned_at = None
+            self._prune(now)
+            for key in self._tracked:
+                snapshot = self.snapshots.get(key)
+                if snapshot is None or self.is_stale(key, snapshot, now):
+                    due.append(key)
+        return due
+
+    async def refresh(self, key):
+        result = await self.compute(*key)
+        if result is None:
+            return None
+        self.recomputes += 1
+        snapshot = self.store(key[0], key[1], result)
+        self._notify(key, snapshot)
+        if self.on_refresh is not None:
+            self.on_refresh(key, snapshot)
+        return snapshot
+
+    def receive(self, key, snapshot):
+        """A snapshot recomputed by another worker: store it and notify subscribers."""
+        if self.snapshots.get(key) is snapshot:
+            return  # our own, already stored and notified
+        with self._lock:
+            self.snapshots[key] = snapshot
+            self._prune(self.clock())
+        self._notify(key, snapshot)
+
+    async def run(self):
+        while True:
+            for key in self._due_keys():
+                try:
+                    await self.refresh(key)
+                except Exception as e:
+                    print(f"Snapshot Error {key}: {e}")
+            await asyncio.sleep(self.check_every)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked": len(self._tracked),
+                "snapshots": len(self.snapshots),
+                "recomputes": self.recomputes,
+                "served": self.served,
+            }
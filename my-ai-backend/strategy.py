@@ -0,0 +1,261 @@
+"""
+Scoring and trade-setup rules used by analyze_dynamic and the backtester.
+
+Everything here works on plain numbers for a single bar (no frames, no
+network), so a live request and every bar of a historical replay go through
+exactly the same code. Tunable constants live in `mode_params()`.
+"""
+from providers import route
+
+MODE_PARAMS = {
+    "scalping": {
+        "interval": "15m", "period": "5d", "tf_name": "M15 (Scalping)",
+        "htf_interval": "60m", "htf_period": "1mo", # H1 is robust enough for M15 scalping context
+        "strategy": "trend_follow", "sl_mult": 0.5, "tp_mult": 1.5, "max_sl_usd": 5.0,
+    },
+    "daytrade": {
+        "interval": "60m", "period": "1mo", "tf_name": "H1 (Daytrade)",
+        "htf_interval": "1d", "htf_period": "1y",
+        "strategy": "pullback", "sl_mult": 0.8, "tp_mult": 2.5, "max_sl_usd": 10.0,
+    },
+    "swing": {
+        "interval": "1d", "period": "1y", "tf_name": "D1 (Swing)",
+        "htf_interval": "1d", "htf_period": "1y",
+        "strategy": "mean_reversion", "sl_mult": 1.5, "tp_mult": 4.0, "max_sl_usd": 25.0,
+    },
+}
+
+DEFAULT_PARAMS = {
+    # Score weights
+    "w_ema": 2,             # price vs EMA50
+    "w_htf": 2,             # higher-timeframe trend
+    "w_rsi": 1,             # RSI above 55 / below 45
+    "w_rsi_extreme": 2,     # RSI oversold / overbought
+    "w_divergence": 3,
+    "w_ob": 1,              # price near an order block
+    # Divergence source: "window" (current bar vs the last 10) or "pivot"
+    # (a regular pivot divergence confirmed within `divergence_hold` bars)
+    "divergence": "window",
+    "divergence_hold": 3,
+    # Distances in ATR multiples
+    "ob_near_atr": 2.0,     # OB adds to the score within this distance
+    "ob_pullback_atr": 3.0, # pullback strategy enters at an OB within this distance
+    "pullback_atr": 0.5,    # trend_follow fallback entry
+    "max_entry_atr": 3.0,   # entries further away than this ...
+    "clamp_entry_atr": 1.0, # ... are pulled in to this distance
+    "min_entry_atr": 0.1,   # limit orders stay at least this far from price
+}
+
+SCORE_KEYS = ("w_ema", "w_htf", "w_rsi", "w_rsi_extreme", "w_divergence", "w_ob")
+
+
+def mode_params(mode, **overrides):
+    """Parameters for `mode`, with any constant overridden by keyword."""
+    params = dict(DEFAULT_PARAMS)
+    if mode in MODE_PARAMS:
+        params.update(MODE_PARAMS[mode])
+    else:
+        # Unknown modes analyse like swing but keep the tightest gold SL cap
+        params.update(MODE_PARAMS["swing"], max_sl_usd=5.0)
+    params.update(overrides)
+    return params
+
+
+def is_gold(symbol):
+    return route(symbol).asset == "gold"
+
+
+def score(price, atr, rsi, adx, ema50, bullish_ob, bearish_ob, htf_trend, divergence, params, reasons=None):
+    """Bull/bear points for one bar; human readable reasons go into `reasons`."""
+    bull_score = 0
+    bear_score = 0
+    note = reasons.append if reasons is not None else None
+
+    # 1. Trend Analysis
+    if price > ema50:
+        bull_score += params["w_ema"]
+        if note: note("Price > EMA50")
+    else:
+        bear_score += params["w_ema"]
+        if note: note("Price < EMA50")
+
+    if htf_trend == "ULLISH":
+        bull_score += params["w_htf"]
+        if note: note("Major Trend Bullish 🟢")
+    elif htf_trend == "EARISH":
+        bear_score += params["w_htf"]
+        if note: note("Major Trend Bearish 🔴")
+
+    # 2. Momentum & Divergence
+    if rsi > 55: bull_score += params["w_rsi"]
+    elif rsi < 45: bear_score += params["w_rsi"]
+
+    if rsi < 30:
+        bull_score += params["w_rsi_extreme"]
+        if note: note("RSI Oversold")
+    elif rsi > 70:
+        bear_score += params["w_rsi_extreme"]
+        if note: note("RSI Overbought")
+
+    if divergence == "BULLISH":
+        bull_score += params["w_divergence"]
+        if note: note("🔥 Bullish Divergence Detected")
+    elif divergence == "BEARISH":
+        bear_score += params["w_divergence"]
+        if note: note("🔥 Bearish Divergence Detected")
+
+    # 3. Strength
+    if note:
+        if adx > 25: note(f"Strong Trend (ADX {int(adx)})")
+        else: note(f"Weak Trend (ADX {int(adx)})")
+
+    near = atr * params["ob_near_atr"]
+    if bullish_ob:
+        if note: note(f"Bullish OB Found ({round(bullish_ob, 2)})")
+        if abs(price - bullish_ob) < near:
+            bull_score += params["w_ob"]
+            if note: note("Price Near Bullish OB")
+
+    if bearish_ob:
+        if note: note(f"Bearish OB Found ({round(bearish_ob, 2)})")
+        if abs(price - bearish_ob) < near:
+            bear_score += params["w_ob"]
+            if note: note("Price Near Bearish OB")
+
+    return bull_score, bear_score
+
+
+def entries(strategy, bias, price, atr, rsi, ema50, bb_lower, bb_mid, bb_upper, stoch_k, bullish_ob, bearish_ob, params):
+    """Limit entry prices (buy_entry, sell_entry) for the mode's strategy."""
+    buy_entry = price
+    sell_entry = price
+
+    if strategy == "trend_follow": # Scalping M15
+        if bias.startswith("BULLISH"):
+            if bullish_ob and bullish_ob < price:
+                buy_entry = bullish_ob
+            elif (price > ema50) and (stoch_k < 20 or rsi < 45):
+                buy_entry = ema50
+            elif (price > bb_mid) and (stoch_k < 20 or rsi < 45):
+                buy_entry = bb_mid
+            else:
+                # Fallback: Wait for pullback
+                buy_entry = price - (atr * params["pullback_atr"])
+
+            sell_entry = bb_upper
+
+        elif bias.startswith("BEARISH"):
+            # Priority 1: Order Block
+            if bearish_ob and bearish_ob > price:
+                sell_entry = bearish_ob
+            # Priority 2: EMA50/BB Mid (Only if Momentum is good)
+            elif (price < ema50) and (stoch_k > 80 or rsi > 55):
+                sell_entry = ema50
+            elif (price < bb_mid) and (stoch_k > 80 or rsi > 55):
+                sell_entry = bb_mid
+            else:
+                sell_entry = price + (atr * params["pullback_atr"])
+
+            buy_entry = bb_lower
+
+        else:
+            buy_entry = bb_lower
+            sell_entry = bb_upper
+
+    elif strategy == "pullback": # Daytrade
+        near = atr * params["ob_pullback_atr"]
+        if bias == "BULLISH":
+            if bullish_ob and abs(bullish_ob - price) < near:
+                buy_entry = bullish_ob
+            elif price > ema50:
+                buy_entry = ema50
+            else:
+                buy_entry = bb_mid
+
+            sell_entry = bb_upper
+
+        elif bias == "BEARISH":
+            if bearish_ob and abs(bearish_ob - price) < near:
+                sell_entry = bearish_ob
+            elif price < ema50:
+                sell_entry = ema50
+            else:
+                sell_entry = bb_mid
+
+            buy_entry = bb_lower
+
+        else:
+            buy_entry = bb_lower
+            sell_entry = bb_upper
+
+    elif strategy == "mean_reversion": # Swing
+        buy_entry = bb_lower
+        if bullish_ob and abs(bullish_ob - bb_lower) < atr:
+            buy_entry = bullish_ob
+
+        sell_entry = bb_upper
+        if bearish_ob and abs(bearish_ob - bb_upper) < atr:
+            sell_entry = bearish_ob
+
+    max_dist = atr * params["max_entry_atr"]
+    if (price - buy_entry) > max_dist: buy_entry = price - atr * params["clamp_entry_atr"]
+    if (sell_entry - price) > max_dist: sell_entry = price + atr * params["clamp_entry_atr"]
+
+    min_dist = atr * params["min_entry_atr"]
+    if buy_entry >= price: buy_entry = price - min_dist
+    if sell_entry <= price: sell_entry = price + min_dist
+
+    return buy_entry, sell_entry
+
+
+def stop_distance(atr, params, gold):
+    """ATR based SL distance, capped in USD for gold."""
+    sl_dist = atr * params["sl_mult"]
+    if gold and sl_dist > params["max_sl_usd"]:
+        sl_dist = params["max_sl_usd"]
+    return sl_dist
+
+
+def build_setup(price, atr, rsi, adx, ema50, bb_lower, bb_mid, bb_upper, stoch_k,
+                bullish_ob, bearish_ob, htf_trend, divergence, params, gold=False, reasons=None):
+    """
+    Bias plus buy/sell limit setups for one bar. Order blocks are None when
+    absent. Returns a dict with bull_score, bear_score, bias, action and
+    buy_/sell_ entry, sl, tp.
+    """
+    bull_score, bear_score = score(
+        price, atr, rsi, adx, ema50, bullish_ob, bearish_ob, htf_trend, divergence, params, reasons,
+    )
+
+    if bull_score > bear_score:
+        bias = "BULLISH"
+        action = "🟢 เน้นฝั่ง BUY"
+    elif bear_score > bull_score:
+        bias = "BEARISH"
+        action = "🔴 เน้นฝั่ง SELL"
+    else:
+        bias = "SIDEWAY"
+        action = "⚠️ รอเลือกทาง"
+
+    strategy = params["strategy"]
+    buy_entry, sell_entry = entries(
+        strategy, bias, price, atr, rsi, ema50, bb_lower, bb_mid, bb_upper, stoch_k, bullish_ob, bearish_ob, params,
+    )
+    if strategy == "trend_follow" and adx < 20:
+        action = "⚠️ ระวัง (ADX ต่ำ)"
+        bias = "SIDEWAY (Weak ADX)"
+
+    sl_dist = stop_distance(atr, params, gold)
+    tp_dist = sl_dist * (params["tp_mult"] / params["sl_mult"])
+    return {
+        "bull_score": bull_score,
+        "bear_score": bear_score,
+        "bias": bias,
+        "action": action,
+        "buy_entry": buy_entry,
+        "buy_sl": buy_entry - sl_dist,
+        "buy_tp": buy_entry + tp_dist,
+        "sell_entry": sell_entry,
+        "sell_sl": sell_entry + sl_dist,
+        "sell_tp": sell_entry - tp_dist,
+    }
@@ -0,0 +1,197 @@
+"""
+Grid / random search over strategy parameters against historical bars.
+
+The per-bar feature arrays of backtest.prepare() do not depend on the
+strategy parameters, so they are computed once per mode and copied into a
+single shared-memory block. Worker processes attach to it on start-up and
+build zero-copy NumPy views, so each task only ships a small dict of
+parameter overrides.
+
+    python sweep.py GC=F bars.csv --samples 2000
+    python sweep.py GC=F --period 60d --mode scalping --grid
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import FEATURES, load_bars, mode_bars, prepare, simulate, summarize
+from strategy import MODE_PARAMS, is_gold, mode_params
+
+# The grid only spans the risk settings; the full space is for random search
+GRID_KEYS = ("sl_mult", "tp_mult", "max_sl_usd")
+
+# Candidate values per parameter: a list is sampled as choices (and expanded
+# by the grid), a (low, high) tuple is sampled uniformly by random search.
+SEARCH_SPACE = {
+    "sl_mult": [0.5, 0.8, 1.0, 1.5, 2.0],
+    "tp_mult": [1.0, 1.5, 2.5, 3.0, 4.0],
+    "max_sl_usd": [5.0, 10.0, 15.0, 25.0],
+    "max_entry_atr": [2.0, 3.0, 4.0],
+    "clamp_entry_atr": [0.5, 1.0, 1.5],
+    "w_ema": [1, 2, 3],
+    "w_htf": [0, 1, 2, 3],
+    "w_rsi": [0, 1, 2],
+    "w_rsi_extreme": [1, 2, 3],
+    "w_divergence": [1, 2, 3, 4],
+    "divergence": ["window", "pivot"],
+    "divergence_hold": [1, 3, 5],
+    "w_ob": [0, 1, 2],
+}
+
+
+class SharedFeatures:
+    """
+    Feature arrays packed into one shared-memory block (rows in FEATURES
+    order). The creating process owns the block and must call `release()`.
+    """
+
+    def __init__(self, features):
+        n = len(features["close"])
+        self.shape = (len(FEATURES), n)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * self.shape[0] * n))
+        block = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+        for row, name in enumerate(FEATURES):
+            block[row] = features[name]
+
+    @property
+    def handle(self):
+        """Picklable (name, shape) a worker passes to `attach`."""
+        return self.shm.name, self.shape
+
+    @staticmethod
+    def attach(handle):
+        name, shape = handle
+        shm = shared_memory.SharedMemory(name=name)
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        return shm, {name: block[row] for row, name in enumerate(FEATURES)}
+
+    def release(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(handle, mode, gold, sim):
+    shm, features = SharedFeatures.attach(handle)
+    _worker.update(shm=shm, features=features, mode=mode, gold=gold, sim=sim)
+
+
+def _evaluate(overrides):
+    params = mode_params(_worker["mode"], **overrides)
+    result = simulate(_worker["features"], params, gold=_worker["gold"], **_worker["sim"])
+    return overrides, summarize(result)
+
+
+def grid(space):
+    """Every combination of the list-valued entries of `space`."""
+    keys = [k for k, v in space.items() if isinstance(v, list)]
+    for values in itertools.product(*(space[k] for k in keys)):
+        yield dict(zip(keys, values))
+
+
+def random_candidates(space, samples, seed=0):
+    """`samples` random parameter sets drawn from `space`."""
+    rng = random.Random(seed)
+    for _ in range(samples):
+        yield {
+            k: rng.choice(v) if isinstance(v, list) else round(rng.uniform(*v), 4)
+            for k, v in space.items()
+        }
+
+
+def rank(results, rank_by="expectancy", min_trades=30, top=10):
+    """Best configs first; sets with fewer than `min_trades` trades are dropped."""
+    scored = [(o, s) for o, s in results if s["trades"] >= min_trades and not math.isnan(s[rank_by])]
+    scored.sort(key=lambda r: r[1][rank_by], reverse=True)
+    return [{"params": o, "stats": s} for o, s in scored[:top]]
+
+
+def sweep(df, symbol, mode, candidates, workers=None, chunksize=16, rank_by="expectancy",
+          min_trades=30, top=10, features=None, **sim):
+    """
+    Evaluate every candidate override dict for `mode` on `df` (bars of the
+    mode's interval) in a process pool and return the `top` configs.
+    """
+    candidates = list(candidates)
+    if features is None:
+        features = prepare(df, mode)
+    gold = is_gold(symbol)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _worker.update(features=features, mode=mode, gold=gold, sim=sim)
+        try:
+            results = [_evaluate(c) for c in candidates]
+        finally:
+            _worker.clear()
+        return rank(results, rank_by, min_trades, top)
+
+    shared = SharedFeatures(features)
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared.handle, mode, gold, sim)) as pool:
+            results = list(pool.map(_evaluate, candidates, chunksize=chunksize))
+    finally:
+        shared.release()
+    return rank(results, rank_by, min_trades, top)
+
+
+def sweep_modes(df, symbol, interval, candidates, modes=None, **kwargs):
+    """Best configs per mode whose timeframe can be built from `df`."""
+    candidates = list(candidates)
+    report = {}
+    for mode in modes or MODE_PARAMS:
+        bars = mode_bars(df, interval, mode)
+        if bars is not None:
+            report[mode] = sweep(bars, symbol, mode, candidates, **kwargs)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("symbol")
+    parser.add_argument("csv", nargs="?", help="OHLCV CSV indexed by bar open time")
+    parser.add_argument("--interval", default="15m")
+    parser.add_argument("--period", default="60d")
+    parser.add_argument("--mode", action="append", choices=list(MODE_PARAMS))
+    parser.add_argument("--grid", action="store_true", help="grid over the risk settings instead of random search")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rank-by", default="expectancy")
+    parser.add_argument("--min-trades", type=int, default=30)
+    parser.add_argument("--store", help="read bars from this ColumnarBarStore directory")
+    parser.add_argument("--cost", type=float, default=0.0)
+    args = parser.parse_args()
+
+    df = load_bars(args.symbol, args.interval, args.csv, args.period, args.store)
+
+    if args.grid:
+        candidates = list(grid({k: SEARCH_SPACE[k] for k in GRID_KEYS}))
+    else:
+        candidates = list(random_candidates(SEARCH_SPACE, args.samples))
+    start = time.perf_counter()
+    report = sweep_modes(
+        df, args.symbol, args.interval, candidates, modes=args.mode, workers=args.workers,
+        rank_by=args.rank_by, min_trades=args.min_trades, top=5, cost=args.cost,
+    )
+    elapsed = time.perf_counter() - start
+    for mode, best in report.items():
+        print(f"== {mode}")
+        for entry in best:
+            s = entry["stats"]
+            print(f"  {args.rank_by}={s[args.rank_by]:.4f} trades={s['trades']} win={s['win_rate']:.1%} "
+                  f"dd={s['max_drawdown']:.2f}  {entry['params']}")
+    print(f"{len(candidates)} parameter sets x {len(report)} modes in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
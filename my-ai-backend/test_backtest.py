@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import backtest_modes, fill_and_exit, order_block_levels, prepare, summarize
+from analysis import check_divergence
+from order_blocks import find_order_blocks
+from strategy import build_setup, mode_params
+
+
+def make_bars(n=3000, seed=3, freq="15min"):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 2.5, n))
+    open_ = close + rng.normal(0, 1.5, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 2, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 2, n)
+    idx = pd.date_range("2023-01-02", periods=n, freq=freq, tz="UTC")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": 0.0}, index=idx)
+
+
+def test_per_bar_features_match_live_helpers():
+    df = make_bars(400)
+    f = prepare(df, "scalping")
+    o, h, l, c = (df[k].to_numpy() for k in ("Open", "High", "Low", "Close"))
+    frame = df.copy()
+    frame["RSI_14"] = np.where(f["rsi"] == 50.0, np.nan, f["rsi"])
+    for t in range(60, 400, 7):
+        obs = find_order_blocks(o[:t + 1], h[:t + 1], l[:t + 1], c[:t + 1], f["atr"][t])
+        for key in ("bullish", "bearish"):
+            got = f[key + "_ob"][t]
+            assert (obs[key] is None and np.isnan(got)) or obs[key] == got
+        div = check_divergence(frame.iloc[:t + 1])
+        assert {"BULLISH": 1.0, "BEARISH": -1.0, None: 0.0}[div] == f["divergence"][t]
+
+
+def test_order_block_levels_short_history():
+    o = np.array([10.0, 9.0, 9.5])
+    c = np.array([9.0, 11.0, 9.4])
+    h = np.array([10.2, 11.2, 9.6])
+    l = np.array([8.9, 8.8, 9.3])
+    bull, bear = order_block_levels(o, h, l, c, np.full(3, 1.0))
+    # Candle 1 closes above candle 0: the block exists from bar 1 on
+    assert np.isnan(bull[0]) and bull[1] == bull[2] == 8.9
+    assert np.isnan(bear).all()
+
+
+def test_fill_and_exit_is_conservative():
+    o = np.array([100.0, 100.0, 99.0, 99.5, 101.0])
+    h = np.array([100.5, 100.2, 100.0, 103.0, 102.0])
+    l = np.array([99.5, 99.4, 97.0, 99.0, 100.0])
+    c = np.array([100.0, 99.6, 99.5, 102.5, 101.5])
+    # Not reached within one bar
+    assert fill_and_exit(o, h, l, c, 0, 1, 99.0, 98.0, 102.0) is None
+    # Filled on bar 2 which also trades through the stop
+    assert fill_and_exit(o, h, l, c, 1, 1, 99.0, 98.0, 102.0, expiry_bars=2) == (2, 2, 98.0, "sl")
+    # Wider stop survives bar 2, TP on bar 3
+    assert fill_and_exit(o, h, l, c, 1, 1, 99.0, 96.0, 102.0, expiry_bars=2) == (2, 3, 102.0, "tp")
+    # Short: gap above the stop fills at the open
+    o2 = o.copy(); o2[2] = 101.5
+    h2 = h.copy(); h2[2] = 101.6
+    assert fill_and_exit(o2, h2, l, c, 0, -1, 100.1, 101.0, 98.0) == (1, 2, 101.5, "sl")
+
+
+def test_summarize_drawdown_and_expectancy():
+    trades = [{"pnl": p, "r": p / 2} for p in (4.0, -2.0, -2.0, 6.0, -2.0)]
+    stats = summarize({"orders": 10, "trades": trades})
+    assert stats["trades"] == 5 and stats["fill_rate"] == 0.5
+    assert stats["win_rate"] == 0.4
+    assert stats["expectancy"] == 0.8 and stats["expectancy_r"] == 0.4
+    assert stats["max_drawdown"] == 4.0
+    assert stats["profit_factor"] == round(10 / 6, 4)
+
+
+def test_year_of_m15_replays_quickly_for_every_mode():
+    df = make_bars(25_000)
+    start = time.perf_counter()
+    report = backtest_modes(df, "GC=F", "15m")
+    elapsed = time.perf_counter() - start
+    assert set(report) == {"scalping", "daytrade", "swing"}
+    assert report["scalping"]["stats"]["trades"] > 0
+    for res in report.values():
+        for tr in res["trades"]:
+            assert tr["signal_bar"] < tr["fill_bar"] <= tr["exit_bar"]
+    assert elapsed < 10
+
+
+def test_gold_sl_cap_per_mode():
+    for mode, cap in (("scalping", 5.0), ("daytrade", 10.0), ("swing", 25.0)):
+        params = mode_params(mode)
+        setup = build_setup(2000.0, 40.0, 50, 30, 1990.0, 1950.0, 2000.0, 2050.0, 50,
+                            None, None, "NEUTRAL", None, params, gold=True)
+        assert setup["buy_entry"] - setup["buy_sl"] == cap
+        assert setup["sell_sl"] - setup["sell_entry"] == cap
+        free = build_setup(2000.0, 40.0, 50, 30, 1990.0, 1950.0, 2000.0, 2050.0, 50,
+                           None, None, "NEUTRAL", None, params, gold=False)
+        assert free["buy_entry"] - free["buy_sl"] == 40.0 * params["sl_mult"]
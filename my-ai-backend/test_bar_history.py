@@ -0,0 +1,134 @@
+import pandas as pd
+
+from bar_history import IncrementalBarStore, split_bulk_frame
+
+
+class StubSource:
+    """Offline market: `now` bars exist, the last one is still forming."""
+
+    def __init__(self, total=500, now=300):
+        self.index = pd.date_range("2024-01-01", periods=total, freq="15min", tz="UTC")
+        self.now = now
+        self.forming_close = None
+        self.calls = []
+
+    def frame(self, start_pos):
+        idx = self.index[start_pos:self.now]
+        close = [100.0 + i for i in range(start_pos, self.now)]
+        if self.forming_close is not None:
+            close[-1] = self.forming_close
+        return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 0.0}, index=idx)
+
+    def __call__(self, symbol, interval, period=None, start=None):
+        self.calls.append((period, start))
+        if start is None:
+            return self.frame(max(0, self.now - 200))
+        return self.frame(self.index.get_loc(start))
+
+
+def test_first_call_downloads_full_window():
+    src = StubSource()
+    store = IncrementalBarStore(src)
+    df = store.get("GC=F", "15m", "5d")
+    assert len(df) == 200
+    assert src.calls == [("5d", None)]
+
+
+def test_refresh_only_fetches_tail_and_replaces_forming_candle():
+    src = StubSource()
+    store = IncrementalBarStore(src)
+    store.get("GC=F", "15m", "5d")
+
+    src.now += 3
+    src.forming_close = 9999.0
+    df = store.get("GC=F", "15m", "5d")
+
+    period, start = src.calls[-1]
+    assert period is None and start == src.index[299]
+    assert len(df) == 200
+    assert df.index[-1] == src.index[src.now - 1]
+    assert df["Close"].iloc[-1] == 9999.0
+    assert not df.index.duplicated().any()
+
+    # The forming candle gets overwritten on the next refresh
+    src.forming_close = None
+    df = store.get("GC=F", "15m", "5d")
+    assert df["Close"].iloc[-1] == 100.0 + src.now - 1
+    assert store.full_fetches == 1
+    assert store.incremental_fetches == 2
+
+
+def test_failed_refresh_keeps_stored_history():
+    src = StubSource()
+    store = IncrementalBarStore(src)
+    first = store.get("GC=F", "15m", "5d")
+
+    def broken(symbol, interval, period=None, start=None):
+        raise ConnectionError("offline")
+
+    store.source = broken
+    again = store.get("GC=F", "15m", "5d")
+    pd.testing.assert_frame_equal(first, again)
+
+
+def test_split_bulk_frame_and_seed():
+    src = StubSource()
+    one = src.frame(100)
+    bulk = pd.concat({"GC=F": one, "BTC-USD": one * 2}, axis=1)
+    bulk.loc[bulk.index[:5], "BTC-USD"] = float("nan")  # shorter history for one ticker
+    frames = split_bulk_frame(bulk, ["GC=F", "BTC-USD", "MISSING"])
+    assert set(frames) == {"GC=F", "BTC-USD"}
+    assert len(frames["BTC-USD"]) == len(one) - 5
+    assert list(frames["GC=F"].columns) == list(one.columns)
+
+    store = IncrementalBarStore(src)
+    store.seed("GC=F", "15m", "5d", frames["GC=F"])
+    assert store.has("GC=F", "15m", "5d")
+    store.get("GC=F", "15m", "5d")
+    assert store.full_fetches == 0 and src.calls[-1][0] is None  # went straight to an incremental fetch
+
+
+def test_resume_past_the_source_limit_downloads_the_full_period():
+    src = StubSource()
+    now = [src.index[src.now - 1]]
+    store = IncrementalBarStore(src, max_gap={"15m": pd.Timedelta(days=1)}, clock=lambda: now[0])
+    store.get("GC=F", "15m", "5d")
+
+    # A restart two days later: the stored tail is beyond what `start=` can reach
+    src.now += 192
+    now[0] = src.index[src.now - 1]
+    df = store.get("GC=F", "15m", "5d")
+    assert src.calls[-1] == ("5d", None) and store.full_fetches == 2
+    assert df.index[-1] == src.index[src.now - 1]
+
+
+def test_empty_refresh_falls_back_to_a_full_download():
+    src = StubSource()
+    store = IncrementalBarStore(src)
+    store.get("GC=F", "15m", "5d")
+    full = src.frame(max(0, src.now - 200))
+
+    def nothing_since(symbol, interval, period=None, start=None):
+        src.calls.append((period, start))
+        return pd.DataFrame() if start is not None else full
+
+    store.source = nothing_since
+    store.get("GC=F", "15m", "5d")
+    assert [period for period, _ in src.calls[-2:]] == [None, "5d"]
+    assert store.full_fetches == 2
+
+
+def test_outdated_history_is_not_served_when_refresh_fails():
+    src = StubSource()
+    now = [src.index[src.now - 1]]
+    store = IncrementalBarStore(src, max_gap={"15m": pd.Timedelta(days=1)}, clock=lambda: now[0])
+    store.get("GC=F", "15m", "5d")
+
+    def broken(symbol, interval, period=None, start=None):
+        raise ConnectionError("offline")
+
+    store.source = broken
+    now[0] += pd.Timedelta(hours=2)
+    assert len(store.get("GC=F", "15m", "5d")) == 200 and store.stale_serves == 1
+    now[0] += pd.Timedelta(days=2)
+    assert store.get("GC=F", "15m", "5d").empty
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from bus import LocalBus, SocketBus
+
+
+@pytest.fixture
+def sock_path():
+    # Unix socket paths are limited to ~100 bytes, pytest's tmp_path can be longer
+    root = tempfile.mkdtemp(prefix="bus", dir="/tmp")
+    yield os.path.join(root, "bus.sock")
+    shutil.rmtree(root, ignore_errors=True)
+
+
+async def until(predicate, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def test_local_bus_delivers_and_drops_oldest():
+    async def run():
+        bus = LocalBus(queue_size=2)
+        a, b = bus.subscribe("GC=F"), bus.subscribe("GC=F")
+        other = bus.subscribe("BTC-USD")
+        for i in range(3):
+            bus.publish("GC=F", i)
+        bus.unsubscribe("GC=F", b)
+        bus.publish("GC=F", 3)
+        return [a.get_nowait() for _ in range(a.qsize())], b.qsize(), other.qsize(), bus.dropped
+
+    assert asyncio.run(run()) == ([2, 3], 2, 0, 3)
+
+
+def test_local_roles_run_one_at_a_time():
+    async def run():
+        bus = LocalBus()
+        log = []
+
+        async def work(name):
+            log.append(f"start {name}")
+            await asyncio.sleep(0.02)
+            log.append(f"end {name}")
+            return name
+
+        results = await asyncio.gather(bus.lead("feed", lambda: work("a")), bus.lead("feed", lambda: work("b")))
+        return results, log, bus.leading
+
+    results, log, leading = asyncio.run(run())
+    assert results == ["a", "b"]
+    assert log == ["start a", "end a", "start b", "end b"]
+    assert leading == set()
+
+
+def test_socket_bus_routes_between_workers(sock_path):
+    async def run():
+        broker, worker = SocketBus(sock_path), SocketBus(sock_path)
+        await broker.start()
+        await worker.start()
+        assert broker.broker and not worker.broker
+        at_broker, at_worker = broker.subscribe("GC=F"), worker.subscribe("GC=F")
+        await until(lambda: broker.stats()["peers"] == 1 and any(broker._peers.values()))
+
+        broker.publish("GC=F", {"json": "2000"})
+        worker.publish("GC=F", {"binary": b"\x01"})
+        await until(lambda: at_broker.qsize() == 2 and at_worker.qsize() == 2)
+        got = [at_broker.get_nowait() for _ in range(2)], [at_worker.get_nowait() for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert at_broker.empty() and at_worker.empty()  # no echo back to the publisher
+        await worker.close()
+        await broker.close()
+        return got
+
+    at_broker, at_worker = asyncio.run(run())
+    assert at_broker == [{"json": "2000"}, {"binary": b"\x01"}]
+    assert sorted(at_worker, key=str) == sorted(at_broker, key=str)  # own message first
+
+
+def test_role_moves_to_a_surviving_worker(sock_path):
+    async def run():
+        first, second = SocketBus(sock_path, retry=0.05), SocketBus(sock_path, retry=0.05)
+        await first.start()
+        await second.start()
+        running = []
+
+        async def produce(name):
+            running.append(name)
+            await asyncio.Event().wait()
+
+        leaders = [
+            asyncio.create_task(first.lead("producer:GC=F", lambda: produce("first"))),
+            asyncio.create_task(second.lead("producer:GC=F", lambda: produce("second"))),
+        ]
+        await until(lambda: running)
+        await asyncio.sleep(0.05)
+        assert running == ["first"]
+
+        # The broker (and leader) goes away: the other worker becomes broker and leader
+        await first.close()
+        await until(lambda: running == ["first", "second"])
+        assert second.broker and second.leading == {"producer:GC=F"}
+        for leader in leaders:
+            leader.cancel()
+        await second.close()
+
+    asyncio.run(run())
+
+
+def test_client_leader_hands_over_on_resign(sock_path):
+    async def run():
+        broker, worker = SocketBus(sock_path), SocketBus(sock_path)
+        await broker.start()
+        await worker.start()
+        release = asyncio.Event()
+        order = []
+
+        async def produce(name):
+            order.append(name)
+            if name == "worker":
+                await release.wait()
+            return name
+
+        worker_lead = asyncio.create_task(worker.lead("snapshots", lambda: produce("worker")))
+        await until(lambda: order == ["worker"])
+        broker_lead = asyncio.create_task(broker.lead("snapshots", lambda: produce("broker")))
+        await asyncio.sleep(0.05)
+        assert order == ["worker"]
+        release.set()
+        results = await asyncio.gather(worker_lead, broker_lead)
+        await worker.close()
+        await broker.close()
+        return order, results
+
+    assert asyncio.run(run()) == (["worker", "broker"], ["worker", "broker"])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from bar_history import IncrementalBarStore
+from columnar_store import ColumnarBarStore
+from test_bar_history import StubSource
+
+
+def frame(start, n, tz="America/New_York", base=100.0):
+    idx = pd.date_range(start, periods=n, freq="15min", tz=tz, name="Datetime")
+    close = base + np.arange(n, dtype=float)
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 10.0}, index=idx)
+
+
+def test_round_trip_keeps_values_and_timezone(tmp_path):
+    store = ColumnarBarStore(str(tmp_path))
+    df = frame("2024-01-02 09:30", 50)
+    store.append("GC=F", "15m", df)
+    back = store.read("GC=F", "15m")
+    pd.testing.assert_frame_equal(back, df.set_axis(df.index.as_unit("ns")), check_freq=False)
+    assert str(back.index.tz) == "America/New_York"
+    assert len(store.read("GC=F", "15m", tail=5)) == 5
+    assert store.read("GC=F", "15m", start=df.index[45]).index[0] == df.index[45]
+    assert store.read("BTC-USD", "15m") is None
+
+
+def test_append_replaces_forming_candle(tmp_path):
+    store = ColumnarBarStore(str(tmp_path))
+    store.append("GC=F", "15m", frame("2024-01-02 09:30", 10))
+    update = frame("2024-01-02 11:45", 3, base=500.0)  # starts at the last stored bar
+    store.append("GC=F", "15m", update)
+    back = store.read("GC=F", "15m")
+    assert len(back) == 12
+    assert back["Close"].iloc[9] == 500.0
+    assert not back.index.duplicated().any()
+
+
+def test_torn_write_is_ignored(tmp_path):
+    store = ColumnarBarStore(str(tmp_path))
+    store.append("GC=F", "15m", frame("2024-01-02 09:30", 10))
+    with open(tmp_path / "GC=F" / "15m" / "ts.i8", "ab") as f:
+        f.write(np.int64(0).tobytes())  # timestamp written, columns not
+    assert len(store.read("GC=F", "15m")) == 10
+
+
+def test_restart_only_downloads_new_bars(tmp_path):
+    src = StubSource()
+    first = IncrementalBarStore(src, archive=ColumnarBarStore(str(tmp_path)))
+    before = first.get("GC=F", "15m", "5d")
+
+    src.now += 2
+    src.calls.clear()
+    restarted = IncrementalBarStore(src, archive=ColumnarBarStore(str(tmp_path)))
+    after = restarted.get("GC=F", "15m", "5d")
+    assert restarted.full_fetches == 0 and restarted.archive_loads == 1
+    assert src.calls == [(None, before.index[-1])]
+    assert len(after) == 200 and after.index[-1] == src.index[src.now - 1]
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from compute import BoundedExecutor, ProcessComputePool, SharedFrame
+
+
+def test_concurrency_is_bounded_by_workers():
+    executor = BoundedExecutor(workers=2, queue=1)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work(i):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return i * 2
+
+    async def run():
+        tasks = [asyncio.create_task(executor.run(work, i)) for i in range(8)]
+        await asyncio.sleep(0.005)
+        waiting = executor.waiting
+        return await asyncio.gather(*tasks), waiting
+
+    results, waiting = asyncio.run(run())
+    assert results == [i * 2 for i in range(8)]
+    assert peak[0] == 2
+    assert waiting == 5   # 2 running + 1 queued, the rest wait on the loop
+    assert executor.stats()["completed"] == 8
+    executor.shutdown()
+
+
+def test_errors_propagate_and_free_the_slot():
+    executor = BoundedExecutor(workers=1, queue=0)
+
+    def boom():
+        raise ValueError("bad frame")
+
+    async def run():
+        try:
+            await executor.run(boom)
+        except ValueError:
+            pass
+        return await executor.run(lambda: "next")
+
+    assert asyncio.run(run()) == "next"
+    executor.shutdown()
+
+
+def _frame(n=50, tz="UTC"):
+    index = pd.date_range("2026-01-01", periods=n, freq="15min", tz=tz, name="Datetime")
+    close = 2000 + np.cumsum(np.random.default_rng(1).normal(0, 1, n))
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 0.0}, index=index)
+
+
+def _last_close_and_tz(df, offset):
+    return float(df["Close"].iloc[-1]) + offset, str(df.index.tz), os.getpid()
+
+
+def test_shared_frame_round_trip():
+    for tz in ("UTC", "America/New_York", None):
+        df = _frame(tz=tz)
+        shared = SharedFrame(df)
+        try:
+            pd.testing.assert_frame_equal(SharedFrame.load(shared.handle), df, check_freq=False)
+        finally:
+            shared.release()
+    empty = SharedFrame(_frame().iloc[:0])
+    assert SharedFrame.load(empty.handle).empty
+    empty.release()
+
+
+def test_process_pool_runs_on_shared_frames():
+    pool = ProcessComputePool(workers=1)
+
+    async def run():
+        pids = await pool.start()
+        result = await pool.run(("GC=F", "scalping"), _last_close_and_tz, _frame(), 0.5)
+        return pids, result
+
+    try:
+        pids, (close, tz, pid) = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert close == float(_frame()["Close"].iloc[-1]) + 0.5
+    assert tz == "UTC"
+    assert pid == pids[0] != os.getpid()
+    assert pool.stats()["completed"] == 1 and pool.shared_bytes > 0
+
+
+def test_keys_stick_to_one_worker():
+    pool = ProcessComputePool(workers=4)
+    assert len({pool.worker_for(("GC=F", "scalping")) for _ in range(10)}) == 1
+    assert len({pool.worker_for((s, m)) for s in ("GC=F", "BTC-USD", "EURUSD=X") for m in ("scalping", "daytrade", "swing")}) > 1
+    pool.shutdown()
+
+
+def test_scheduler_refreshes_run_in_the_pool_and_report_stages(tmp_path):
+    import main
+    from fixtures import FixtureSource, synthesize
+
+    synthesize(str(tmp_path), ["GC=F"], bars=400, ticks=20)
+    main.use_market_source(FixtureSource(str(tmp_path)))
+    pool = ProcessComputePool(workers=1, preload=("analysis",))
+    main.compute_pool = pool
+    before = main.STAGE_SECONDS.count("indicators")
+    pool_errors = main.STAGE_ERRORS.value("compute_pool")
+
+    async def run():
+        await pool.start()
+        return await main.snapshot_scheduler.refresh(main.snapshot_scheduler.key("GC=F", "swing"))
+
+    try:
+        snapshot = asyncio.run(run())
+    finally:
+        main.compute_pool = None
+        pool.shutdown()
+        main.reset_state()
+    assert snapshot is not None and snapshot["result"]["action"]
+    assert pool.stats()["completed"] == 1 and main.STAGE_ERRORS.value("compute_pool") == pool_errors
+    # Stage timings recorded in the worker show up in the parent's /metrics
+    assert main.STAGE_SECONDS.count("indicators") == before + 1
+    assert 'analysis_stage_seconds_count{stage="indicators"}' in main.metrics_endpoint().body.decode()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from divergence import (
+    DivergenceRegistry, DivergenceTracker, divergence_signal, find_divergences, find_pivots,
+    window_divergence_codes,
+)
+
+
+def random_series(n=3000, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 2, n))
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    rsi = 50 + 15 * np.sin(np.arange(n) / 9) + rng.normal(0, 5, n)
+    rsi[:14] = np.nan
+    return low, high, rsi
+
+
+def strip(events):
+    return [{k: v for k, v in e.items() if k not in ("start_time", "end_time")} for e in events]
+
+
+def test_window_codes_flag_lower_low_with_higher_rsi():
+    close = np.array([10, 9, 8, 9, 10, 11, 10, 9, 8.5, 7.5])
+    rsi = np.array([45, 40, 30, 35, 40, 45, 42, 40, 38, 35.0])
+    assert window_divergence_codes(close, rsi)[-1] == 1.0
+
+
+def test_pivots_need_both_sides():
+    low = np.array([5, 4, 3, 4, 5, 6, 5, 4, 5, 6, 7.0])
+    assert list(find_pivots(low, left=2, right=2)) == [2, 7]
+    assert list(find_pivots(low, left=2, right=2, low=False)) == [5]
+    assert list(find_pivots(low[:9], left=2, right=2)) == [2]  # bar 7 not confirmed yet
+
+
+def test_regular_and_hidden_divergences():
+    low = np.array([10, 9, 8, 9, 10, 9, 7, 9, 10, 9, 8, 9, 10.0])
+    rsi = np.array([50, 40, 30, 40, 50, 40, 35, 40, 50, 40, 25, 40, 50.0])
+    events = find_divergences(low, low + 5, rsi, left=2, right=2)
+    bullish = [(e["kind"], e["start"], e["end"], e["confirmed"]) for e in events if e["direction"] == "bullish"]
+    assert bullish == [("regular", 2, 6, 8), ("hidden", 6, 10, 12)]
+    codes = divergence_signal(events, len(low), hold=2)
+    assert list(codes[7:11]) == [0.0, 1.0, 1.0, 0.0]
+
+
+def test_tracker_matches_full_scan():
+    low, high, rsi = random_series()
+    expected = find_divergences(low, high, rsi)
+    assert len(expected) > 20
+    tracker = DivergenceTracker(max_events=10_000)
+    got = []
+    for i in range(len(low)):
+        got += tracker.update(i, low[i], high[i], rsi[i])
+    assert strip(got) == expected
+
+
+def test_registry_only_feeds_new_closed_bars():
+    low, high, rsi = random_series(400)
+    idx = pd.date_range("2024-01-01", periods=400, freq="15min", tz="UTC")
+    df = pd.DataFrame({"Low": low, "High": high}, index=idx)
+    registry = DivergenceRegistry()
+    tracker = registry.sync("k", df.iloc[:300], rsi[:300])
+    assert tracker.bars == 299  # the forming bar is left out
+    tracker = registry.sync("k", df, rsi)
+    assert tracker.bars == 399 and registry.rebuilds == 1
+    assert strip(tracker.events) == find_divergences(low[:399], high[:399], rsi[:399])[-len(tracker.events):]
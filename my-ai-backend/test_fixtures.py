@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from bar_history import IncrementalBarStore
+from fixtures import FixtureSource, synthesize, timeframes, write_bars, write_ticks
+
+
+def test_synthesized_fixtures_cover_every_timeframe(tmp_path):
+    synthesize(str(tmp_path), ["GC=F"], bars=300, ticks=50)
+    source = FixtureSource(str(tmp_path))
+    for interval, period in timeframes():
+        df = source.bars("GC=F", interval, period=period)
+        assert len(df) == 300
+        assert (df["High"] >= df[["Open", "Close"]].max(axis=1)).all()
+    assert len(source.ticks("PAXGUSDT")[1]) == 50
+    assert source.price("GC=F") == source.ticks("PAXGUSDT")[1][-1]
+
+
+def test_synthesize_is_reproducible(tmp_path):
+    synthesize(str(tmp_path / "a"), ["BTC-USD"], bars=100, ticks=10, seed=3)
+    synthesize(str(tmp_path / "b"), ["BTC-USD"], bars=100, ticks=10, seed=3)
+    a = FixtureSource(str(tmp_path / "a")).bars("BTC-USD", "15m")
+    b = FixtureSource(str(tmp_path / "b")).bars("BTC-USD", "15m")
+    pd.testing.assert_frame_equal(a, b)
+
+
+def test_bars_round_trip_and_aliases(tmp_path):
+    index = pd.date_range("2026-01-01", periods=5, freq="h", tz="UTC", name="Datetime")
+    df = pd.DataFrame({"Open": 1.0, "High": 2.0, "Low": 0.5, "Close": np.arange(5.0), "Volume": 0.0}, index=index)
+    write_bars(str(tmp_path), "GC=F", "60m", df)
+    source = FixtureSource(str(tmp_path))
+
+    pd.testing.assert_frame_equal(source.bars("GC=F", "1h"), df, check_freq=False)
+    assert list(source.bars("GC=F", "60m", start=index[3])["Close"]) == [3.0, 4.0]
+    assert source.bars("GC=F", "1d").empty
+    assert list(source.bulk_bars(["GC=F", "SI=F"], "60m", "1mo")) == ["GC=F"]
+
+
+def test_price_without_pair_or_ticks_is_none(tmp_path):
+    source = FixtureSource(str(tmp_path))
+    assert source.price("EURUSD=X") is None
+    assert source.price("BTC-USD") is None
+    write_ticks(str(tmp_path), "BTCUSDT", [0.0, 0.5], [60000.0, 60001.5])
+    assert FixtureSource(str(tmp_path)).price("BTC-USD") == 60001.5
+
+
+def test_plugs_into_bar_store(tmp_path):
+    synthesize(str(tmp_path), ["GC=F"], bars=200, ticks=10)
+    source = FixtureSource(str(tmp_path))
+    store = IncrementalBarStore(source=source.bars)
+    first = store.get("GC=F", "15m", "5d")
+    again = store.get("GC=F", "15m", "5d")
+    assert len(first) == len(again) == 200
+    assert store.full_fetches == 1 and store.incremental_fetches == 1
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from htf_context import HTFContext, resample_ohlcv
+from indicators import IndicatorRegistry
+from strategy import MODE_PARAMS
+
+
+def bars(n, freq, start=2000.0, step=1.0):
+    idx = pd.date_range("2024-01-01", periods=n, freq=freq, tz="UTC")
+    close = start + step * np.arange(n)
+    return pd.DataFrame({"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1.0}, index=idx)
+
+
+class Market:
+    def __init__(self):
+        self.loads = []
+        self.now = 0.0
+
+    def load(self, symbol, interval, period):
+        self.loads.append((interval, period))
+        return bars(300, "1D", step=-1.0), f"{interval} (Futures)"
+
+    def context(self):
+        return HTFContext(self.load, IndicatorRegistry(), clock=lambda: self.now)
+
+
+def test_resample_ohlcv_aggregates_bars():
+    m15 = bars(8, "15min")
+    h1 = resample_ohlcv(m15, "60m")
+    assert len(h1) == 2
+    first = h1.iloc[0]
+    assert first["Open"] == m15["Open"].iloc[0]
+    assert first["Close"] == m15["Close"].iloc[3]
+    assert first["High"] == m15["High"].iloc[:4].max()
+    assert first["Low"] == m15["Low"].iloc[:4].min()
+    assert first["Volume"] == 4.0
+
+
+def trading_bars(period_days, freq):
+    """`period_days` business days of a 23h futures session in `freq` bars."""
+    days = pd.bdate_range("2024-01-01", periods=period_days, tz="UTC")
+    idx = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(day, day + pd.Timedelta(hours=23), freq=freq, inclusive="left") for day in days
+    ]))
+    close = 2000.0 + np.arange(len(idx))
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1.0}, index=idx)
+
+
+def test_base_periods_are_too_short_to_rebuild_the_htf():
+    # Why HTF series are always loaded: what each mode's base period holds
+    # resamples to far fewer bars than the EMA200 behind the trend needs
+    trading_days = {"5d": 5, "1mo": 22, "1y": 252}
+    freqs = {"15m": "15min", "60m": "60min", "1d": "1D"}
+    for mode, p in MODE_PARAMS.items():
+        if p["htf_interval"] == p["interval"]:
+            continue
+        base = trading_bars(trading_days[p["period"]], freqs[p["interval"]])
+        assert len(resample_ohlcv(base, p["htf_interval"])) < 200, mode
+
+
+def test_modes_share_one_htf_load_per_series():
+    market = Market()
+    ctx = market.context()
+    for p in MODE_PARAMS.values():
+        ctx.trend("GC=F", p["htf_interval"], p["htf_period"])
+    series = list(dict.fromkeys((p["htf_interval"], p["htf_period"]) for p in MODE_PARAMS.values()))
+    assert market.loads == series
+    assert ctx.stats()["hits"] == len(MODE_PARAMS) - len(series)
+
+
+def test_trend_cached_until_next_htf_bar():
+    market = Market()
+    ctx = market.context()
+    market.now = 3600 * 10 + 5
+    ctx.trend("GC=F", "60m", "1mo")
+    ctx.trend("GC=F", "60m", "1mo")
+    assert len(market.loads) == 1
+    market.now = 3600 * 11
+    ctx.trend("GC=F", "60m", "1mo")
+    assert len(market.loads) == 2
+    assert ctx.stats()["hits"] == 1
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import COLUMNS, LAZY_TOLERANCE, IndicatorEngine, IndicatorRegistry, LazyIndicators, indicator_frame
+
+
+def make_bars(n=600, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 2000 + np.cumsum(rng.normal(0, 3, n))
+    open_ = close + rng.normal(0, 1, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 3, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 3, n)
+    idx = pd.date_range("2024-01-01", periods=n, freq="15min", tz="UTC")
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close}, index=idx)
+
+
+def rma(s, n):
+    return s.ewm(alpha=1.0 / n, min_periods=n).mean()
+
+
+def reference(df):
+    """pandas_ta 0.3.x formulas written with plain pandas."""
+    h, l, c = df["High"], df["Low"], df["Close"]
+    pc = c.shift(1)
+    tr = pd.concat([h - l, h - pc, pc - l], axis=1).abs().max(axis=1)
+    tr.iloc[:1] = np.nan
+    atr = rma(tr, 14)
+
+    diff = c.diff()
+    pos_avg = rma(diff.clip(lower=0), 14)
+    neg_avg = rma(diff.clip(upper=0), 14)
+    rsi = 100 * pos_avg / (pos_avg + neg_avg.abs())
+
+    up = h - h.shift(1)
+    dn = l.shift(1) - l
+    pos = ((up > dn) & (up > 0)) * up
+    neg = ((dn > up) & (dn > 0)) * dn
+    pos.iloc[:1] = np.nan
+    neg.iloc[:1] = np.nan
+    dmp = 100 / atr * rma(pos, 14)
+    dmn = 100 / atr * rma(neg, 14)
+    adx = rma(100 * (dmp - dmn).abs() / (dmp + dmn), 14)
+
+    def ema(n):
+        seeded = c.copy()
+        seeded.iloc[: n - 1] = np.nan
+        seeded.iloc[n - 1] = c.iloc[:n].mean()
+        return seeded.ewm(span=n, adjust=False).mean()
+
+    mid = c.rolling(20).mean()
+    std = c.rolling(20).std(ddof=0)
+    lo, hi = rsi.rolling(14).min(), rsi.rolling(14).max()
+    k = (100 * (rsi - lo) / (hi - lo)).rolling(3).mean()
+    return pd.DataFrame({
+        "ATRr_14": atr, "RSI_14": rsi, "ADX_14": adx, "DMP_14": dmp, "DMN_14": dmn,
+        "EMA_50": ema(50), "EMA_200": ema(200),
+        "BBL_20_2.0": mid - 2 * std, "BBM_20_2.0": mid, "BBU_20_2.0": mid + 2 * std,
+        "STOCHRSIk_14_14_3_3": k, "STOCHRSId_14_14_3_3": k.rolling(3).mean(),
+    })
+
+
+def test_streaming_matches_reference_on_every_bar():
+    df = make_bars()
+    expected = reference(df)
+    engine = IndicatorEngine()
+    rows = [dict(engine.update(ts, r.High, r.Low, r.Close)) for ts, r in zip(df.index, df.itertuples())]
+    got = pd.DataFrame(rows, index=df.index)
+    for col in COLUMNS:
+        np.testing.assert_allclose(got[col], expected[col], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+
+
+def test_indicator_frame_matches_streaming():
+    df = make_bars()
+    engine = IndicatorEngine()
+    rows = [dict(engine.update(ts, r.High, r.Low, r.Close, closed=True)) for ts, r in zip(df.index, df.itertuples())]
+    streamed = pd.DataFrame(rows, index=df.index)
+    got = indicator_frame(df)
+    for col in COLUMNS:
+        np.testing.assert_allclose(got[col], streamed[col], rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
+
+
+def test_forming_candle_is_replaced_not_appended():
+    df = make_bars(300)
+    engine = IndicatorEngine()
+    for ts, r in zip(df.index[:-1], df.itertuples()):
+        engine.update(ts, r.High, r.Low, r.Close, closed=True)
+    last = df.iloc[-1]
+    engine.update(df.index[-1], last.High + 50, last.Low, last.Close + 40)
+    engine.update(df.index[-1], last.High, last.Low, last.Close)
+    expected = reference(df).iloc[-1]
+    assert engine.bars == len(df)
+    for col in COLUMNS:
+        assert engine.values[col] == pytest.approx(expected[col], rel=1e-9), col
+
+
+def test_registry_feeds_only_new_bars():
+    df = make_bars(400)
+    registry = IndicatorRegistry()
+    registry.sync(("GC=F", "15m"), df.iloc[:350])
+    engine = registry.sync(("GC=F", "15m"), df)
+    assert registry.rebuilds == 1
+    expected = reference(df)
+    assert engine.values["EMA_200"] == pytest.approx(expected["EMA_200"].iloc[-1], rel=1e-9)
+    np.testing.assert_allclose(engine.column("RSI_14", 10), expected["RSI_14"].iloc[-10:], rtol=1e-9)
+
+
+def test_registry_returns_snapshots_later_syncs_cannot_change():
+    df = make_bars(300)
+    registry = IndicatorRegistry()
+    first = registry.sync("k", df, columns=("RSI_14",))
+    values, rsi = dict(first.values), first.column("RSI_14", 20)
+
+    # Another request rolls the forming candle back and replays a different one
+    moved = df.copy()
+    moved.iloc[-1, moved.columns.get_loc("Close")] *= 1.05
+    second = registry.sync("k", moved, columns=("RSI_14",))
+    assert second.values["RSI_14"] != values["RSI_14"]
+    assert dict(first.values) == values
+    np.testing.assert_array_equal(first.column("RSI_14", 20), rsi)
+    with pytest.raises(TypeError):
+        first.values["RSI_14"] = 0.0
+    with pytest.raises(KeyError):
+        first.column("EMA_50", 5)   # only the requested tails are copied
+
+
+@pytest.mark.parametrize("n", [40, 300, 3000])
+def test_lazy_tail_windows_match_full_history(n):
+    df = make_bars(n)
+    engine = IndicatorRegistry().sync("x", df)
+    lazy = LazyIndicators(df)
+    assert lazy.size <= n
+    # Starting-point error is scaled by LAZY_TOLERANCE; a few dollars of drift leaves ~1e-5
+    for col in COLUMNS:
+        np.testing.assert_allclose(lazy[col], engine.values[col], rtol=0, atol=1e3 * LAZY_TOLERANCE, equal_nan=True, err_msg=col)
+    np.testing.assert_allclose(lazy.column("RSI_14", n), engine.column("RSI_14", n), atol=1e3 * LAZY_TOLERANCE, equal_nan=True)
+    assert np.isnan(lazy.column("RSI_14", n)[:-64]).all()
+
+
+def test_lazy_computes_only_what_is_read():
+    lazy = LazyIndicators(make_bars(2000))
+    assert lazy.size == lazy.windows["ema200"] < 2000
+    lazy["RSI_14"], lazy["BBU_20_2.0"], lazy["BBL_20_2.0"]
+    assert lazy.computed == {"rsi", "bb"}
+
+
+def test_matches_pandas_ta_when_installed():
+    ta = pytest.importorskip("pandas_ta")
+    df = make_bars()
+    engine = IndicatorRegistry().sync("x", df)
+    df.ta.atr(length=14, append=True)
+    df.ta.rsi(length=14, append=True)
+    df.ta.adx(length=14, append=True)
+    df.ta.ema(length=50, append=True)
+    df.ta.ema(length=200, append=True)
+    df.ta.bbands(length=20, std=2, append=True)
+    df.ta.stochrsi(length=14, rsi_length=14, k=3, d=3, append=True)
+    for col in COLUMNS:
+        assert engine.values[col] == pytest.approx(df[col].iloc[-1], rel=1e-6), col
@@ -0,0 +1,117 @@
+import pytest
+
+from metrics import NOOP, MetricsRegistry, capture, replay, timed
+
+
+def test_counter_renders_labelled_series():
+    registry = MetricsRegistry()
+    errors = registry.counter("upstream_errors_total", "Failed calls", ["source"])
+    errors.inc("yahoo")
+    errors.inc("yahoo")
+    errors.inc("binance", amount=3)
+
+    text = registry.render()
+    assert "# TYPE upstream_errors_total counter" in text
+    assert 'upstream_errors_total{source="yahoo"} 2.0' in text
+    assert 'upstream_errors_total{source="binance"} 3.0' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Time per stage", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        stages.observe(value, "data")
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="data",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="data",le="1.0"} 3' in lines
+    assert 'stage_seconds_bucket{stage="data",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="data"} 4' in lines
+    assert 'stage_seconds_sum{stage="data"} 5.65' in lines
+
+
+def test_timer_context_records_one_observation():
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Time per stage", ["stage"])
+    with stages.time("indicators"):
+        pass
+    assert stages.count("indicators") == 1
+
+
+def test_collected_values_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    state = {"hits": 1}
+    registry.collect("cache_requests_total", "Lookups", lambda: {"hit": state["hits"], "miss": 0},
+                     ["result"], kind="counter")
+    state["hits"] = 7
+    text = registry.render()
+    assert 'cache_requests_total{result="hit"} 7.0' in text
+    assert 'cache_requests_total{result="miss"} 0.0' in text
+
+
+def test_failing_collector_is_skipped():
+    registry = MetricsRegistry()
+    registry.collect("broken", "Raises", lambda: 1 / 0)
+    registry.collect("fine", "Works", lambda: 2)
+    assert registry.render() == "# HELP fine Works\n# TYPE fine gauge\nfine 2.0\n"
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("c", "h", ["symbol"])
+    counter.inc('a"b\\c')
+    assert 'c{symbol="a\\"b\\\\c"} 1.0' in registry.render()
+
+
+def test_disabled_registry_hands_out_noops():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter("c", "h", ["x"])
+    histogram = registry.histogram("h", "h", ["x"])
+    registry.collect("g", "h", lambda: 1)
+    counter.inc("a")
+    with histogram.time("a"):
+        pass
+    assert counter is NOOP and histogram is NOOP
+    assert registry.render() == ""
+
+
+def test_timed_counts_errors_and_reraises():
+    registry = MetricsRegistry()
+    seconds = registry.histogram("upstream_seconds", "Downloads", ["source"])
+    errors = registry.counter("upstream_errors_total", "Failures", ["source"])
+
+    @timed(seconds, errors, "yahoo")
+    def fetch(fail):
+        if fail:
+            raise ValueError("down")
+        return "bars"
+
+    assert fetch(False) == "bars"
+    with pytest.raises(ValueError):
+        fetch(True)
+    assert seconds.count("yahoo") == 2
+    assert errors.value("yahoo") == 1
+
+
+def test_timed_leaves_function_untouched_when_disabled():
+    def fetch():
+        return 1
+
+    assert timed(NOOP, NOOP, "yahoo")(fetch) is fetch
+
+
+def test_captured_events_replay_into_another_registry():
+    worker, parent = MetricsRegistry(), MetricsRegistry()
+    w_stages = worker.histogram("stage_seconds", "h", ["stage"])
+    w_errors = worker.counter("stage_errors_total", "h", ["stage"])
+    w_stages.observe(9.0, "outside")
+    with capture(w_stages, w_errors) as events:
+        w_stages.observe(0.2, "indicators")
+        w_errors.inc("divergence")
+    assert events == [("stage_seconds", ("indicators",), 0.2), ("stage_errors_total", ("divergence",), 1)]
+
+    p_stages = parent.histogram("stage_seconds", "h", ["stage"])
+    p_errors = parent.counter("stage_errors_total", "h", ["stage"])
+    replay(events, p_stages, p_errors, NOOP)
+    assert p_stages.count("indicators") == 1 and p_stages.count("outside") == 0
+    assert p_errors.value("divergence") == 1
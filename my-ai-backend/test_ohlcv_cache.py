@@ -0,0 +1,73 @@
+import pandas as pd
+
+from ohlcv_cache import OHLCVCache, next_bar_due
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_df(n=20, start=100.0):
+    idx = pd.date_range("2024-01-01", periods=n, freq="15min", tz="UTC")
+    close = [start + i for i in range(n)]
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 0}, index=idx)
+
+
+def test_next_bar_due_aligns_to_interval():
+    assert next_bar_due("15m", 900 * 10 + 1) == 900 * 11
+    assert next_bar_due("15m", 900 * 10) == 900 * 11
+    assert next_bar_due("1d", 86400 * 3 + 5) == 86400 * 4
+
+
+def test_hit_until_next_bar_then_refetch():
+    clock = FakeClock(900 * 10 + 30)
+    cache = OHLCVCache(clock=clock)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return make_df()
+
+    cache.get_or_fetch("GC=F", "15m", "5d", fetch)
+    cache.get_or_fetch("GC=F", "15m", "5d", fetch)
+    assert len(calls) == 1
+
+    clock.now = 900 * 11
+    cache.get_or_fetch("GC=F", "15m", "5d", fetch)
+    assert len(calls) == 2
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_returns_copies_so_callers_can_append_columns():
+    cache = OHLCVCache(clock=FakeClock(0))
+    df = cache.get_or_fetch("GC=F", "15m", "5d", make_df)
+    df["EMA_50"] = 1.0
+    again = cache.get_or_fetch("GC=F", "15m", "5d", make_df)
+    assert "EMA_50" not in again.columns
+
+
+def test_lru_eviction_and_empty_frames_not_cached():
+    cache = OHLCVCache(maxsize=2, clock=FakeClock(0))
+    cache.get_or_fetch("A", "1d", "1y", make_df)
+    cache.get_or_fetch("B", "1d", "1y", make_df)
+    cache.get_or_fetch("A", "1d", "1y", make_df)  # A becomes most recent
+    cache.get_or_fetch("C", "1d", "1y", make_df)  # evicts B
+    assert cache.get("B", "1d", "1y") is None
+    assert cache.get("A", "1d", "1y") is not None
+    assert cache.stats()["evictions"] == 1
+
+    cache.get_or_fetch("D", "1d", "1y", pd.DataFrame)
+    assert cache.get("D", "1d", "1y") is None
+
+
+def test_probe_without_recording_a_miss():
+    cache = OHLCVCache()
+    assert cache.get("GC=F", "15m", "5d", record_miss=False) is None
+    assert cache.stats()["misses"] == 0
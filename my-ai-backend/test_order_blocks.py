@@ -0,0 +1,28 @@
+import pytest
+
+from bench_order_blocks import legacy_order_blocks, make_frame, vectorized
+from order_blocks import find_order_blocks
+
+
+@pytest.mark.parametrize("n", [10, 30, 49, 50, 51, 200])
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_legacy_loop(n, seed):
+    df = make_frame(n, seed)
+    for atr in (0.5, 3.0, 8.0):
+        assert vectorized(df, atr) == legacy_order_blocks(df, atr)
+
+
+def test_zones_cover_lookback_newest_first():
+    df = make_frame(300, seed=3)
+    obs = find_order_blocks(df["Open"], df["High"], df["Low"], df["Close"], 1.0, lookback=200, include_zones=True)
+    idx = [z["index"] for z in obs["zones"]]
+    assert idx == sorted(idx, reverse=True)
+    assert all(98 <= i <= 298 for i in idx)
+    first_bull = next(z for z in obs["zones"] if z["type"] == "bullish")
+    assert first_bull["low"] == obs["bullish"]
+
+
+def test_too_short_frame():
+    assert find_order_blocks([1.0], [1.0], [1.0], [1.0], 1.0, include_zones=True) == {
+        "bullish": None, "bearish": None, "zones": [],
+    }
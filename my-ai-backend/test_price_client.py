@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from price_client import PriceClient, binance_pair
+
+
+class StubBinance(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = 0
+    delay = 0.0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        prices = {"PAXGUSDT": "2345.67", "BTCUSDT": "65000.5"}
+        pair = self.path.split("symbol=")[-1]
+        body = json.dumps({"symbol": pair, "price": prices[pair]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # client hung up after a timeout
+
+
+@pytest.fixture
+def stub_server():
+    StubBinance.connections = 0
+    StubBinance.delay = 0.0
+    server = QuietServer(("127.0.0.1", 0), StubBinance)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_symbol_routing():
+    assert binance_pair("GC=F") == "PAXGUSDT"
+    assert binance_pair("XAUUSD") == "PAXGUSDT"
+    assert binance_pair("BTC-USD") == "BTCUSDT"
+    assert binance_pair("EURUSD=X") is None
+
+
+def test_reuses_keepalive_connection(stub_server):
+    async def run():
+        client = PriceClient(base_url=stub_server)
+        await client.start()
+        prices = [await client.get_price("GC=F") for _ in range(5)]
+        await client.close()
+        return prices
+
+    assert asyncio.run(run()) == [2345.67] * 5
+    assert StubBinance.connections == 1
+
+
+def test_timeout_returns_none(stub_server):
+    StubBinance.delay = 0.5
+
+    async def run():
+        client = PriceClient(base_url=stub_server, timeout=0.1)
+        price = await client.get_price("GC=F")
+        await client.close()
+        return price, client.errors
+
+    assert asyncio.run(run()) == (None, 1)
+
+
+def test_blocking_call_from_worker_thread_uses_loop_pool(stub_server):
+    async def run():
+        client = PriceClient(base_url=stub_server)
+        await client.start()
+        loop = asyncio.get_running_loop()
+        prices = await asyncio.gather(*[
+            loop.run_in_executor(None, client.get_price_blocking, sym) for sym in ("GC=F", "BTC-USD", "GC=F")
+        ])
+        await client.close()
+        return prices
+
+    assert asyncio.run(run()) == [2345.67, 65000.5, 2345.67]
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+
+from price_stream import PriceStream, parse_message
+
+websockets = pytest.importorskip("websockets")
+
+
+def trade(pair, price):
+    return json.dumps({"stream": f"{pair.lower()}@trade", "data": {"e": "trade", "s": pair, "p": str(price)}})
+
+
+def test_parse_trade_and_book_ticker():
+    assert parse_message(trade("PAXGUSDT", 2345.5)) == ("PAXGUSDT", 2345.5)
+    assert parse_message(json.dumps({"s": "BTCUSDT", "b": "100.0", "a": "102.0"})) == ("BTCUSDT", 101.0)
+    assert parse_message(json.dumps({"result": None, "id": 1})) is None
+
+
+async def start_stub(script):
+    """Local exchange stand-in: each connection plays the next list of messages then closes."""
+    connections = []
+
+    async def handler(ws):
+        connections.append(ws.request.path)
+        messages = script[min(len(connections), len(script)) - 1]
+        for msg in messages:
+            await ws.send(msg)
+        await asyncio.sleep(0.05)
+
+    server = await websockets.serve(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"ws://127.0.0.1:{port}", connections
+
+
+def test_publishes_on_change_and_reconnects():
+    async def run():
+        script = [
+            [trade("PAXGUSDT", 2000), trade("PAXGUSDT", 2000), trade("PAXGUSDT", 2001)],
+            [trade("PAXGUSDT", 2002)],
+        ]
+        server, url, connections = await start_stub(script)
+        stream = PriceStream(["PAXGUSDT"], url=url, backoff_initial=0.01)
+        updates = asyncio.Queue()
+
+        sub = stream.subscribe()
+
+        async def drain():
+            while True:
+                updates.put_nowait(await sub.get())
+
+        tasks = [asyncio.create_task(stream.run()), asyncio.create_task(drain())]
+        seen = []
+        while not seen or seen[-1][1] != 2002.0:
+            seen.append(await asyncio.wait_for(updates.get(), 2))
+        for t in tasks:
+            t.cancel()
+        server.close()
+        await server.wait_closed()
+        return seen, connections, stream
+
+    seen, connections, stream = asyncio.run(run())
+    # repeated ticks are suppressed (and bursts may coalesce to the newest)
+    prices = [p for _, p in seen]
+    assert prices == sorted(set(prices))
+    assert 2001.0 in prices
+    assert len(connections) >= 2
+    assert connections[0] == "/stream?streams=paxgusdt@trade"
+    assert stream.latest_price("PAXGUSDT") == 2002.0
+    assert stream.reconnects >= 1
+
+
+def test_slow_subscriber_gets_latest_only():
+    stream = PriceStream(["PAXGUSDT"])
+    queue = stream.subscribe()
+    for price in (1.0, 2.0, 3.0):
+        stream._publish("PAXGUSDT", price)
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == ("PAXGUSDT", 3.0)
+
+
+def test_busy_pair_does_not_evict_another():
+    stream = PriceStream(["PAXGUSDT", "BTCUSDT"])
+    everything = stream.subscribe()
+    gold = stream.subscribe("PAXGUSDT")
+    stream._publish("PAXGUSDT", 2000.5)
+    for price in (60000.1, 60000.2, 60000.3):
+        stream._publish("BTCUSDT", price)
+    assert everything.qsize() == 2
+    assert everything.get_nowait() == ("PAXGUSDT", 2000.5)
+    assert everything.get_nowait() == ("BTCUSDT", 60000.3)
+    assert gold.qsize() == 1 and gold.get_nowait() == ("PAXGUSDT", 2000.5)
@@ -0,0 +1,218 @@
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from providers import CircuitBreaker, ProviderRegistry, ProviderUnavailable, route
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_routes():
+    for symbol in ("GC=F", "XAUUSD", "GOLD"):
+        r = route(symbol)
+        assert (r.history, r.price_pair, r.asset, r.pip_scale) == ("GC=F", "PAXGUSDT", "gold", 100)
+    btc = route("BTC-USD")
+    assert (btc.history, btc.price_pair, btc.pip_scale) == ("BTC-USD", "BTCUSDT", 1)
+    fx = route("EURUSD=X")
+    assert (fx.history, fx.price_pair, fx.pip_scale) == ("EURUSD=X", None, 10000)
+
+
+def test_breaker_opens_then_probes_once():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=10, clock=clock)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()          # the probe
+    assert not breaker.allow()      # only one at a time
+    breaker.failure()
+    assert breaker.state == "open" and breaker.opens == 2
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_circuit_skips_the_provider():
+    clock = FakeClock()
+    registry = ProviderRegistry(clock=clock)
+    calls = []
+
+    def flaky(symbol):
+        calls.append(symbol)
+        raise ConnectionError("down")
+
+    fetch = registry.add("binance", flaky, failure_threshold=2, reset_after=30)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            fetch("GC=F")
+    with pytest.raises(ProviderUnavailable):
+        fetch("GC=F")
+    assert len(calls) == 2
+    stats = registry.stats()["providers"]["binance"]
+    assert (stats["state"], stats["failures"], stats["skipped"]) == ("open", 2, 1)
+
+
+def test_fast_primary_never_hedges():
+    registry = ProviderRegistry(hedge_min=0.2, hedge_max=0.2)
+    backup = []
+    label, result = registry.hedged("history", [
+        ("M15", lambda: "primary", ()),
+        ("H1", lambda: backup.append(1) or "backup", ()),
+    ])
+    assert (label, result) == ("M15", "primary")
+    assert backup == [] and registry.hedges == 0
+
+
+def test_slow_primary_is_hedged():
+    registry = ProviderRegistry(hedge_min=0.05, hedge_max=0.05)
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        return "primary"
+
+    start = time.monotonic()
+    label, result = registry.hedged("history", [("M15", slow, ()), ("H1", lambda: "backup", ())])
+    elapsed = time.monotonic() - start
+    release.set()
+    assert (label, result) == ("H1", "backup")
+    assert elapsed < 1.0
+    assert registry.hedges == 1 and registry.hedge_wins == 1
+
+
+def test_failed_primary_falls_back_without_waiting():
+    registry = ProviderRegistry(hedge_min=5, hedge_max=5)
+
+    def broken():
+        raise TimeoutError("yahoo")
+
+    start = time.monotonic()
+    assert registry.hedged("history", [("M15", broken, ()), ("H1", lambda: [1] * 20, ())]) == ("H1", [1] * 20)
+    assert time.monotonic() - start < 1.0
+    assert registry.hedges == 0
+
+
+def test_rejected_results_fall_through_to_the_last_answer():
+    registry = ProviderRegistry(hedge_min=5, hedge_max=5)
+    enough = lambda rows: len(rows) > 15
+    assert registry.hedged("history", [("M15", lambda: [1] * 20, ()), ("H1", lambda: [2], ())], accept=enough)[0] == "M15"
+    assert registry.hedged("history", [("M15", lambda: [1] * 3, ()), ("H1", lambda: [2], ())], accept=enough) == ("H1", [2])
+
+    def broken():
+        raise ValueError
+
+    assert registry.hedged("history", [("M15", broken, ()), ("H1", broken, ())]) == (None, None)
+
+
+def test_hedge_delay_follows_observed_latency():
+    registry = ProviderRegistry(hedge_min=0.01, hedge_max=1.0)
+    assert registry.hedge_delay("history") == 1.0   # nothing observed yet
+    for _ in range(5):
+        registry.hedged("history", [("M15", lambda: time.sleep(0.02) or 1, ())])
+    assert 0.01 <= registry.hedge_delay("history") < 0.5
+
+
+def test_ready_probe_answers_inline():
+    registry = ProviderRegistry()
+    caller = threading.get_ident()
+    ran = []
+    label, result = registry.hedged(
+        "history", [("M15", lambda: ran.append(1), ())],
+        accept=lambda rows: len(rows) > 1, ready=lambda: [threading.get_ident()] * 2,
+    )
+    assert (label, result) == ("M15", [caller] * 2) and ran == []
+    # A rejected probe falls back to the normal path
+    assert registry.hedged("history", [("M15", lambda: [1, 2], ())], accept=lambda rows: len(rows) > 1, ready=lambda: [0]) == ("M15", [1, 2])
+
+
+def test_async_calls_share_the_breaker():
+    registry = ProviderRegistry()
+
+    def never(symbol):
+        raise AssertionError("sync path unused")
+
+    async def down(symbol):
+        raise ConnectionError("binance")
+
+    registry.add("binance", never, afn=down, failure_threshold=1)
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await registry.acall("binance", "GC=F")
+        with pytest.raises(ProviderUnavailable):
+            await registry.acall("binance", "GC=F")
+        with pytest.raises(ProviderUnavailable):
+            registry.call("binance", "GC=F")
+
+    asyncio.run(run())
+    assert registry.stats()["providers"]["binance"]["skipped"] == 2
+
+
+def test_slow_primary_never_swaps_in_the_fallback():
+    registry = ProviderRegistry(hedge_min=0.05, hedge_max=0.05)
+    backup = []
+
+    def slow():
+        time.sleep(0.3)
+        return [1] * 20
+
+    fallback = ("H1", lambda: backup.append(1) or [2] * 400, ())
+    assert registry.hedged("history", [("M15", slow, ())], accept=lambda rows: len(rows) > 15, fallback=fallback) == ("M15", [1] * 20)
+    assert backup == [] and registry.hedges == 0
+    # ... it only stands in once the primary has failed or come back short
+    assert registry.hedged("history", [("M15", lambda: [1] * 3, ())], accept=lambda rows: len(rows) > 15, fallback=fallback) == ("H1", [2] * 400)
+
+
+def test_queued_time_does_not_count_as_slow():
+    registry = ProviderRegistry(max_workers=1, hedge_min=0.1, hedge_max=0.1)
+    release = threading.Event()
+    blocker = registry._executor.submit(release.wait, 2)
+    threading.Timer(0.3, release.set).start()
+    label, result = registry.hedged("history", [("yahoo", lambda: "bars", ()), ("mirror", lambda: "same bars", ())])
+    blocker.result()
+    assert (label, result) == ("yahoo", "bars")
+    assert registry.hedges == 0
+
+
+def test_slow_yahoo_download_is_hedged_with_the_same_bars(tmp_path, monkeypatch):
+    import main
+    from fixtures import FixtureSource, synthesize
+
+    class SlowHistory(FixtureSource):
+        """Ticker.history stalls, the download endpoint answers at once."""
+
+        def bars(self, symbol, interval, period=None, start=None):
+            time.sleep(1.0)
+            return self.frame(symbol, interval).copy()
+
+        def bulk_bars(self, symbols, interval, period):
+            return {symbol: self.frame(symbol, interval).copy() for symbol in symbols}
+
+    synthesize(str(tmp_path), ["GC=F"], bars=300, ticks=10)
+    main.use_market_source(SlowHistory(str(tmp_path)))
+    monkeypatch.setattr(main.providers, "hedge_min", 0.05)
+    monkeypatch.setattr(main.providers, "hedge_max", 0.05)
+    hedges = main.providers.hedges
+    try:
+        start = time.monotonic()
+        df, label = main.get_data_safe("GC=F", "15m", "5d")
+        elapsed = time.monotonic() - start
+    finally:
+        main.reset_state()
+    assert label == "15m (Futures)" and len(df) == 300
+    assert (df.index[1] - df.index[0]) == pd.Timedelta(minutes=15)   # M15 bars, not the H1 backup
+    assert elapsed < 0.8 and main.providers.hedges == hedges + 1
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight(result_ttl=0)
+    gate = threading.Event()
+    runs = []
+
+    def analysis():
+        runs.append(1)
+        gate.wait(2)
+        return {"price": 2000.0}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(("GC=F", "scalping"), analysis))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while flight.stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(runs) == 1
+    assert results == [{"price": 2000.0}] * 8
+    assert flight.stats()["inflight"] == 0
+
+
+def test_result_cache_absorbs_burst_then_expires():
+    now = [0.0]
+    flight = SingleFlight(result_ttl=2.0, clock=lambda: now[0])
+    runs = []
+
+    def analysis():
+        runs.append(1)
+        return len(runs)
+
+    assert flight.do("k", analysis) == 1
+    now[0] = 1.5
+    assert flight.do("k", analysis) == 1
+    now[0] = 2.5
+    assert flight.do("k", analysis) == 2
+    assert flight.stats()["cache_hits"] == 1
+
+
+def test_failures_are_shared_but_not_cached():
+    flight = SingleFlight()
+
+    def boom():
+        raise RuntimeError("yahoo down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", boom)
+    assert flight.do("k", lambda: None) is None
+    assert flight.do("k", lambda: "ok") == "ok"
+
+
+def test_async_awaiters_share_one_run():
+    flight = SingleFlight(result_ttl=0)
+    runs = []
+
+    async def analysis():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 2000.0}
+
+    async def run():
+        return await asyncio.gather(*[flight.ado(("GC=F", "scalping"), analysis) for _ in range(10)])
+
+    assert asyncio.run(run()) == [{"price": 2000.0}] * 10
+    assert len(runs) == 1
+    assert flight.stats() == {"executions": 1, "coalesced": 9, "cache_hits": 0, "inflight": 0}
+
+
+def test_async_failure_reaches_every_awaiter():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("yahoo down")
+
+    async def run():
+        return await asyncio.gather(*[flight.ado("k", boom) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+
+    async def ok():
+        return "ok"
+
+    assert asyncio.run(flight.ado("k", ok)) == "ok"
+    # ...and the kept result is visible to sync callers too
+    assert flight.do("k", lambda: "other") == "ok"
+
+
+def test_cancelled_first_caller_leaves_the_run_to_the_others():
+    flight = SingleFlight(result_ttl=0)
+    runs = []
+
+    async def analysis():
+        runs.append(1)
+        await asyncio.sleep(0.2)
+        return "signal"
+
+    async def run():
+        first = asyncio.create_task(asyncio.wait_for(flight.ado("k", analysis), 0.05))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.ado("k", analysis))
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    timed_out, result = asyncio.run(run())
+    assert isinstance(timed_out, asyncio.TimeoutError)
+    assert result == "signal" and len(runs) == 1
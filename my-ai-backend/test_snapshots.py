@@ -0,0 +1,120 @@
+import asyncio
+
+from singleflight import SingleFlight
+from snapshots import SnapshotScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**kwargs):
+    clock = FakeClock()
+    prices = {}
+    calls = []
+
+    async def compute(symbol, mode):
+        calls.append((symbol, mode))
+        return {"price": prices.get(symbol, 2000.0), "n": len(calls)}
+
+    sched = SnapshotScheduler(
+        compute=compute,
+        price_of=prices.get,
+        interval_of=lambda mode: "15m",
+        clock=clock,
+        **kwargs,
+    )
+    return sched, clock, prices, calls
+
+
+def test_get_serves_snapshot_until_bar_close():
+    sched, clock, _, calls = make_scheduler()
+    assert sched.get("gc=f", "scalp") is None
+    asyncio.run(sched.refresh(sched.key("GC=F", "scalp")))
+    assert sched.get("GC=F", "scalp") == {"price": 2000.0, "n": 1}
+    assert sched.stats()["served"] == 1
+
+    clock.now += 15 * 60
+    assert sched.get("GC=F", "scalp") is None
+    assert sched._due_keys() == [("GC=F", "scalp")]
+    assert calls == [("GC=F", "scalp")]
+
+
+def test_price_move_marks_snapshot_stale():
+    sched, _, prices, _ = make_scheduler(move_threshold=0.001)
+    sched.store("GC=F", "swing", {"price": 2000.0})
+    prices["GC=F"] = 2001.0
+    assert sched.get("GC=F", "swing") is not None
+    prices["GC=F"] = 2003.0
+    assert sched.get("GC=F", "swing") is None
+
+
+def test_snapshot_without_live_price_expires_after_unpriced_ttl():
+    sched, clock, _, _ = make_scheduler(unpriced_ttl=30)
+    sched.store("EURUSD=X", "swing", {"price": 1.08})
+    clock.now += 29
+    assert sched.get("EURUSD=X", "swing") is not None
+    clock.now += 2
+    assert sched.get("EURUSD=X", "swing") is None
+
+
+def test_idle_keys_expire_but_pinned_keys_stay():
+    sched, clock, _, _ = make_scheduler(idle_ttl=60)
+    sched.track("GC=F", "swing", pinned=True)
+    sched.get("BTC-USD", "scalp")
+    clock.now += 61
+    due = sched._due_keys()
+    assert due == [("GC=F", "swing")]
+    assert sched.stats()["tracked"] == 1
+
+
+def test_workers_without_the_scheduler_prune_too():
+    sched, clock, _, _ = make_scheduler(idle_ttl=60)
+    for i in range(50):
+        sched.get(f"SYM{i}", "scalp")
+        sched.store(f"SYM{i}", "scalp", {"price": 1.0})
+    sched.receive(("OTHER", "swing"), {"result": {"price": 1.0}, "computed_at": clock.now, "expires_at": clock.now + 30})
+    clock.now += 61
+    sched.get("GC=F", "swing")   # no run() loop on this worker
+    assert sched.stats()["tracked"] == 1 and sched.stats()["snapshots"] == 0
+
+
+def test_refresh_notifies_subscribers():
+    async def run():
+        sched, _, _, _ = make_scheduler()
+        queue = sched.subscribe("GC=F", "swing")
+        await sched.refresh(sched.key("GC=F", "swing"))
+        await sched.refresh(sched.key("GC=F", "swing"))
+        snapshot = queue.get_nowait()  # coalesced to the newest
+        assert snapshot["result"]["n"] == 2
+        sched.unsubscribe("GC=F", "swing", queue)
+        assert sched._subscribers == {}
+
+    asyncio.run(run())
+
+
+def test_refresh_shares_one_run_with_request_handlers():
+    flight = SingleFlight(result_ttl=0)
+    runs = []
+
+    async def analysis(symbol, mode):
+        runs.append((symbol, mode))
+        await asyncio.sleep(0.01)
+        return {"price": 2000.0}
+
+    async def compute(symbol, mode):
+        return await flight.ado((symbol, mode), lambda: analysis(symbol, mode))
+
+    sched = SnapshotScheduler(compute=compute, price_of=lambda symbol: None, interval_of=lambda mode: "15m")
+
+    async def run():
+        key = sched.key("GC=F", "swing")
+        return await asyncio.gather(sched.refresh(key), compute(*key))
+
+    snapshot, direct = asyncio.run(run())
+    assert snapshot["result"] == direct == {"price": 2000.0}
+    assert runs == [("GC=F", "swing")] and flight.stats()["coalesced"] == 1
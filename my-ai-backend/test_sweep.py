@@ -0,0 +1,46 @@
+import numpy as np
+
+from backtest import FEATURES, prepare
+from sweep import SharedFeatures, grid, random_candidates, rank, sweep
+from test_backtest import make_bars
+
+
+def test_shared_features_round_trip():
+    features = prepare(make_bars(500), "scalping")
+    shared = SharedFeatures(features)
+    try:
+        shm, views = SharedFeatures.attach(shared.handle)
+        for name in FEATURES:
+            np.testing.assert_array_equal(views[name], features[name])
+        del views
+        shm.close()
+    finally:
+        shared.release()
+
+
+def test_candidates():
+    combos = list(grid({"sl_mult": [0.5, 1.0], "tp_mult": [1.5, 2.5, 4.0], "w_ob": (0, 2)}))
+    assert len(combos) == 6 and combos[0] == {"sl_mult": 0.5, "tp_mult": 1.5}
+    drawn = list(random_candidates({"sl_mult": [0.5, 1.0], "w_ob": (0.0, 2.0)}, 20, seed=1))
+    assert len(drawn) == 20
+    assert all(d["sl_mult"] in (0.5, 1.0) and 0.0 <= d["w_ob"] <= 2.0 for d in drawn)
+    assert drawn == list(random_candidates({"sl_mult": [0.5, 1.0], "w_ob": (0.0, 2.0)}, 20, seed=1))
+
+
+def test_rank_drops_thin_samples():
+    results = [
+        ({"a": 1}, {"trades": 5, "expectancy": 9.0}),
+        ({"a": 2}, {"trades": 50, "expectancy": 1.0}),
+        ({"a": 3}, {"trades": 80, "expectancy": 2.0}),
+    ]
+    best = rank(results, min_trades=30, top=5)
+    assert [b["params"]["a"] for b in best] == [3, 2]
+
+
+def test_process_pool_matches_inline():
+    df = make_bars(4000)
+    candidates = list(grid({"sl_mult": [0.5, 1.0], "tp_mult": [1.5, 3.0]}))
+    inline = sweep(df, "GC=F", "scalping", candidates, workers=1, min_trades=0)
+    pooled = sweep(df, "GC=F", "scalping", candidates, workers=2, chunksize=1, min_trades=0)
+    assert inline == pooled
+    assert len(pooled) == 4
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from tick_frames import FRAME_HEARTBEAT, FRAME_TICK, TickEncoder, decode_binary
+from ws_hub import SubscriptionHub
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_unchanged_ticks_are_suppressed():
+    enc = TickEncoder("GC=F", clock=Clock())
+    assert enc.encode(2000.001, 1990.0) is not None
+    assert enc.encode(2000.004, 1990.0) is None  # same after rounding
+    assert enc.suppressed == 1
+
+
+def test_json_frame_keeps_legacy_shape_and_binary_roundtrips():
+    enc = TickEncoder("GC=F", clock=Clock())
+    frames = enc.encode(2010.0, 2000.0)
+    data = json.loads(frames["json"])
+    assert set(data) == {"symbol", "price", "change", "percent", "timestamp"}
+    assert (data["price"], data["change"], data["percent"]) == (2010.0, 10.0, 0.5)
+    decoded = decode_binary(frames["binary"])
+    assert decoded["type"] == FRAME_TICK and decoded["symbol"] == "GC=F"
+    assert (decoded["price"], decoded["change"], decoded["percent"]) == (2010.0, 10.0, 0.5)
+    assert decode_binary(enc.heartbeat()["binary"])["type"] == FRAME_HEARTBEAT
+    assert "symbol" not in json.loads(enc.heartbeat()["json"])
+
+
+def test_deltas_are_relative_to_keyframe():
+    clock = Clock()
+    enc = TickEncoder("GC=F", keyframe_interval=30, clock=clock)
+    key = json.loads(enc.encode(2010.0, 2000.0)["delta"])
+    assert key["k"] == 1 and key["p"] == 2010.0
+
+    clock.now += 1
+    d1 = json.loads(enc.encode(2011.0, 2000.0)["delta"])
+    clock.now += 1
+    d2 = json.loads(enc.encode(2010.0, 2000.0)["delta"])
+    assert set(d1) == {"s", "p", "c", "pct", "t"}
+    assert set(d2) == {"s", "t"}  # back at the keyframe values
+    assert len(enc.encode(2012.0, 2000.0)["delta"]) < len(enc.encode(2013.0, 2000.0)["json"])
+
+    clock.now += 30
+    assert enc.encode(2020.0, 2000.0)["keyframe"]
+
+
+class Socket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text):
+        self.frames.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        self.frames.append(decode_binary(data))
+
+
+def test_hub_sends_each_socket_its_wire_mode_and_snapshot():
+    async def run():
+        async def idle(symbol):
+            await asyncio.Event().wait()
+
+        hub = SubscriptionHub(idle)
+        legacy, compact, binary = Socket(), Socket(), Socket()
+        hub.set_mode(compact, "delta")
+        hub.set_mode(binary, "binary")
+        for ws in (legacy, compact, binary):
+            hub.subscribe(ws, "GC=F")
+
+        enc = TickEncoder("GC=F", clock=Clock())
+        await hub.publish("GC=F", enc.encode(2010.0, 2000.0))
+        await asyncio.sleep(0.01)
+        await hub.publish("GC=F", enc.encode(2011.0, 2000.0))
+        await asyncio.sleep(0.01)
+        assert [f["price"] for f in legacy.frames] == [2010.0, 2011.0]
+        assert compact.frames[0]["k"] == 1 and compact.frames[1]["p"] == 2011.0
+        assert [f["price"] for f in binary.frames] == [2010.0, 2011.0]
+
+        late = Socket()
+        hub.set_mode(late, "delta")
+        hub.subscribe(late, "GC=F")
+        await asyncio.sleep(0.01)
+        assert late.frames[0]["k"] == 1 and late.frames[1]["p"] == 2011.0
+        for ws in (legacy, compact, binary, late):
+            hub.disconnect(ws)
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import asyncio
+
+from warmup import Warmup
+
+
+def test_stages_run_in_order_and_steps_concurrently():
+    warmup = Warmup()
+    log = []
+
+    async def step(name, delay):
+        log.append(f"start {name}")
+        await asyncio.sleep(delay)
+        log.append(f"end {name}")
+
+    async def run():
+        await warmup.run(
+            [("bars", lambda: step("bars", 0.02)), ("imports", lambda: step("imports", 0.01))],
+            [("analysis", lambda: step("analysis", 0))],
+        )
+
+    asyncio.run(run())
+    assert log[:2] == ["start bars", "start imports"]
+    assert log.index("start analysis") > log.index("end bars")
+    status = warmup.status()
+    assert status["ready"] and set(status["steps"]) == {"bars", "imports", "analysis"}
+    assert all(step["state"] == "ok" for step in status["steps"].values())
+
+
+def test_failures_and_timeouts_do_not_block_readiness():
+    warmup = Warmup(timeout=0.05)
+
+    async def broken():
+        raise ConnectionError("yahoo down")
+
+    async def hangs():
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(warmup.run([("bars", broken), ("imports", hangs)]))
+        await asyncio.sleep(0.01)
+        assert not warmup.ready and warmup.status()["steps"]["imports"]["state"] == "running"
+        await warmup.wait()
+        await task
+
+    asyncio.run(run())
+    steps = warmup.status()["steps"]
+    assert warmup.ready
+    assert steps["bars"]["state"] == "failed" and "yahoo down" in steps["bars"]["error"]
+    assert steps["imports"]["state"] == "timeout"
+
+
+def test_no_stages_is_ready_at_once():
+    warmup = Warmup()
+    assert warmup.status() == {"ready": False, "warmup_ms": None, "steps": {}}
+    asyncio.run(warmup.run())
+    assert warmup.ready
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import time
+
+from ws_hub import ClientChannel, ConnectionManager, SubscriptionHub
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0):
+        self.sent = []
+        self.delay = delay
+        self.closed = None
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+def make_hub(**kwargs):
+    started, stopped = [], []
+
+    async def producer(symbol):
+        started.append(symbol)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            stopped.append(symbol)
+
+    return SubscriptionHub(producer, **kwargs), started, stopped
+
+
+def test_one_producer_per_symbol_only_while_subscribed():
+    async def run():
+        hub, started, stopped = make_hub()
+        a, b = FakeSocket(), FakeSocket()
+        hub.subscribe(a, "GC=F")
+        hub.subscribe(b, "gc=f")
+        hub.subscribe(b, "BTC-USD")
+        await asyncio.sleep(0)
+        assert sorted(started) == ["BTC-USD", "GC=F"]
+
+        hub.disconnect(b)
+        await asyncio.sleep(0)
+        assert stopped == ["BTC-USD"]
+        assert list(hub.producers) == ["GC=F"]
+
+        hub.unsubscribe(a, "GC=F")
+        await asyncio.sleep(0)
+        assert sorted(stopped) == ["BTC-USD", "GC=F"]
+        assert hub.producers == {} and hub.groups == {}
+
+    asyncio.run(run())
+
+
+def test_new_topics_are_capped_and_validated_across_connections():
+    async def run():
+        hub, started, _ = make_hub(max_topics=2, accept=lambda symbol: symbol != "MADE-UP")
+        a, b = FakeSocket(), FakeSocket()
+        assert hub.subscribe(a, "GC=F") and hub.subscribe(a, "BTC-USD")
+        assert not hub.subscribe(b, "EURUSD=X")      # a third producer
+        assert hub.subscribe(b, "GC=F")              # joining a running one is fine
+        hub.unsubscribe(a, "BTC-USD")
+        assert not hub.subscribe(b, "MADE-UP")
+        assert hub.subscribe(b, "EURUSD=X")
+        await asyncio.sleep(0)
+        assert sorted(hub.producers) == ["EURUSD=X", "GC=F"] and hub.stats()["rejected"] == 2
+        hub.disconnect(a)
+        hub.disconnect(b)
+
+    asyncio.run(run())
+
+
+def test_messages_only_reach_symbol_subscribers():
+    async def run():
+        hub, _, _ = make_hub()
+        gold, btc, both = FakeSocket(), FakeSocket(), FakeSocket()
+        await hub.handle_message(gold, json.dumps({"action": "subscribe", "symbols": ["GC=F"]}))
+        await hub.handle_message(btc, json.dumps({"action": "subscribe", "symbols": "BTC-USD"}))
+        await hub.handle_message(both, json.dumps({"action": "subscribe", "symbols": ["GC=F", "BTC-USD"]}))
+        await asyncio.sleep(0.01)
+        for s in (gold, btc, both):
+            s.sent.clear()
+
+        await hub.publish("GC=F", json.dumps({"symbol": "GC=F"}))
+        await hub.publish("BTC-USD", json.dumps({"symbol": "BTC-USD"}))
+        await hub.publish("EURUSD=X", json.dumps({"symbol": "EURUSD=X"}))
+        await asyncio.sleep(0.01)
+
+        assert gold.sent == [{"symbol": "GC=F"}]
+        assert btc.sent == [{"symbol": "BTC-USD"}]
+        assert both.sent == [{"symbol": "GC=F"}, {"symbol": "BTC-USD"}]
+        for s in (gold, btc, both):
+            hub.disconnect(s)
+
+    asyncio.run(run())
+
+
+def test_protocol_replies_and_ignores_keepalive():
+    async def run():
+        hub, _, _ = make_hub()
+        ws = FakeSocket()
+        await hub.handle_message(ws, "ping")
+        assert ws.sent == []
+        await hub.handle_message(ws, json.dumps({"action": "subscribe", "symbols": ["GC=F", "BTC-USD"]}))
+        await hub.handle_message(ws, json.dumps({"action": "unsubscribe", "symbols": ["GC=F"]}))
+        await asyncio.sleep(0.01)
+        assert ws.sent[-1] == {"type": "subscriptions", "symbols": ["BTC-USD"], "mode": "json"}
+        hub.disconnect(ws)
+
+    asyncio.run(run())
+
+
+def test_slow_client_does_not_delay_others_and_gets_evicted():
+    async def run():
+        manager = ConnectionManager(queue_size=4, send_timeout=0.05)
+        fast, slow = FakeSocket(), FakeSocket(delay=1.0)
+        manager.add(fast)
+        manager.add(slow)
+        await manager.broadcast(json.dumps({"n": 1}))
+        await asyncio.sleep(0.01)
+        assert fast.sent == [{"n": 1}]
+        await asyncio.sleep(0.1)
+        assert slow not in manager.channels
+        assert slow.closed == 1013
+        assert manager.stats()["evictions"] == 1
+
+    asyncio.run(run())
+
+
+def test_keyed_messages_coalesce_to_latest():
+    async def run():
+        manager = ConnectionManager(queue_size=4)
+        ws = FakeSocket(delay=0.02)
+        manager.add(ws)
+        await manager.broadcast(json.dumps({"n": 0}), key="GC=F")
+        await asyncio.sleep(0.005)
+        for n in range(1, 10):
+            await manager.broadcast(json.dumps({"n": n}), key="GC=F")
+        await asyncio.sleep(0.1)
+        # first tick was already being sent; the other 9 collapsed into the newest
+        assert ws.sent == [{"n": 0}, {"n": 9}]
+        manager.disconnect(ws)
+
+    asyncio.run(run())
+
+
+def test_fanout_to_5k_sockets():
+    async def run():
+        manager = ConnectionManager()
+        sockets = [FakeSocket() for _ in range(5000)]
+        for ws in sockets:
+            manager.add(ws)
+        start = time.perf_counter()
+        await manager.broadcast(json.dumps({"price": 2000.0}), key="GC=F")
+        enqueue_time = time.perf_counter() - start
+        await asyncio.sleep(0.2)
+        assert all(ws.sent == [{"price": 2000.0}] for ws in sockets)
+        assert enqueue_time < 0.5
+        assert manager.stats()["delivery_p99_ms"] > 0
+        for ws in sockets:
+            manager.disconnect(ws)
+
+    asyncio.run(run())
+
+
+def test_delta_clients_can_always_decode_what_a_full_queue_sends():
+    def keyframe(n):
+        return {"json": "{}", "binary": b"", "delta": json.dumps({"k": 1, "id": n}), "keyframe": True}
+
+    def delta(n, v):
+        return {"json": "{}", "binary": b"", "delta": json.dumps({"base": n, "v": v})}
+
+    async def run():
+        hub, _, _ = make_hub(manager=ConnectionManager(queue_size=3))
+        ws = FakeSocket()
+        hub.set_mode(ws, "delta")
+        for symbol in ("GC=F", "BTC-USD", "EURUSD=X", "ETH-USD"):
+            hub.subscribe(ws, symbol)
+        await asyncio.sleep(0.01)
+        ws.sent.clear()
+        # No awaits in between: everything below queues before the writer runs
+        await hub.publish("GC=F", keyframe(1))
+        await hub.publish("GC=F", delta(1, 1))
+        for symbol in ("BTC-USD", "EURUSD=X", "ETH-USD"):
+            await hub.publish(symbol, delta(0, 0))      # fills the queue past its size
+        await hub.publish("GC=F", delta(1, 2))          # replaces the queued delta
+        await hub.publish("GC=F", keyframe(2))          # voids the delta against keyframe 1
+        await hub.publish("GC=F", delta(2, 3))
+        await asyncio.sleep(0.01)
+        hub.disconnect(ws)
+        return ws.sent
+
+    sent = asyncio.run(run())
+    gold = [m for m in sent if "k" in m or m.get("base")]
+    base = None
+    for msg in gold:
+        if msg.get("k"):
+            base = msg["id"]
+        else:
+            assert msg["base"] == base   # never decoded against a stale or missing keyframe
+    assert gold[-1] == {"base": 2, "v": 3}
+    assert {"k": 1, "id": 2} in gold
+
+
+def test_replaced_messages_move_behind_their_keyframe():
+    channel = ClientChannel(FakeSocket(), maxsize=3)
+    channel.enqueue("d1", "GC=F", 0)
+    channel.enqueue("k", "GC=F:key", 0, pinned=True)
+    channel.enqueue("d2", "GC=F", 0)
+    channel.enqueue("x", "BTC-USD", 0)
+    channel.enqueue("y", "ETH-USD", 0)     # full: the oldest unpinned entry goes, not the keyframe
+    assert [m for m, _ in channel.pending.values()] == ["k", "x", "y"] and channel.dropped == 1
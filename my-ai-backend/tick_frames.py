@@ -0,0 +1,103 @@
+"""
+Price tick frames, serialized once per price change and shared by every client.
+
+Wire modes a client can opt into:
+  json    legacy payload {"symbol", "price", "change", "percent", "timestamp"}
+  delta   compact JSON. A keyframe {"k": 1, "s", "p", "c", "pct", "t"} is sent
+          every `keyframe_interval` seconds; in between, frames carry only the
+          fields that differ from the last keyframe (always "s" and "t"). Deltas
+          are relative to the keyframe, not to each other, so dropping or
+          coalescing a delta never corrupts the client's state.
+  binary  fixed layout: u8 type, u8 symbol length, symbol (ascii),
+          then f64 price, f64 change, f64 percent, u64 epoch ms (little endian).
+Heartbeats ({"type": "heartbeat"} / "hb" / binary type 2) replace unchanged ticks.
+"""
+import json
+import struct
+import time
+from datetime import datetime
+
+WIRE_MODES = ("json", "delta", "binary")
+
+FRAME_TICK = 1
+FRAME_HEARTBEAT = 2
+_HEADER = struct.Struct("<BB")
+_BODY = struct.Struct("<dddQ")
+
+
+def encode_binary(frame_type, symbol, price=0.0, change=0.0, percent=0.0, ts_ms=0):
+    sym = symbol.encode("ascii")
+    return _HEADER.pack(frame_type, len(sym)) + sym + _BODY.pack(price, change, percent, ts_ms)
+
+
+def decode_binary(data):
+    frame_type, n = _HEADER.unpack_from(data)
+    symbol = data[2:2 + n].decode("ascii")
+    price, change, percent, ts_ms = _BODY.unpack_from(data, 2 + n)
+    return {"type": frame_type, "symbol": symbol, "price": price, "change": change, "percent": percent, "ts_ms": ts_ms}
+
+
+class TickEncoder:
+    """Builds all wire variants for one symbol; returns None for unchanged ticks."""
+
+    def __init__(self, symbol, keyframe_interval=30.0, clock=time.time):
+        self.symbol = symbol
+        self.keyframe_interval = keyframe_interval
+        self.clock = clock
+        self.last = None          # (price, change, percent) of the last frame sent
+        self.keyframe = None      # compact fields of the last keyframe
+        self.keyframe_at = 0.0
+        self.frames_built = 0
+        self.suppressed = 0
+
+    def encode(self, price, previous_close):
+        change = 0.0
+        percent = 0.0
+        if previous_close:
+            change = price - previous_close
+            percent = (change / previous_close) * 100
+        values = (round(price, 2), round(change, 2), round(percent, 2))
+        if values == self.last:
+            self.suppressed += 1
+            return None
+        self.last = values
+
+        now = self.clock()
+        ts_ms = int(now * 1000)
+        price_r, change_r, percent_r = values
+        full = json.dumps({
+            "symbol": self.symbol,
+            "price": price_r,
+            "change": change_r,
+            "percent": percent_r,
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+        })
+
+        compact = {"p": price_r, "c": change_r, "pct": percent_r}
+        is_key = self.keyframe is None or now - self.keyframe_at >= self.keyframe_interval
+        if is_key:
+            self.keyframe = compact
+            self.keyframe_at = now
+            delta = {"k": 1, "s": self.symbol, **compact, "t": ts_ms}
+        else:
+            delta = {"s": self.symbol}
+            delta.update({k: v for k, v in compact.items() if self.keyframe[k] != v})
+            delta["t"] = ts_ms
+
+        self.frames_built += 1
+        return {
+            "json": full,
+            "delta": json.dumps(delta, separators=(",", ":")),
+            "binary": encode_binary(FRAME_TICK, self.symbol, price_r, change_r, percent_r, ts_ms),
+            "keyframe": is_key,
+        }
+
+    def heartbeat(self):
+        ts_ms = int(self.clock() * 1000)
+        return {
+            # no "symbol" key: legacy clients only act on frames that have one
+            "json": json.dumps({"type": "heartbeat", "s": self.symbol, "t": ts_ms}),
+            "delta": json.dumps({"hb": 1, "s": self.symbol, "t": ts_ms}, separators=(",", ":")),
+            "binary": encode_binary(FRAME_HEARTBEAT, self.symbol, ts_ms=ts_ms),
+            "heartbeat": True,
+        }
@@ -0,0 +1,61 @@
+"""
+Startup warm-up and the readiness signal.
+
+The app accepts connections as soon as it has started; `Warmup.run` then
+fills the caches in the background (archived bars, one bulk download, first
+analyses) while `/ready` answers 503. Stages run one after another and the
+steps inside a stage run concurrently. A step that fails or runs past
+`timeout` is reported in `status()` but doesn't hold readiness back: the
+app then serves that request cold, the normal way.
+"""
+import asyncio
+import time
+
+
+class Warmup:
+    def __init__(self, timeout=30.0, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self.steps = {}         # name -> {"state", "ms", optional "error"}
+        self.started_at = None
+        self.finished_at = None
+        self._finished = asyncio.Event()
+
+    @property
+    def ready(self):
+        return self.finished_at is not None
+
+    async def _step(self, name, fn):
+        entry = self.steps[name] = {"state": "running", "ms": None}
+        start = self.clock()
+        try:
+            await asyncio.wait_for(fn(), self.timeout)
+            entry["state"] = "ok"
+        except asyncio.TimeoutError:
+            entry["state"] = "timeout"
+        except Exception as e:
+            entry["state"] = "failed"
+            entry["error"] = repr(e)
+            print(f"Warm-up Error ({name}): {e}")
+        entry["ms"] = round((self.clock() - start) * 1000, 1)
+
+    async def run(self, *stages):
+        """Each stage is a list of (name, async fn); an empty call just marks the app ready."""
+        self.started_at = self.clock()
+        try:
+            for stage in stages:
+                await asyncio.gather(*(self._step(name, fn) for name, fn in stage))
+        finally:
+            self.finished_at = self.clock()
+            self._finished.set()
+
+    async def wait(self):
+        await self._finished.wait()
+
+    def status(self):
+        end = self.finished_at if self.finished_at is not None else self.clock()
+        return {
+            "ready": self.ready,
+            "warmup_ms": round((end - self.started_at) * 1000, 1) if self.started_at is not None else None,
+            "steps": {name: dict(entry) for name, entry in self.steps.items()},
+        }
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+
+from tick_frames import WIRE_MODES
+
+MAX_SYMBOLS_PER_CONNECTION = 20
+MAX_TOPICS = 200   # distinct symbols across all connections, i.e. running producers
+
+
+class ClientChannel:
+    """
+    Bounded outbound queue for one socket. Messages published with a key
+    (e.g. the symbol) replace the still-queued message with the same key and
+    move to the back, so a slow client gets the latest tick, in order,
+    instead of a backlog. When the queue is full the oldest message is
+    dropped, except `pinned` ones (delta-mode keyframes, which the deltas
+    queued after them are decoded against). A message can `supersede` a
+    queued key, e.g. a keyframe removes the pending delta relative to the
+    keyframe it replaces.
+    """
+
+    def __init__(self, websocket, maxsize):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.pending = OrderedDict()   # key -> (message, enqueued_at)
+        self.pinned = set()            # keys in `pending` never dropped for space
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.dropped = 0
+        self.full_since = None
+        self._seq = 0
+
+    def enqueue(self, message, key, now, pinned=False, supersedes=None):
+        if key is None:
+            self._seq += 1
+            key = ("_seq", self._seq)
+        if supersedes is not None and self.pending.pop(supersedes, None) is not None:
+            self.pinned.discard(supersedes)
+        if key in self.pending:
+            self.pending.move_to_end(key)
+        elif len(self.pending) >= self.maxsize:
+            victim = next((k for k in self.pending if k not in self.pinned), None)
+            if victim is None:
+                victim = next(iter(self.pending))
+            del self.pending[victim]
+            self.pinned.discard(victim)
+            self.dropped += 1
+            if self.full_since is None:
+                self.full_since = now
+        self.pending[key] = (message, now)
+        if pinned:
+            self.pinned.add(key)
+        else:
+            self.pinned.discard(key)
+        self.wakeup.set()
+
+    def pop(self):
+        key, entry = self.pending.popitem(last=False)
+        self.pinned.discard(key)
+        return entry
+
+
+# --- WebSocket Manager ---
+class ConnectionManager:
+    """
+    Every connection gets its own ClientChannel and writer task, so broadcast
+    only enqueues and never waits on a slow socket. Clients whose sends time
+    out, or whose queue has stayed full for `slow_timeout` seconds, are evicted.
+    """
+
+    def __init__(self, queue_size=32, send_timeout=5.0, slow_timeout=10.0, on_evict=None, clock=time.monotonic):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_timeout = slow_timeout
+        self.on_evict = on_evict
+        self.clock = clock
+        self.channels = {}
+        self.latencies = deque(maxlen=2048)   # enqueue -> sent, seconds
+        self.broadcasts = 0
+        self.evictions = 0
+        self.last_fanout = 0.0
+
+    @property
+    def active_connections(self):
+        return list(self.channels)
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        self.add(websocket)
+
+    def add(self, websocket):
+        if websocket not in self.channels:
+            channel = ClientChannel(websocket, self.queue_size)
+            channel.task = asyncio.create_task(self._writer(channel))
+            self.channels[websocket] = channel
+
+    def disconnect(self, websocket):
+        channel = self.channels.pop(websocket, None)
+        if channel is not None and channel.task is not asyncio.current_task():
+            channel.task.cancel()
+
+    def enqueue(self, websocket, message, key=None, pinned=False, supersedes=None):
+        channel = self.channels.get(websocket)
+        if channel is not None:
+            channel.enqueue(message, key, self.clock(), pinned, supersedes)
+
+    async def broadcast(self, message, targets=None, key=None, pinned=False, supersedes=None):
+        """Queue `message` (str or bytes) for every connection, or just `targets`."""
+        start = self.clock()
+        slow = []
+        for websocket in list(self.channels if targets is None else targets):
+            channel = self.channels.get(websocket)
+            if channel is None:
+                continue
+            channel.enqueue(message, key, start, pinned, supersedes)
+            if channel.full_since is not None and start - channel.full_since > self.slow_timeout:
+                slow.append(websocket)
+        for websocket in slow:
+            self.evict(websocket, "queue full")
+        self.broadcasts += 1
+        self.last_fanout = self.clock() - start
+
+    async def _send(self, websocket, message):
+        if isinstance(message, bytes):
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message)
+
+    async def _writer(self, channel):
+        websocket = channel.websocket
+        try:
+            while True:
+                await channel.wakeup.wait()
+                channel.wakeup.clear()
+                while channel.pending:
+                    message, enqueued_at = channel.pop()
+                    await asyncio.wait_for(self._send(websocket, message), self.send_timeout)
+                    self.latencies.append(self.clock() - enqueued_at)
+                channel.full_since = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.evict(websocket, f"send failed: {e!r}")
+
+    def evict(self, websocket, reason):
+        if websocket not in self.channels:
+            return
+        print(f"Evicting WebSocket client ({reason})")
+        self.evictions += 1
+        self.disconnect(websocket)
+        asyncio.ensure_future(self._close(websocket))
+        if self.on_evict is not None:
+            self.on_evict(websocket)
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close(code=1013)  # try again later
+        except Exception:
+            pass
+
+    def stats(self):
+        lat = sorted(self.latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3) if lat else 0.0
+
+        return {
+            "connections": len(self.channels),
+            "broadcasts": self.broadcasts,
+            "evictions": self.evictions,
+            "dropped": sum(c.dropped for c in self.channels.values()),
+            "queued": sum(len(c.pending) for c in self.channels.values()),
+            "last_fanout_ms": round(self.last_fanout * 1000, 3),
+            "delivery_p50_ms": pct(0.5),
+            "delivery_p99_ms": pct(0.99),
+            "delivery_max_ms": round(lat[-1] * 1000, 3) if lat else 0.0,
+        }
+
+
+class SubscriptionHub:
+    """
+    Routes per-symbol messages to the sockets subscribed to that symbol.
+
+    `producer(symbol)` is a coroutine that publishes updates through
+    `hub.publish(symbol, message)`. Exactly one producer runs per symbol, and
+    only while the symbol has at least one subscriber.
+
+    A message is either one payload for everybody, or a dict of pre-serialized
+    variants per wire mode (see tick_frames) from which each socket gets the
+    one it opted into.
+    """
+
+    def __init__(self, producer, restart_delay=1.0, manager=None, accept=None, max_topics=MAX_TOPICS):
+        self.producer = producer
+        self.accept = accept      # optional accept(symbol) -> bool for symbols without a producer yet
+        self.max_topics = max_topics
+        self.restart_delay = restart_delay
+        self.manager = manager or ConnectionManager()
+        self.manager.on_evict = self.disconnect
+        self.groups = {}          # symbol -> set of websockets
+        self.producers = {}       # symbol -> asyncio.Task
+        self.subscriptions = {}   # websocket -> set of symbols
+        self.modes = {}           # websocket -> wire mode, "json" if absent
+        self.latest = {}          # symbol -> last tick frames (replayed on subscribe)
+        self.keyframes = {}       # symbol -> last keyframe frames (delta mode)
+        self.rejected = 0
+
+    @staticmethod
+    def normalize(symbol):
+        return str(symbol).strip().upper()
+
+    def subscribe(self, websocket, symbol):
+        symbol = self.normalize(symbol)
+        symbols = self.subscriptions.setdefault(websocket, set())
+        if symbol in symbols:
+            return True
+        if len(symbols) >= MAX_SYMBOLS_PER_CONNECTION:
+            self.rejected += 1
+            return False
+        if symbol not in self.producers:
+            # Every new symbol starts a producer polling upstream, so unknown
+            # ones are refused and the total is capped across all clients
+            if len(self.producers) >= self.max_topics or (self.accept is not None and not self.accept(symbol)):
+                self.rejected += 1
+                return False
+        self.manager.add(websocket)
+        symbols.add(symbol)
+        self.groups.setdefault(symbol, set()).add(websocket)
+        if symbol not in self.producers:
+            self.producers[symbol] = asyncio.create_task(self._run_producer(symbol))
+        self._send_snapshot(websocket, symbol)
+        return True
+
+    def set_mode(self, websocket, mode):
+        if mode not in WIRE_MODES:
+            return False
+        self.modes[websocket] = mode
+        return True
+
+    def _send_snapshot(self, websocket, symbol):
+        # New subscribers get the current price right away instead of waiting for a change
+        latest = self.latest.get(symbol)
+        if latest is None:
+            return
+        self.manager.add(websocket)
+        mode = self.modes.get(websocket, "json")
+        if mode == "delta":
+            keyframe = self.keyframes.get(symbol)
+            if keyframe is not None and keyframe is not latest:
+                self.manager.enqueue(websocket, keyframe["delta"], key=f"{symbol}:key", pinned=True, supersedes=symbol)
+            elif latest.get("keyframe"):
+                self.manager.enqueue(websocket, latest["delta"], key=f"{symbol}:key", pinned=True, supersedes=symbol)
+                return
+        self.manager.enqueue(websocket, latest[mode], key=symbol)
+
+    def unsubscribe(self, websocket, symbol):
+        symbol = self.normalize(symbol)
+        self.subscriptions.get(websocket, set()).discard(symbol)
+        group = self.groups.get(symbol)
+        if group is None:
+            return
+        group.discard(websocket)
+        if not group:
+            del self.groups[symbol]
+            self.latest.pop(symbol, None)
+            self.keyframes.pop(symbol, None)
+            task = self.producers.pop(symbol, None)
+            if task is not None:
+                task.cancel()
+
+    def disconnect(self, websocket):
+        for symbol in list(self.subscriptions.get(websocket, ())):
+            self.unsubscribe(websocket, symbol)
+        self.subscriptions.pop(websocket, None)
+        self.modes.pop(websocket, None)
+        self.manager.disconnect(websocket)
+
+    async def publish(self, symbol, message):
+        group = self.groups.get(symbol)
+        if not group:
+            return
+        if not isinstance(message, dict):
+            # Keyed by symbol: a queued, unsent tick is replaced by the newer one
+            await self.manager.broadcast(message, targets=group, key=symbol)
+            return
+
+        if message.get("heartbeat"):
+            key = f"{symbol}:hb"
+        else:
+            key = symbol
+            self.latest[symbol] = message
+            if message.get("keyframe"):
+                self.keyframes[symbol] = message
+
+        by_mode = {}
+        for websocket in group:
+            by_mode.setdefault(self.modes.get(websocket, "json"), []).append(websocket)
+        for mode, targets in by_mode.items():
+            if mode == "delta" and message.get("keyframe"):
+                # Keyframes must survive until sent: later deltas are relative to
+                # them, and a still-queued delta against the previous one is void
+                await self.manager.broadcast(message[mode], targets=targets, key=f"{symbol}:key",
+                                             pinned=True, supersedes=symbol)
+            else:
+                await self.manager.broadcast(message[mode], targets=targets, key=key)
+
+    async def _run_producer(self, symbol):
+        # Restart a crashed producer for as long as someone is listening
+        while symbol in self.groups:
+            try:
+                await self.producer(symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Producer Error ({symbol}): {e}")
+            await asyncio.sleep(self.restart_delay)
+
+    async def handle_message(self, websocket, text):
+        """
+        Client protocol:
+          {"action": "subscribe", "symbols": ["GC=F", "BTC-USD"]}
+          {"action": "unsubscribe", "symbols": ["BTC-USD"]}
+          {"action": "mode", "mode": "json" | "delta" | "binary"}
+        Anything else is treated as a keep-alive.
+        """
+        try:
+            msg = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(msg, dict):
+            return
+        action = msg.get("action")
+        symbols = msg.get("symbols") or []
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        if action == "subscribe":
+            rejected = [s for s in symbols if not self.subscribe(websocket, s)]
+        elif action == "unsubscribe":
+            rejected = []
+            for s in symbols:
+                self.unsubscribe(websocket, s)
+        elif action == "mode":
+            rejected = [] if self.set_mode(websocket, msg.get("mode")) else [msg.get("mode")]
+        else:
+            return
+
+        reply = {
+            "type": "subscriptions",
+            "symbols": sorted(self.subscriptions.get(websocket, ())),
+            "mode": self.modes.get(websocket, "json"),
+        }
+        if rejected:
+            reply["rejected"] = rejected
+        # Through the connection's queue so it never races the writer task
+        self.manager.add(websocket)
+        await self.manager.broadcast(json.dumps(reply), targets=[websocket])
+
+    def stats(self):
+        return {
+            "connections": len(self.subscriptions),
+            "symbols": {symbol: len(group) for symbol, group in self.groups.items()},
+            "rejected": self.rejected,
+            "fanout": self.manager.stats(),
+        }